@@ -0,0 +1,11 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Serve device, protocol and result reads from the async views
+os.environ.setdefault('ASYNC_READ_VIEWS', 'true')
+# Also turns off persistent database connections, see settings
+os.environ.setdefault('SERVER_MODE', 'asgi')
+
+application = get_asgi_application()
@@ -0,0 +1,54 @@
+"""
+Gunicorn settings for production serving.
+
+    gunicorn -c config/gunicorn.conf.py
+
+``SERVER_MODE=wsgi`` (the default) runs sync workers on ``config.wsgi``.
+``SERVER_MODE=asgi`` runs uvicorn workers on ``config.asgi``, where a single
+worker multiplexes many slow clients on the async read views, so fewer
+workers are needed; persistent database connections are off there, so set
+``DB_POOL`` to reuse connections. Every value can be overridden from the
+environment.
+"""
+import multiprocessing
+import os
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi').lower()
+cpus = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    workers = int(os.getenv('GUNICORN_WORKERS', cpus))
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'gthread'
+    workers = int(os.getenv('GUNICORN_WORKERS', cpus * 2 + 1))
+    threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Recycle workers now and then so slow leaks cannot build up, staggered by jitter
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '1000'))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Import the app before forking so workers share its memory. Django opens no
+# database connections while loading, so none leak into the workers.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # Metrics files left by a previous run would be merged into this one's
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith('.db'):
+                os.remove(os.path.join(directory, name))
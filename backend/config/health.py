@@ -0,0 +1,82 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+def check_database():
+    with connections['default'].cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def check_cache():
+    cache.get('readiness-probe')
+
+
+READINESS_CHECKS = {
+    'database': check_database,
+    'cache': check_cache,
+}
+
+
+def liveness():
+    return JsonResponse({'status': 'ok'})
+
+
+def readiness():
+    """
+    Run each readiness check, answering 503 if any of them fails. Errors are
+    logged rather than returned, since probes are answered unauthenticated and
+    messages can name database or cache hosts.
+    """
+    checks = {}
+    for name, check in READINESS_CHECKS.items():
+        started = time.perf_counter()
+        try:
+            check()
+        except Exception:
+            logger.exception('Readiness check %s failed', name)
+            checks[name] = {'status': 'error'}
+        else:
+            checks[name] = {'status': 'ok', 'ms': round((time.perf_counter() - started) * 1000, 2)}
+    ready = all(check['status'] == 'ok' for check in checks.values())
+    return JsonResponse({'status': 'ok' if ready else 'error', 'checks': checks}, status=200 if ready else 503)
+
+
+class HealthCheckMiddleware:
+    """
+    Answer ``HEALTH_LIVENESS_PATH`` and ``HEALTH_READINESS_PATH`` before the
+    rest of the middleware, URL resolution and DRF run.
+
+    Liveness only shows the process is serving requests. Readiness also checks
+    the database and cache. Being first in ``MIDDLEWARE`` also skips the
+    ``ALLOWED_HOSTS`` check, so probes may address a pod by its IP.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == settings.HEALTH_LIVENESS_PATH:
+            return liveness()
+        if request.path == settings.HEALTH_READINESS_PATH:
+            return readiness()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path == settings.HEALTH_LIVENESS_PATH:
+            return liveness()
+        if request.path == settings.HEALTH_READINESS_PATH:
+            return await sync_to_async(readiness)()
+        return await self.get_response(request)
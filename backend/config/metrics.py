@@ -0,0 +1,229 @@
+import functools
+import hmac
+import logging
+import os
+import time
+from collections import Counter as StatementCounter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Wall time per request', ['view', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request', ['view'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+)
+DB_SECONDS = Counter('http_request_db_seconds', 'Time spent in database queries', ['view'])
+SERIALIZER_SECONDS = Counter('http_request_serializer_seconds', 'Time spent building serializer data', ['view'])
+RESPONSE_BYTES = Histogram(
+    'http_response_size_bytes', 'Response body size', ['view'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+DUPLICATE_QUERY_REQUESTS = Counter(
+    'http_request_duplicate_queries', 'Requests that repeated a query past the threshold', ['view'],
+)
+
+
+class RequestMetrics:
+    """
+    Measurements for one request, attached to it as ``request.metrics``.
+
+    Also a database execute wrapper, counting and timing every query and
+    tallying the SQL templates so repeated statements can be reported.
+    """
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.statements = StatementCounter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def duplicates(self, threshold):
+        """
+        Return ``[(count, sql)]`` for statements run at least ``threshold`` times.
+        """
+        if threshold < 2:
+            return []
+        return [(count, sql) for sql, count in self.statements.most_common() if count >= threshold]
+
+    def server_timing(self, elapsed):
+        return ', '.join([
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serializer_seconds * 1000:.1f}',
+            f'total;dur={elapsed * 1000:.1f}',
+        ])
+
+
+def label_request(request, view):
+    """
+    Name the view a request is recorded under, e.g. ``DeviceViewSet.assign``.
+    """
+    metrics = getattr(request, 'metrics', None)
+    if metrics is not None:
+        metrics.view = view
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        # Unresolved paths share one label so scanners cannot inflate the series
+        return 'unresolved'
+    cls = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    if cls is not None and request.method.lower() in actions:
+        return f'{cls.__name__}.{actions[request.method.lower()]}'
+    if cls is not None:
+        return f'{cls.__name__}.{request.method.lower()}'
+    return match.view_name or match.route
+
+
+@functools.cache
+def timed_serializer_class(serializer_class):
+    class TimedSerializer(serializer_class):
+        @property
+        def data(self):
+            started = time.perf_counter()
+            try:
+                return super().data
+            finally:
+                self._request_metrics.serializer_seconds += time.perf_counter() - started
+
+    TimedSerializer.__name__ = TimedSerializer.__qualname__ = serializer_class.__name__
+    return TimedSerializer
+
+
+def time_serializer(serializer, request):
+    """
+    Count the time spent building ``serializer.data`` towards the request.
+    """
+    metrics = getattr(request, 'metrics', None)
+    if metrics is not None:
+        serializer._request_metrics = metrics
+        serializer.__class__ = timed_serializer_class(type(serializer))
+    return serializer
+
+
+@contextmanager
+def timed_serialization(request):
+    """
+    Count the time spent in the block towards the request's serializer time,
+    for output built without a serializer.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None:
+            metrics.serializer_seconds += time.perf_counter() - started
+
+
+def metrics_response(request):
+    """
+    Export the metrics registry, refusing scrapes without ``METRICS_TOKEN``
+    when one is configured.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected.encode()):
+            response = HttpResponse('Unauthorized', status=401, content_type='text/plain')
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Gunicorn workers each write their own files; merge them on scrape
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """
+    Record wall time, query count and time, serializer time and response size
+    per view, exported in Prometheus format at ``METRICS_PATH`` when it is set.
+
+    Viewsets using ``devices.mixins.MetricsMixin`` are labelled with their
+    action and have serializer time measured. ``METRICS_SERVER_TIMING`` adds a
+    ``Server-Timing`` header, and requests that run one statement at least
+    ``METRICS_DUPLICATE_QUERY_THRESHOLD`` times are logged with its SQL.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if settings.METRICS_PATH and request.path == settings.METRICS_PATH:
+            return metrics_response(request)
+        request.metrics = RequestMetrics()
+        started = time.perf_counter()
+        with request.metrics.capture():
+            response = self.get_response(request)
+        return self.record(request, response, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if settings.METRICS_PATH and request.path == settings.METRICS_PATH:
+            return metrics_response(request)
+        request.metrics = RequestMetrics()
+        started = time.perf_counter()
+        # Connections are per thread, so the wrappers go on the request's
+        # thread-sensitive thread, where sync views and async ORM calls run
+        capture = request.metrics.capture()
+        await sync_to_async(capture.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(capture.__exit__)(None, None, None)
+        return self.record(request, response, time.perf_counter() - started)
+
+    def record(self, request, response, elapsed):
+        metrics = request.metrics
+        view = metrics.view or view_label(request)
+        REQUEST_SECONDS.labels(view, request.method, response.status_code).observe(elapsed)
+        DB_QUERIES.labels(view).observe(metrics.queries)
+        DB_SECONDS.labels(view).inc(metrics.db_seconds)
+        SERIALIZER_SECONDS.labels(view).inc(metrics.serializer_seconds)
+        if not response.streaming:
+            RESPONSE_BYTES.labels(view).observe(len(response.content))
+
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(elapsed)
+
+        duplicates = metrics.duplicates(settings.METRICS_DUPLICATE_QUERY_THRESHOLD)
+        if duplicates:
+            DUPLICATE_QUERY_REQUESTS.labels(view).inc()
+            for count, sql in duplicates:
+                logger.warning('%s %s ran the same query %d times: %s', request.method, view, count, sql)
+        return response
@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_yasg',
@@ -33,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.health.HealthCheckMiddleware',  # Probes skip everything below
+    'config.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add this at the top
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -62,6 +65,28 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Liveness and readiness probe paths, answered by config.health.HealthCheckMiddleware
+HEALTH_LIVENESS_PATH = os.getenv('HEALTH_LIVENESS_PATH', '/healthz')
+HEALTH_READINESS_PATH = os.getenv('HEALTH_READINESS_PATH', '/readyz')
+
+# Request metrics from config.metrics.MetricsMiddleware, scraped in Prometheus
+# format at METRICS_PATH (empty, the default, disables the endpoint). Scrapes
+# must send METRICS_TOKEN as a bearer token when it is set. Set
+# PROMETHEUS_MULTIPROC_DIR when running several gunicorn workers so a scrape
+# covers all of them.
+METRICS_PATH = os.getenv('METRICS_PATH', '')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+# Log requests that run one SQL statement this many times or more (0 disables)
+METRICS_DUPLICATE_QUERY_THRESHOLD = int(os.getenv('METRICS_DUPLICATE_QUERY_THRESHOLD', '5'))
+
+# Route device, protocol and result list/retrieve to async views (set by config/asgi.py)
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+
+# Build device, protocol and result list pages from values() rows rather than serializer instances
+VALUE_LIST_ROWS = os.getenv('VALUE_LIST_ROWS', 'true').lower() in ('1', 'true', 'yes')
 
 # Database
 DATABASES = {
@@ -72,9 +97,31 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgres'),
         'HOST': os.getenv('POSTGRES_HOST', 'db'),
         'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        # Keep connections open between requests, checking them before reuse
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Async serving runs each request's queries on whichever thread is free, so
+# Django cannot close or reuse persistent connections reliably there. Under
+# ASGI connections last one request; set DB_POOL to reuse them instead.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi').lower()
+if SERVER_MODE == 'asgi':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# psycopg 3 connection pool, one per worker process. Replaces persistent
+# connections, which Django does not allow alongside a pool.
+if os.getenv('DB_POOL', 'false').lower() in ('1', 'true', 'yes'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://redis:6379/0')
@@ -82,6 +129,73 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    'flush-test-result-notifications': {
+        'task': 'devices.tasks.flush_test_result_notifications',
+        'schedule': float(os.getenv('NOTIFICATION_FLUSH_INTERVAL', '60')),
+    },
+    'refresh-result-rollups': {
+        'task': 'devices.tasks.refresh_result_rollups',
+        'schedule': float(os.getenv('ROLLUP_REFRESH_INTERVAL', '300')),
+    },
+}
+
+# Test result notification digests
+NOTIFICATION_BUFFER_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
+NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', '100'))
+# Digests sent per flush run; anything beyond is left for the next run
+NOTIFICATION_MAX_CHUNKS = int(os.getenv('NOTIFICATION_MAX_CHUNKS', '50'))
+NOTIFICATION_RECIPIENTS = os.getenv('NOTIFICATION_RECIPIENTS', 'admin@example.com').split(',')
+
+# Daily test result rollups
+ROLLUP_WATERMARK_OVERLAP = int(os.getenv('ROLLUP_WATERMARK_OVERLAP', '300'))
+ROLLUP_CHUNK_SIZE = int(os.getenv('ROLLUP_CHUNK_SIZE', '2000'))
+
+# Test results whose search vectors are rebuilt per UPDATE after a device or protocol rename
+SEARCH_VECTOR_CHUNK_SIZE = int(os.getenv('SEARCH_VECTOR_CHUNK_SIZE', '2000'))
+
+# Cache Configuration
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_CACHE_URL', os.getenv('REDIS_URL', 'redis://redis:6379/0')),
+        'KEY_PREFIX': 'vitalbio',
+    }
+}
+LIST_CACHE_TIMEOUT = int(os.getenv('LIST_CACHE_TIMEOUT', '300'))
+ASSIGNED_DEVICES_TIMEOUT = int(os.getenv('ASSIGNED_DEVICES_TIMEOUT', '3600'))
+
+# Token authentication cache: Redis entries plus a short-lived per-process LRU
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', '3600'))
+TOKEN_CACHE_LOCAL_TTL = int(os.getenv('TOKEN_CACHE_LOCAL_TTL', '30'))
+TOKEN_CACHE_LOCAL_SIZE = int(os.getenv('TOKEN_CACHE_LOCAL_SIZE', '10000'))
+
+# Bulk result ingestion
+RESULTS_BULK_BATCH_SIZE = int(os.getenv('RESULTS_BULK_BATCH_SIZE', '500'))
+# Rows accepted per request, all of which are validated and held in memory
+RESULTS_BULK_MAX_ROWS = int(os.getenv('RESULTS_BULK_MAX_ROWS', '10000'))
+
+# Result exports
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+EXPORT_ROOT = os.getenv('EXPORT_ROOT', os.path.join(BASE_DIR, 'exports'))
+EXPORT_PROGRESS_TIMEOUT = int(os.getenv('EXPORT_PROGRESS_TIMEOUT', '86400'))
+
+# Keys of TestResult.data that the results API can filter on, with their value
+# type (number, string or boolean). Keys must be valid identifiers.
+RESULT_DATA_FILTER_KEYS = {
+    'voltage': 'number',
+    'current': 'number',
+    'temperature': 'number',
+    'test_duration': 'number',
+    'error_count': 'number',
+    'firmware_version': 'string',
+    'calibrated': 'boolean',
+}
+
+# Measurement series split out of TestResult.data
+SERIES_MIN_SAMPLES = int(os.getenv('SERIES_MIN_SAMPLES', '256'))
+SERIES_DEFAULT_POINTS = int(os.getenv('SERIES_DEFAULT_POINTS', '1000'))
+SERIES_MAX_POINTS = int(os.getenv('SERIES_MAX_POINTS', '10000'))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -148,7 +262,7 @@ CORS_ALLOW_HEADERS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',  # For browsable API
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -202,4 +316,7 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'admin@example.com')
 
 # Custom user model
-AUTH_USER_MODEL = 'users.CustomUser' 
\ No newline at end of file
+AUTH_USER_MODEL = 'users.CustomUser'
+
+# Loads users together with their role
+AUTHENTICATION_BACKENDS = ['users.authentication.RoleModelBackend'] 
\ No newline at end of file
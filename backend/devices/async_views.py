@@ -0,0 +1,120 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.response import Response
+from config.metrics import timed_serialization
+from .mixins import CachedListMixin, ValueListMixin
+from .pagination import KeysetPagination
+
+
+class AsyncReadView(View):
+    """
+    Async list and retrieve for a DRF viewset, used when serving over ASGI.
+
+    Authentication, permissions, role scoping, filters, query planning and
+    serializers all come from ``viewset_class``. The setup runs in one thread
+    hop, while the queries themselves use the async ORM, so a worker can hold
+    many slow clients. Requests the async path does not cover (writes, page
+    number pagination) are handed to the sync viewset.
+    """
+    viewset_class = None
+    basename = None
+    detail = False
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # As APIView.as_view: writes reach the sync viewset, whose
+        # SessionAuthentication enforces CSRF for session-authenticated requests
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def sync_view(self):
+        actions = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'} \
+            if self.detail else {'get': 'list', 'post': 'create'}
+        return self.viewset_class.as_view(actions, basename=self.basename, detail=self.detail)
+
+    async def fallback(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view())(request, *args, **kwargs)
+
+    post = put = patch = delete = options = fallback
+
+    def build_viewset(self, request, *args, **kwargs):
+        viewset = self.viewset_class(basename=self.basename, detail=self.detail)
+        viewset.action = 'retrieve' if self.detail else 'list'
+        viewset.action_map = {'get': viewset.action}
+        viewset.args = args
+        viewset.kwargs = kwargs
+        viewset.format_kwarg = viewset.get_format_suffix(**kwargs)
+        viewset.headers = viewset.default_response_headers
+        viewset.request = viewset.initialize_request(request, *args, **kwargs)
+        return viewset
+
+    def prepare(self, viewset, *args, **kwargs):
+        """
+        Authenticate and check permissions, then build the filtered queryset
+        and, for cached lists, look up the cached entry. Runs in a thread.
+        """
+        request = viewset.request
+        viewset.initial(request, *args, **kwargs)
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        viewset.value_plan = None
+        if not self.detail and isinstance(viewset, ValueListMixin):
+            viewset.value_plan = viewset.get_value_plan()
+        cached = None
+        if not self.detail and isinstance(viewset, CachedListMixin):
+            viewset.list_cache_key = viewset.get_list_cache_key(request)
+            cached = cache.get(viewset.list_cache_key)
+        return queryset, cached
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.build_viewset(request, *args, **kwargs)
+        drf_request = viewset.request
+        try:
+            queryset, cached = await sync_to_async(self.prepare)(viewset, *args, **kwargs)
+            if self.detail:
+                response = await self.retrieve(viewset, queryset)
+            elif cached is not None:
+                response = viewset.cached_list_response(drf_request, cached)
+            else:
+                response = await self.list(viewset, queryset)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+        if response is None:
+            return await self.fallback(request, *args, **kwargs)
+        response = viewset.finalize_response(drf_request, response, *args, **kwargs)
+        # Render here rather than in a thread, since nothing left touches the database
+        return response.render() if hasattr(response, 'render') else response
+
+    async def list(self, viewset, queryset):
+        paginator = viewset.paginator
+        request = viewset.request
+        if not isinstance(paginator, KeysetPagination) or not paginator.use_keyset(request):
+            return None
+        plan = viewset.value_plan
+        if plan is not None:
+            paginator.position = plan.position
+            queryset = plan.queryset(queryset)
+        rows = await paginator.apaginate_queryset(queryset, request, viewset)
+        if rows is None:
+            return None
+        if plan is not None:
+            with timed_serialization(request):
+                data = await plan.arows(rows)
+        else:
+            data = viewset.get_serializer(rows, many=True).data
+        if not isinstance(viewset, CachedListMixin):
+            return paginator.get_paginated_response(data)
+        cached = viewset.build_list_entry(paginator.get_paginated_response(data).data)
+        await cache.aset(viewset.list_cache_key, cached, settings.LIST_CACHE_TIMEOUT)
+        return viewset.cached_list_response(request, cached)
+
+    async def retrieve(self, viewset, queryset):
+        lookup_url_kwarg = viewset.lookup_url_kwarg or viewset.lookup_field
+        try:
+            obj = await queryset.aget(**{viewset.lookup_field: viewset.kwargs[lookup_url_kwarg]})
+        except queryset.model.DoesNotExist:
+            raise Http404
+        await sync_to_async(viewset.check_object_permissions)(viewset.request, obj)
+        return Response(viewset.get_serializer(obj).data)
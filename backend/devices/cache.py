@@ -0,0 +1,104 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Device
+
+
+def generation_key(model):
+    return f'devices:generation:{model._meta.label_lower}'
+
+
+def get_generations(models):
+    """
+    Return the current cache generation of each model, in order.
+
+    A missing generation is seeded from the clock so that an evicted counter
+    can never come back with a value an older cache entry was built from.
+    """
+    keys = [generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, time.time_ns(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(model):
+    """
+    Invalidate every cached response built from ``model``.
+
+    The generation is bumped immediately and again once the surrounding
+    transaction commits, so responses cached from a concurrent read of the
+    pre-commit state are discarded as well.
+    """
+    def bump():
+        try:
+            cache.incr(generation_key(model))
+        except ValueError:
+            cache.set(generation_key(model), time.time_ns(), None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def assigned_devices_key(user_id):
+    return f'devices:assigned:{user_id}'
+
+
+def get_assigned_device_ids(user_id):
+    """
+    Return the ids of the devices assigned to a user, cached until an
+    assignment changes.
+    """
+    key = assigned_devices_key(user_id)
+    device_ids = cache.get(key)
+    if device_ids is None:
+        device_ids = list(Device.objects.filter(assigned_to_id=user_id).values_list('pk', flat=True))
+        cache.set(key, device_ids, settings.ASSIGNED_DEVICES_TIMEOUT)
+    return frozenset(device_ids)
+
+
+def invalidate_assigned_devices(*user_ids):
+    """
+    Drop the cached device ids of the given users, immediately and again once
+    the surrounding transaction commits.
+    """
+    keys = [assigned_devices_key(user_id) for user_id in user_ids if user_id is not None]
+    if not keys:
+        return
+
+    def delete():
+        cache.delete_many(keys)
+
+    delete()
+    transaction.on_commit(delete)
+
+
+def role_scope(user):
+    """
+    Describe the rows a user can see, so users with identical visibility share entries.
+    """
+    if user.is_staff or user.is_manager():
+        return 'all'
+    if user.is_engineer():
+        return f'engineer:{user.pk}'
+    return 'none'
+
+
+def list_cache_key(name, request, models):
+    """
+    Build the cache key for a list response from the role scope, the current
+    generations of the models it reads and the normalized query parameters.
+    """
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    digest = hashlib.sha1(repr((request.get_host(), params)).encode()).hexdigest()
+    generations = '.'.join(str(generation) for generation in get_generations(models))
+    return f'devices:list:{name}:{role_scope(request.user)}:{generations}:{digest}'
@@ -0,0 +1,66 @@
+from django.db import connection, models
+from django.db.models import CharField, Func
+from django.db.models.fields.json import KeyTransform
+from django.db.models.lookups import Exact, IsNull
+from .models import TestResult
+
+
+def data_key_present(key):
+    """
+    Condition matching results whose ``data`` has ``key``, written as
+    ``data -> key IS NOT NULL`` rather than ``data ? key`` so that the
+    expression indexes below can serve it.
+    """
+    return IsNull(KeyTransform(key, 'data'), False)
+
+
+def data_key_typed(key, json_type):
+    """
+    Condition matching results whose ``data -> key`` is a JSON ``json_type``
+    such as ``'number'``, for comparisons that jsonb would otherwise also
+    apply across types.
+    """
+    return Exact(Func(KeyTransform(key, 'data'), function='jsonb_typeof', output_field=CharField()), json_type)
+
+
+def data_index_prefix(protocol_id):
+    return f'result_data_p{protocol_id}_'
+
+
+def data_index(protocol_id, key):
+    """
+    Partial expression index on ``data -> key`` for one protocol's results.
+    """
+    return models.Index(
+        KeyTransform(key, 'data'),
+        condition=models.Q(protocol_id=protocol_id),
+        name=f'{data_index_prefix(protocol_id)}{key}',
+    )
+
+
+def sync_data_indexes(protocol_id, keys, concurrently=True):
+    """
+    Create the expression indexes for a protocol's ``indexed_data_keys`` and
+    drop those for keys it no longer declares. Pass no keys to drop them all.
+
+    Indexes are built ``CONCURRENTLY`` by default so result writes are not
+    blocked, which cannot happen inside a transaction. A no-op outside
+    PostgreSQL. Returns the names of the created and dropped indexes.
+    """
+    if connection.vendor != 'postgresql':
+        return [], []
+
+    prefix = data_index_prefix(protocol_id)
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, TestResult._meta.db_table)
+    existing = {name for name in constraints if name.startswith(prefix)}
+    wanted = {data_index(protocol_id, key).name: key for key in keys}
+
+    created = sorted(wanted.keys() - existing)
+    dropped = sorted(existing - wanted.keys())
+    with connection.schema_editor(atomic=not concurrently) as editor:
+        for name in created:
+            editor.add_index(TestResult, data_index(protocol_id, wanted[name]), concurrently=concurrently)
+        for name in dropped:
+            editor.remove_index(TestResult, models.Index(fields=['data'], name=name), concurrently=concurrently)
+    return created, dropped
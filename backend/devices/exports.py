@@ -0,0 +1,215 @@
+import csv
+import gzip
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+from .filters import DeviceFilter, TestResultFilter
+from .mixins import scope_to_user
+from .models import Device, TestResult
+
+# Exported column -> values() expression
+RESULT_EXPORT_FIELDS = {
+    'id': F('id'),
+    'device': F('device_id'),
+    'device_name': F('device__name'),
+    'protocol': F('protocol_id'),
+    'protocol_name': F('protocol__name'),
+    'performed_by': F('performed_by_id'),
+    'performed_by_username': F('performed_by__username'),
+    'status': F('status'),
+    'start_time': F('start_time'),
+    'end_time': F('end_time'),
+    'notes': F('notes'),
+    'data': F('data'),
+    'created_at': F('created_at'),
+    'updated_at': F('updated_at'),
+}
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+class Echo:
+    """
+    File-like object whose ``write`` returns the value instead of storing it.
+    """
+    def write(self, value):
+        return value
+
+
+def export_values(queryset, fields):
+    """
+    Return a ``values()`` queryset selecting the export columns.
+    """
+    aliases = {f'export_{name}': expression for name, expression in fields.items()}
+    return queryset.select_related(None).values(**aliases)
+
+
+def rename(rows, fields):
+    for row in rows:
+        yield {name: row[f'export_{name}'] for name in fields}
+
+
+def export_rows(queryset, fields, chunk_size):
+    """
+    Yield plain dicts for ``queryset`` using a server-side cursor.
+
+    Rows come from ``values()`` so no model instances are built and memory stays
+    flat however many rows are exported.
+    """
+    return rename(export_values(queryset, fields).iterator(chunk_size=chunk_size), fields)
+
+
+def csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(rows, fields, header=True):
+    """
+    Yield CSV encoded lines, header first. JSON columns are written as JSON text.
+    """
+    writer = csv.writer(Echo())
+    if header:
+        yield writer.writerow(list(fields))
+    for row in rows:
+        yield writer.writerow([csv_value(value) for value in row.values()])
+
+
+def ndjson_lines(rows):
+    """
+    Yield one JSON document per row.
+    """
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def encode(rows, fields, export_format, header=True):
+    if export_format == 'csv':
+        return csv_lines(rows, fields, header)
+    return ndjson_lines(rows)
+
+
+DEVICE_EXPORT_FIELDS = {
+    'id': F('id'),
+    'name': F('name'),
+    'device_type': F('device_type'),
+    'model_number': F('model_number'),
+    'manufacturer': F('manufacturer'),
+    'description': F('description'),
+    'assigned_to': F('assigned_to_id'),
+    'assigned_to_username': F('assigned_to__username'),
+    'created_at': F('created_at'),
+    'updated_at': F('updated_at'),
+}
+
+
+def progress_key(job_id):
+    return f'devices:export:{job_id}:progress'
+
+
+def get_progress(job):
+    """
+    Return the live progress of a job from Redis, falling back to its last checkpoint.
+    """
+    return cache.get(progress_key(job.id)) or {
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+    }
+
+
+EXPORT_FILTERSETS = {
+    'devices': DeviceFilter,
+    'results': TestResultFilter,
+}
+
+
+def filter_errors(resource, filters):
+    """
+    Return the errors of stored export filters for ``resource``, empty if they are valid.
+    """
+    filterset = EXPORT_FILTERSETS[resource](filters)
+    return {} if filterset.is_valid() else dict(filterset.errors)
+
+
+def job_queryset(job):
+    """
+    Rebuild the scoped, filtered queryset a job exports from its stored filters.
+    """
+    if job.resource == 'devices':
+        queryset = scope_to_user(Device.objects.all(), job.created_by)
+        fields = DEVICE_EXPORT_FIELDS
+    else:
+        queryset = scope_to_user(TestResult.objects.all(), job.created_by, 'device__assigned_to')
+        fields = RESULT_EXPORT_FIELDS
+    filterset = EXPORT_FILTERSETS[job.resource](job.filters, queryset=queryset)
+    if not filterset.is_valid():
+        raise ValueError(f'Invalid export filters: {dict(filterset.errors)}')
+    return filterset.qs, fields
+
+
+def checkpoint(job, output):
+    """
+    Persist a job's position after a complete gzip member has been written.
+    """
+    output.flush()
+    job.bytes_written = output.tell()
+    job.save(update_fields=['last_pk', 'rows_written', 'bytes_written', 'updated_at'])
+    cache.set(progress_key(job.id), {
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+    }, settings.EXPORT_PROGRESS_TIMEOUT)
+
+
+def run_export_job(job):
+    """
+    Export a job's rows to a gzip file in primary key order.
+
+    Each chunk is compressed as its own gzip member and appended to the file, so
+    the file is valid after every checkpoint. A resumed job truncates anything
+    written after the last checkpoint and continues from ``last_pk``.
+    """
+    queryset, fields = job_queryset(job)
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    export_root = Path(settings.EXPORT_ROOT)
+    export_root.mkdir(parents=True, exist_ok=True)
+    path = export_root / f'{job.id}.{job.export_format}.gz'
+
+    job.status = 'RUNNING'
+    job.file_path = str(path)
+    if job.total_rows is None:
+        job.total_rows = queryset.count()
+    job.save(update_fields=['status', 'file_path', 'total_rows', 'updated_at'])
+
+    with open(path, 'ab') as output:
+        output.truncate(job.bytes_written)
+        output.seek(job.bytes_written)
+        if job.export_format == 'csv' and job.bytes_written == 0:
+            output.write(gzip.compress(''.join(csv_lines([], fields)).encode()))
+            checkpoint(job, output)
+
+        while True:
+            values = export_values(queryset.filter(pk__gt=job.last_pk).order_by('pk'), fields)
+            rows = list(rename(values[:chunk_size], fields))
+            if not rows:
+                break
+            lines = encode(rows, fields, job.export_format, header=False)
+            output.write(gzip.compress(''.join(lines).encode()))
+            job.last_pk = rows[-1]['id']
+            job.rows_written += len(rows)
+            checkpoint(job, output)
+
+    job.status = 'COMPLETED'
+    job.completed_at = timezone.now()
+    job.save(update_fields=['status', 'completed_at', 'updated_at'])
+    return job
@@ -0,0 +1,178 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from django_filters.constants import EMPTY_VALUES
+from django_filters.rest_framework import FilterSet, BooleanFilter, CharFilter, ChoiceFilter, DateFilter, DateTimeFilter, NumberFilter
+from .data_indexes import data_key_present, data_key_typed
+from .models import Device, TestProtocol, TestResult, TestResultDailyRollup
+
+class DayFilter(DateTimeFilter):
+    """
+    Match a datetime column by calendar day.
+
+    Equivalent to ``lookup_expr='date'`` but compiled to a half-open range on
+    the raw column so that indexes on it can be used.
+    """
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        day = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        end = start + timedelta(days=1)
+        return self.get_method(qs)(**{
+            f'{self.field_name}__gte': start,
+            f'{self.field_name}__lt': end,
+        })
+
+class DayBoundFilter(DateFilter):
+    """
+    Compare a datetime column against the start of the given day.
+    """
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        return super().filter(qs, timezone.make_aware(datetime.combine(value, time.min)))
+
+def json_value(value):
+    """
+    Convert a parsed filter value to its JSON equivalent.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+class DataKeyFilterMixin:
+    """
+    Filter on one key of ``TestResult.data``.
+
+    Equality compiles to JSON containment (``data @> {key: value}``), which the
+    ``jsonb_path_ops`` GIN index serves. Comparisons compile to ``data -> key``,
+    which per-protocol expression indexes serve when the query also filters on
+    that protocol, and only match values of the filter's JSON type, since jsonb
+    orders every string before and every boolean after any number.
+    """
+    json_type = None
+
+    def __init__(self, *args, key=None, **kwargs):
+        self.key = key
+        kwargs.setdefault('label', f"data.{key} ({kwargs.get('lookup_expr', 'exact')})")
+        super().__init__(*args, field_name='data', **kwargs)
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        value = json_value(value)
+        if self.lookup_expr == 'exact':
+            return self.get_method(qs)(data__contains={self.key: value})
+        return self.get_method(qs)(
+            data_key_typed(self.key, self.json_type),
+            **{f'data__{self.key}__{self.lookup_expr}': value}
+        )
+
+class DataNumberFilter(DataKeyFilterMixin, NumberFilter):
+    json_type = 'number'
+
+class DataCharFilter(DataKeyFilterMixin, CharFilter):
+    pass
+
+class DataBooleanFilter(DataKeyFilterMixin, BooleanFilter):
+    pass
+
+class DataHasKeyFilter(ChoiceFilter):
+    """
+    Match results whose ``data`` has the given key. Compiles to
+    ``data -> key IS NOT NULL`` so per-protocol expression indexes apply.
+    """
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        return self.get_method(qs)(data_key_present(value))
+
+# Value type -> (filter class, lookups accepted as data__<key>__<lookup>)
+DATA_FILTER_TYPES = {
+    'number': (DataNumberFilter, ['exact', 'gt', 'gte', 'lt', 'lte']),
+    'string': (DataCharFilter, ['exact']),
+    'boolean': (DataBooleanFilter, ['exact']),
+}
+
+def data_filters(keys):
+    """
+    Build the ``data__*`` filters for a whitelist of ``{key: value type}``.
+    """
+    filters = {
+        'data__has_key': DataHasKeyFilter(field_name='data', choices=[(key, key) for key in keys]),
+    }
+    for key, value_type in keys.items():
+        filter_class, lookups = DATA_FILTER_TYPES[value_type]
+        for lookup in lookups:
+            name = f'data__{key}' if lookup == 'exact' else f'data__{key}__{lookup}'
+            filters[name] = filter_class(key=key, lookup_expr=lookup)
+    return filters
+
+class DeviceFilter(FilterSet):
+    name = CharFilter(lookup_expr='icontains')
+    model_number = CharFilter(lookup_expr='icontains')
+    manufacturer = CharFilter(lookup_expr='icontains')
+    description = CharFilter(lookup_expr='icontains')
+    device_type = ChoiceFilter(choices=Device.DEVICE_TYPES)
+    created_at = DayFilter()
+    updated_at = DayFilter()
+    assigned_to = NumberFilter()
+
+    class Meta:
+        model = Device
+        fields = ['name', 'model_number', 'manufacturer', 'description', 'device_type', 
+                 'created_at', 'updated_at', 'assigned_to']
+
+class TestProtocolFilter(FilterSet):
+    name = CharFilter(lookup_expr='icontains')
+    version = CharFilter(lookup_expr='icontains')
+    description = CharFilter(lookup_expr='icontains')
+    status = ChoiceFilter(choices=TestProtocol.STATUS_CHOICES)
+    created_by = NumberFilter()
+    created_at = DayFilter()
+    updated_at = DayFilter()
+    devices = NumberFilter()
+
+    class Meta:
+        model = TestProtocol
+        fields = ['name', 'version', 'description', 'status', 'created_by', 
+                 'created_at', 'updated_at', 'devices']
+
+class TestResultFilter(FilterSet):
+    device = NumberFilter()
+    protocol = NumberFilter()
+    performed_by = NumberFilter()
+    status = ChoiceFilter(choices=TestResult.RESULT_STATUS)
+    start_time = DayFilter()
+    end_time = DayFilter()
+    notes = CharFilter(lookup_expr='icontains')
+    created_at = DayFilter()
+    updated_at = DayFilter()
+    started_after = DayBoundFilter(field_name='start_time', lookup_expr='gte')
+    started_before = DayBoundFilter(field_name='start_time', lookup_expr='lt')
+
+    class Meta:
+        model = TestResult
+        fields = ['device', 'protocol', 'performed_by', 'status', 'start_time', 
+                 'end_time', 'notes', 'created_at', 'updated_at', 'started_after', 'started_before']
+
+    @classmethod
+    def get_filters(cls):
+        filters = super().get_filters()
+        # Only whitelisted data keys can be filtered on
+        filters.update(data_filters(settings.RESULT_DATA_FILTER_KEYS))
+        return filters
+
+class TestResultDailyRollupFilter(FilterSet):
+    device = NumberFilter()
+    protocol = NumberFilter()
+    status = ChoiceFilter(choices=TestResult.RESULT_STATUS)
+    started_after = DateFilter(field_name='day', lookup_expr='gte')
+    started_before = DateFilter(field_name='day', lookup_expr='lt')
+
+    class Meta:
+        model = TestResultDailyRollup
+        fields = ['device', 'protocol', 'status', 'started_after', 'started_before']
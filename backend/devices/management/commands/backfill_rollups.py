@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from devices.models import TestResult
+from devices.rollups import recompute_days, set_watermark
+
+class Command(BaseCommand):
+    help = "Rebuild the daily test result rollups from historical results"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--chunk-days', type=int, default=7, help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError("--chunk-days must be at least 1")
+
+        started_at = timezone.now()
+        bounds = TestResult.objects.aggregate(first=Min('start_time'), last=Max('start_time'))
+        if bounds['first'] is None:
+            self.stdout.write("No test results to roll up")
+            return
+
+        start = options['start'] or timezone.localdate(bounds['first'])
+        end = options['end'] or timezone.localdate(bounds['last'])
+        chunk = timedelta(days=options['chunk_days'])
+
+        total = 0
+        day = start
+        while day <= end:
+            chunk_end = min(day + chunk - timedelta(days=1), end)
+            count = recompute_days(day, chunk_end)
+            total += count
+            self.stdout.write(f"Rebuilt {count} rollup rows for {day} to {chunk_end}")
+            day = chunk_end + timedelta(days=1)
+
+        # Results changed while backfilling are picked up by the next refresh
+        if options['start'] is None and options['end'] is None:
+            set_watermark(started_at)
+        self.stdout.write(self.style.SUCCESS(f"Rollup backfill completed: {total} rows"))
@@ -0,0 +1,294 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from users.authentication import invalidate_tokens
+from users.models import CustomUser
+from devices.models import Device, TestProtocol, TestResult
+from devices.synthetic import rolled_back, seeded
+
+# Synthetic data sets passed to `seed`: (devices, results, engineers)
+DATASETS = {
+    'tiny': (20, 300, 3),
+    'small': (200, 5000, 10),
+    'medium': (2000, 100000, 50),
+    'large': (20000, 1000000, 200),
+}
+
+
+class Scenario:
+    """
+    One API call to time. ``path`` and ``data`` may be callables taking the
+    request number, so that detail and write requests can vary their target.
+    """
+    def __init__(self, name, path, method='get', data=None):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+
+    def request(self, i):
+        path = self.path(i) if callable(self.path) else self.path
+        data = self.data(i) if callable(self.data) else self.data
+        return path, data
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the devices and users APIs end to end through an in-process WSGI or ASGI client, "
+        "reporting latency percentiles, throughput and queries per request. Each data set is "
+        "seeded and every write is made inside a transaction that is rolled back at the end. "
+        "As nothing commits, on_commit work never runs: write scenarios such as complete, bulk "
+        "and assign leave out notification buffering, rollup tasks and the post-commit cache "
+        "invalidation, so they under-report their cost, and list scenarios only see the "
+        "invalidation writes make immediately. Requests are sent one at a time; see "
+        "benchmark_serving for concurrent load."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', action='append', dest='sizes', choices=list(DATASETS),
+                            help='Synthetic data set to seed and benchmark, repeatable (default: small)')
+        parser.add_argument('--existing', action='store_true',
+                            help='Benchmark the data already in the database instead of seeding')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run scenarios whose name starts with this, repeatable')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per scenario')
+        parser.add_argument('--interface', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Baseline JSON file to check the results against')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative p95 slowdown flagged as a regression')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Ignore p95 slowdowns smaller than this')
+
+    def scenarios(self, ids):
+        devices, results, in_progress = ids['devices'], ids['results'], ids['in_progress']
+        engineer, links = ids['engineer'], ids['links']
+        now = timezone.now()
+
+        def bulk_rows(i):
+            return [
+                {
+                    'device': device_id,
+                    'protocol': protocol_id,
+                    'status': 'PASS',
+                    'start_time': (now - timedelta(minutes=n)).isoformat(),
+                    'data': {'voltage': 3.3, 'error_count': 0},
+                }
+                for n, (protocol_id, device_id) in enumerate(links[(i * 100 + k) % len(links)] for k in range(100))
+            ]
+
+        return [
+            Scenario('devices.list', '/api/devices/devicelist/'),
+            Scenario('devices.filter', f'/api/devices/devicelist/?device_type=MONITORING&assigned_to={engineer}'),
+            Scenario('devices.search', '/api/devices/devicelist/?search=cardiac+monitor'),
+            Scenario('devices.retrieve', lambda i: f'/api/devices/devicelist/{devices[i % len(devices)]}/'),
+            Scenario('devices.assign', lambda i: f'/api/devices/devicelist/{devices[i % len(devices)]}/assign/',
+                     'post', {'user_id': engineer}),
+            Scenario('protocols.list', '/api/devices/protocols/'),
+            Scenario('protocols.retrieve', f'/api/devices/protocols/{ids["protocol"]}/'),
+            Scenario('results.list', '/api/devices/results/'),
+            Scenario('results.filter', f'/api/devices/results/?status=FAIL&device={devices[0]}'),
+            Scenario('results.data_filter', '/api/devices/results/?data__voltage__gt=3.35'),
+            Scenario('results.search', '/api/devices/results/?search=drift'),
+            Scenario('results.retrieve', lambda i: f'/api/devices/results/{results[i % len(results)]}/'),
+            Scenario('results.stats', '/api/devices/results/stats/?group_by=device_type'),
+            Scenario('results.stats_rollups', '/api/devices/results/stats/?group_by=device_type&source=rollups'),
+            Scenario('results.complete', lambda i: f'/api/devices/results/{in_progress[i]}/complete/',
+                     'post', {'status': 'PASS', 'end_time': now.isoformat()}),
+            Scenario('results.bulk', '/api/devices/results/bulk/', 'post', bulk_rows),
+            Scenario('users.list', '/api/users/users/'),
+        ]
+
+    def collect_ids(self, calls):
+        """
+        Pick the rows the scenarios address, topping up in-progress results so
+        every ``complete`` call has one to close.
+        """
+        devices = list(Device.objects.order_by('pk').values_list('pk', flat=True)[:1000])
+        results = list(TestResult.objects.order_by('-pk').values_list('pk', flat=True)[:1000])
+        links = list(TestProtocol.devices.through.objects.order_by('pk').values_list('testprotocol_id', 'device_id')[:5000])
+        engineer = CustomUser.objects.filter(role__name='ENGINEER').order_by('pk').values_list('pk', flat=True).first()
+        if not devices or not results or not links or engineer is None:
+            raise CommandError("The database needs devices, protocols, results and an engineer")
+
+        in_progress = list(TestResult.objects.filter(status='IN_PROGRESS').values_list('pk', flat=True)[:calls])
+        if len(in_progress) < calls:
+            template = TestResult.objects.get(pk=results[0])
+            extra = TestResult.objects.bulk_create([
+                TestResult(device_id=template.device_id, protocol_id=template.protocol_id,
+                           performed_by_id=template.performed_by_id, status='IN_PROGRESS')
+                for _ in range(calls - len(in_progress))
+            ])
+            in_progress += [result.pk for result in extra]
+        return {
+            'devices': devices,
+            'results': results,
+            'in_progress': in_progress,
+            'links': links,
+            'engineer': engineer,
+            'protocol': links[0][0],
+        }
+
+    def send(self, client, scenario, i):
+        path, data = scenario.request(i)
+        kwargs = {'data': json.dumps(data), 'content_type': 'application/json'} if data is not None else {}
+        call = getattr(client, scenario.method)
+        if isinstance(client, AsyncClient):
+            return async_to_sync(call)(path, **kwargs)
+        return call(path, **kwargs)
+
+    def run_scenario(self, client, scenario, options):
+        for i in range(options['warmup']):
+            self.send(client, scenario, i)
+
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for i in range(options['warmup'], options['warmup'] + options['requests']):
+            request_started = time.perf_counter()
+            response = self.send(client, scenario, i)
+            latencies.append((time.perf_counter() - request_started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+            request = getattr(response, 'wsgi_request', None) or getattr(response, 'asgi_request', None)
+            metrics = getattr(request, 'metrics', None)
+            if metrics is not None:
+                queries.append(metrics.queries)
+        elapsed = time.perf_counter() - started
+
+        percentiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'throughput_rps': round(len(latencies) / elapsed, 1),
+            'queries_mean': round(statistics.mean(queries), 2) if queries else None,
+            'queries_max': max(queries) if queries else None,
+        }
+
+    def benchmark(self, label, sizes, options):
+        user, _ = CustomUser.objects.get_or_create(
+            username='benchmark-manager',
+            defaults={'email': 'benchmark@vitalbio.com', 'is_staff': True, 'is_superuser': True}
+        )
+        token, _ = Token.objects.get_or_create(user=user)
+        client_class = AsyncClient if options['interface'] == 'asgi' else Client
+        if client_class is AsyncClient:
+            # AsyncClient defaults are sent as raw ASGI headers
+            client = AsyncClient(authorization=f'Token {token.key}')
+        else:
+            client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        calls = options['warmup'] + options['requests']
+        scenarios = self.scenarios(self.collect_ids(calls))
+        if options['scenarios']:
+            scenarios = [s for s in scenarios if any(s.name.startswith(prefix) for prefix in options['scenarios'])]
+
+        self.stdout.write(f"{label}: {sizes}")
+        report = {}
+        try:
+            for scenario in scenarios:
+                report[scenario.name] = stats = self.run_scenario(client, scenario, options)
+                self.stdout.write(
+                    f"  {scenario.name:<20} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                    f"p99 {stats['p99_ms']:8.2f} ms  {stats['throughput_rps']:8.1f} req/s  "
+                    f"queries {stats['queries_mean']}" + (f"  errors {stats['errors']}" if stats['errors'] else "")
+                )
+        finally:
+            # The token is rolled back, but authentication cached it in Redis
+            invalidate_tokens([token.key])
+        return report
+
+    def run_dataset(self, label, options):
+        # Seeding and every write are rolled back at the end
+        if label == 'existing':
+            with rolled_back():
+                sizes = {
+                    'devices': Device.objects.count(),
+                    'results': TestResult.objects.count(),
+                    'engineers': CustomUser.objects.filter(role__name='ENGINEER').count(),
+                }
+                return {'dataset': sizes, 'scenarios': self.benchmark(label, sizes, options)}
+
+        devices, results, engineers = DATASETS[label]
+        sizes = {'devices': devices, 'results': results, 'engineers': engineers}
+        self.stdout.write(f"Seeding {label}...")
+        with seeded(devices, results, engineers, seed=options['seed']):
+            return {'dataset': sizes, 'scenarios': self.benchmark(label, sizes, options)}
+
+    def compare(self, results, baseline, options):
+        """
+        Return the regressions of ``results`` against ``baseline``: p95 slower
+        by more than the threshold, or more queries per request.
+        """
+        regressions = []
+        for label, dataset in results['datasets'].items():
+            base_dataset = baseline.get('datasets', {}).get(label)
+            if base_dataset is None:
+                continue
+            for name, stats in dataset['scenarios'].items():
+                base = base_dataset['scenarios'].get(name)
+                if base is None:
+                    continue
+                delta = stats['p95_ms'] - base['p95_ms']
+                if delta > options['min_delta_ms'] and stats['p95_ms'] > base['p95_ms'] * (1 + options['threshold']):
+                    regressions.append(f"{label} {name}: p95 {base['p95_ms']:.2f} -> {stats['p95_ms']:.2f} ms")
+                if stats['errors'] > base['errors']:
+                    regressions.append(f"{label} {name}: errors {base['errors']} -> {stats['errors']}")
+                if None not in (stats['queries_mean'], base['queries_mean']) and stats['queries_mean'] > base['queries_mean']:
+                    regressions.append(f"{label} {name}: queries {base['queries_mean']} -> {stats['queries_mean']}")
+        return regressions
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['warmup'] < 0:
+            raise CommandError("--requests must be at least 1 and --warmup not negative")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        labels = ['existing'] if options['existing'] else options['sizes'] or ['small']
+        try:
+            # Allows the test client's host and keeps notification emails in memory
+            setup_test_environment()
+            owns_environment = True
+        except RuntimeError:
+            owns_environment = False
+        try:
+            # Queries per request are reported, so skip the duplicate query log
+            with override_settings(METRICS_DUPLICATE_QUERY_THRESHOLD=0):
+                results = {
+                    'created_at': timezone.now().isoformat(),
+                    'interface': options['interface'],
+                    'database': connection.vendor,
+                    'requests': options['requests'],
+                    'datasets': {label: self.run_dataset(label, options) for label in labels},
+                }
+        finally:
+            if owns_environment:
+                teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if baseline is not None:
+            regressions = self.compare(results, baseline, options)
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f"REGRESSION {regression}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
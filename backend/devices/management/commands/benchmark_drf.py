@@ -0,0 +1,260 @@
+import cProfile
+import linecache
+import pstats
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from config.metrics import RequestMetrics
+from users.models import CustomUser
+from users.permissions import DeviceAccessPermission
+from devices.mixins import plan_queryset
+from devices.models import Device, TestProtocol, TestResult
+from devices.serializers import DeviceSerializer, TestProtocolSerializer, TestResultSerializer
+from devices.filters import DeviceFilter, TestResultFilter
+from devices.synthetic import rolled_back, seeded
+
+
+class Case:
+    """
+    One microbenchmark: ``run`` does the work for ``count`` objects and
+    returns whatever it built, which is kept alive while allocations are
+    measured.
+    """
+    def __init__(self, name, count, run):
+        self.name = name
+        self.count = count
+        self.run = run
+
+
+class Command(BaseCommand):
+    help = (
+        "Time serializer output and validation, filterset queryset construction and device access "
+        "permission checks object by object, reporting cost, queries and tracemalloc allocations "
+        "per object. Synthetic data is seeded and rolled back unless --existing is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--existing', action='store_true',
+                            help='Use the data already in the database instead of seeding')
+        parser.add_argument('--devices', type=int, default=2000, help='Synthetic devices to seed')
+        parser.add_argument('--results', type=int, default=20000, help='Synthetic test results to seed')
+        parser.add_argument('--engineers', type=int, default=20, help='Synthetic engineers to seed')
+        parser.add_argument('--objects', type=int, default=2000,
+                            help='Objects serialized, validated or checked per run')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case')
+        parser.add_argument('--case', action='append', dest='cases',
+                            help='Only run cases whose name starts with this, repeatable')
+        parser.add_argument('--profile', type=int, default=0, metavar='N',
+                            help='Print the N functions with the most own time per case')
+        parser.add_argument('--top', type=int, default=0, metavar='N',
+                            help='Print the N source lines holding the most retained memory per case')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def load(self, model, serializer_class, limit):
+        queryset = plan_queryset(model.objects.order_by('-pk'), serializer_class)
+        objects = list(queryset[:limit])
+        if not objects:
+            raise CommandError(f"The database has no {model._meta.verbose_name_plural}")
+        return objects
+
+    def device_payloads(self, devices):
+        payloads = []
+        for device in DeviceSerializer(devices, many=True).data:
+            payload = {name: device[name] for name in
+                       ('name', 'device_type', 'manufacturer', 'description', 'assigned_to')}
+            # Fresh model numbers so the unique check passes
+            payload['model_number'] = f"{device['model_number']}-B"
+            payloads.append(payload)
+        return payloads
+
+    def protocol_payloads(self, protocols, count):
+        payloads = []
+        for i in range(count):
+            protocol = TestProtocolSerializer(protocols[i % len(protocols)]).data
+            payloads.append({
+                'name': f"Benchmark {i}",
+                'version': protocol['version'],
+                'description': protocol['description'],
+                'status': protocol['status'],
+                'devices': protocol['devices'][:5],
+                'indexed_data_keys': protocol['indexed_data_keys'],
+            })
+        return payloads
+
+    def result_payloads(self, results):
+        return [
+            {name: result[name] for name in
+             ('device', 'protocol', 'performed_by', 'status', 'start_time', 'end_time', 'notes', 'data')}
+            for result in TestResultSerializer(results, many=True).data
+        ]
+
+    def access_request(self, user):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = user
+        return request
+
+    def validate(self, serializer_class, payloads):
+        serializers = [serializer_class(data=payload) for payload in payloads]
+        invalid = [serializer.errors for serializer in serializers if not serializer.is_valid()]
+        if invalid:
+            raise CommandError(f"{serializer_class.__name__} rejected a payload: {invalid[0]}")
+        return serializers
+
+    def build_filters(self, filterset_class, params, queryset, count, compile_sql):
+        built = []
+        for _ in range(count):
+            filterset = filterset_class(params, queryset=queryset)
+            qs = filterset.qs
+            built.append(qs.query.sql_with_params() if compile_sql else qs)
+        return built
+
+    def check_permission(self, request, objects):
+        permission = DeviceAccessPermission()
+        # A fresh request so the access context is resolved inside the timed run
+        request = self.access_request(request.user)
+        return [permission.has_object_permission(request, None, obj) for obj in objects]
+
+    def cases(self, limit):
+        devices = self.load(Device, DeviceSerializer, limit)
+        protocols = self.load(TestProtocol, TestProtocolSerializer, limit)
+        results = self.load(TestResult, TestResultSerializer, limit)
+        device_payloads = self.device_payloads(devices)
+        protocol_payloads = self.protocol_payloads(protocols, limit)
+        result_payloads = self.result_payloads(results)
+
+        manager = CustomUser.objects.filter(role__name='MANAGER').select_related('role').first()
+        engineer = (
+            CustomUser.objects.filter(role__name='ENGINEER').select_related('role')
+            .annotate(device_count=Count('assigned_devices')).order_by('-device_count').first()
+        )
+        if manager is None or engineer is None:
+            raise CommandError("The database needs a manager and an engineer")
+        manager_request, engineer_request = self.access_request(manager), self.access_request(engineer)
+
+        # Filters address days that hold data, so the querysets are not trivially empty
+        failed = next((result for result in results if result.status == 'FAIL'), results[0])
+        started = failed.start_time.date()
+        device_params = {
+            'name': 'monitor', 'device_type': 'MONITORING', 'created_at': devices[0].created_at.date().isoformat(),
+            'assigned_to': str(engineer.pk),
+        }
+        result_params = {
+            'status': 'FAIL', 'device': str(failed.device_id),
+            'started_after': (started - timedelta(days=15)).isoformat(),
+            'started_before': (started + timedelta(days=15)).isoformat(),
+            'data__voltage__gt': '3.3', 'data__firmware_version': '2.4.1',
+        }
+        device_queryset = plan_queryset(Device.objects.all(), DeviceSerializer)
+        result_queryset = plan_queryset(TestResult.objects.all(), TestResultSerializer)
+
+        return [
+            Case('serialize.device', len(devices), lambda: DeviceSerializer(devices, many=True).data),
+            Case('serialize.protocol', len(protocols), lambda: TestProtocolSerializer(protocols, many=True).data),
+            Case('serialize.result', len(results), lambda: TestResultSerializer(results, many=True).data),
+            Case('validate.device', len(device_payloads),
+                 lambda: self.validate(DeviceSerializer, device_payloads)),
+            Case('validate.protocol', len(protocol_payloads),
+                 lambda: self.validate(TestProtocolSerializer, protocol_payloads)),
+            Case('validate.result', len(result_payloads),
+                 lambda: self.validate(TestResultSerializer, result_payloads)),
+            Case('filter.device', limit,
+                 lambda: self.build_filters(DeviceFilter, device_params, device_queryset, limit, False)),
+            Case('filter.device.sql', limit,
+                 lambda: self.build_filters(DeviceFilter, device_params, device_queryset, limit, True)),
+            Case('filter.result', limit,
+                 lambda: self.build_filters(TestResultFilter, result_params, result_queryset, limit, False)),
+            Case('filter.result.sql', limit,
+                 lambda: self.build_filters(TestResultFilter, result_params, result_queryset, limit, True)),
+            Case('permission.device.manager', len(devices),
+                 lambda: self.check_permission(manager_request, devices)),
+            Case('permission.device.engineer', len(devices),
+                 lambda: self.check_permission(engineer_request, devices)),
+            Case('permission.protocol.engineer', len(protocols),
+                 lambda: self.check_permission(engineer_request, protocols)),
+            Case('permission.result.engineer', len(results),
+                 lambda: self.check_permission(engineer_request, results)),
+        ]
+
+    def measure(self, case, options):
+        # The first run warms caches such as serializer field construction
+        case.run()
+        metrics = RequestMetrics()
+        with metrics.capture():
+            case.run()
+
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            case.run()
+            timings.append(time.perf_counter() - started)
+
+        # Measured in a separate run since tracing slows everything down
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot() if options['top'] else None
+        baseline = tracemalloc.get_traced_memory()[0]
+        kept = case.run()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot() if options['top'] else None
+        tracemalloc.stop()
+        del kept
+
+        return {
+            'us_per_object': statistics.median(timings) * 1e6 / case.count,
+            'queries_per_object': metrics.queries / case.count,
+            'retained_per_object': (current - baseline) / case.count,
+            'peak_per_object': (peak - baseline) / case.count,
+            'allocations': after.compare_to(before, 'lineno')[:options['top']] if after else [],
+        }
+
+    def profile(self, case, limit):
+        profiler = cProfile.Profile()
+        profiler.runcall(case.run)
+        output = StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('tottime').print_stats(limit)
+        # Skip the summary header down to the column titles
+        lines = output.getvalue().splitlines()
+        start = next((i for i, line in enumerate(lines) if line.lstrip().startswith('ncalls')), 0)
+        for line in lines[start:]:
+            if line.strip():
+                self.stdout.write(f"      {line}")
+
+    def report(self, case, stats, options):
+        self.stdout.write(
+            f"{case.name:<30} {case.count:>6} objects  {stats['us_per_object']:9.2f} us/object  "
+            f"{stats['queries_per_object']:6.3f} queries/object  "
+            f"{stats['retained_per_object']:9.0f} B retained  {stats['peak_per_object']:9.0f} B peak/object"
+        )
+        for diff in stats['allocations']:
+            frame = diff.traceback[0]
+            source = linecache.getline(frame.filename, frame.lineno).strip()
+            self.stdout.write(
+                f"      {diff.size_diff / case.count:9.0f} B/object  {frame.filename}:{frame.lineno}  {source}"
+            )
+        if options['profile']:
+            self.profile(case, options['profile'])
+
+    def run_cases(self, options):
+        cases = self.cases(options['objects'])
+        if options['cases']:
+            cases = [case for case in cases if any(case.name.startswith(prefix) for prefix in options['cases'])]
+        for case in cases:
+            self.report(case, self.measure(case, options), options)
+
+    def handle(self, *args, **options):
+        if options['objects'] < 1 or options['repeat'] < 1:
+            raise CommandError("--objects and --repeat must be at least 1")
+        # Seeding and anything the cases touch are rolled back at the end
+        if options['existing']:
+            with rolled_back():
+                self.run_cases(options)
+            return
+        self.stdout.write(f"Seeding {options['devices']} devices and {options['results']} results...")
+        with seeded(options['devices'], options['results'], options['engineers'], seed=options['seed']):
+            self.run_cases(options)
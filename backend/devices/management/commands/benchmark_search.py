@@ -0,0 +1,73 @@
+import random
+import statistics
+import time
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F, Q
+from devices.models import Device
+from devices.search import SEARCH_CONFIG, device_vector
+from devices.synthetic import rolled_back
+
+
+class Command(BaseCommand):
+    help = "Compare icontains and full-text device search latency on a synthetic table"
+
+    WORDS = ['cardiac', 'neural', 'blood', 'therapy', 'monitor', 'implant', 'analyzer', 'pump',
+             'sensor', 'portable', 'wireless', 'pediatric', 'glucose', 'oxygen', 'pressure', 'infusion']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic devices to insert')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def generate(self, rows, batch_size, rng):
+        for start in range(0, rows, batch_size):
+            Device.objects.bulk_create([
+                Device(
+                    name=' '.join(rng.sample(self.WORDS, 3)).title(),
+                    device_type='DIAGNOSTIC',
+                    model_number=f'BM-{start + i:08d}',
+                    manufacturer=f'{rng.choice(self.WORDS).title()} Medical',
+                    description=' '.join(rng.choices(self.WORDS, k=12)),
+                )
+                for i in range(min(batch_size, rows - start))
+            ])
+        Device.objects.update(search_vector=device_vector())
+
+    def time_query(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset[:20])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.ERROR("The search benchmark requires PostgreSQL"))
+            return
+
+        rng = random.Random(options['seed'])
+        # Everything runs in one transaction that is rolled back at the end
+        with rolled_back():
+            self.stdout.write(f"Inserting {options['rows']} synthetic devices...")
+            self.generate(options['rows'], options['batch_size'], rng)
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Device._meta.db_table}')
+
+            query = SearchQuery('cardiac monitor', search_type='websearch', config=SEARCH_CONFIG)
+            cases = {
+                'icontains search (name, manufacturer, description)': Device.objects.filter(
+                    Q(name__icontains='cardiac monitor') | Q(manufacturer__icontains='cardiac monitor')
+                    | Q(description__icontains='cardiac monitor')
+                ),
+                'full-text search ranked': Device.objects.filter(search_vector=query)
+                    .annotate(rank=SearchRank(F('search_vector'), query)).order_by('-rank'),
+                'model number icontains (trigram)': Device.objects.filter(model_number__icontains='00012'),
+            }
+            for label, queryset in cases.items():
+                self.stdout.write(f"{label}: {self.time_query(queryset, options['repeat']):.1f} ms (median)")
+        self.stdout.write(self.style.SUCCESS("Benchmark complete, synthetic rows rolled back"))
@@ -0,0 +1,114 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare WSGI and ASGI throughput for read endpoints at high concurrency. Start both servers "
+        "against the same database first, e.g. `python manage.py runserver 8000 --noreload` and "
+        "`uvicorn config.asgi:application --port 8001 --workers 1`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi', default='http://localhost:8000', help='Base URL of the WSGI server')
+        parser.add_argument('--asgi', default='http://localhost:8001', help='Base URL of the ASGI server')
+        parser.add_argument('--token', required=True, help='API token to authenticate with')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Path to request, repeatable (default: device, protocol and result lists)')
+        parser.add_argument('--concurrency', type=int, default=200, help='Open connections')
+        parser.add_argument('--requests', type=int, default=5000, help='Requests per server and path')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per request timeout in seconds')
+
+    async def fetch(self, reader, writer, request, timeout):
+        writer.write(request)
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        status = int(status_line.split()[1])
+        length = 0
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        await asyncio.wait_for(reader.readexactly(length), timeout)
+        return status
+
+    async def worker(self, url, request, remaining, timeout, latencies, errors):
+        reader = writer = None
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+                status = await self.fetch(reader, writer, request, timeout)
+                if status != 200:
+                    errors[status] = errors.get(status, 0) + 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+            except (OSError, ValueError, IndexError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    async def run(self, base_url, path, options):
+        """
+        Send ``--requests`` GETs over ``--concurrency`` keep-alive connections and
+        return the elapsed time, successful request latencies and error counts.
+        """
+        url = urlsplit(base_url)
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {url.netloc}\r\n"
+            f"Authorization: Token {options['token']}\r\n"
+            f"Accept: application/json\r\n"
+            f"Connection: keep-alive\r\n\r\n"
+        ).encode()
+        remaining = [options['requests']]
+        latencies, errors = [], {}
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            self.worker(url, request, remaining, options['timeout'], latencies, errors)
+            for _ in range(options['concurrency'])
+        ))
+        return time.perf_counter() - started, latencies, errors
+
+    def report(self, name, elapsed, latencies, errors):
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f"  {name}: no successful requests ({errors})"))
+            return 0
+        percentiles = statistics.quantiles(latencies, n=100)
+        throughput = len(latencies) / elapsed
+        self.stdout.write(
+            f"  {name}: {throughput:8.1f} req/s  "
+            f"p50 {percentiles[49]:7.1f} ms  p95 {percentiles[94]:7.1f} ms  p99 {percentiles[98]:7.1f} ms"
+            + (f"  errors {errors}" if errors else "")
+        )
+        return throughput
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive')
+        paths = options['paths'] or [
+            '/api/devices/devicelist/',
+            '/api/devices/protocols/',
+            '/api/devices/results/',
+        ]
+        self.stdout.write(f"{options['requests']} requests per path at concurrency {options['concurrency']}")
+        for path in paths:
+            self.stdout.write(path)
+            throughput = {}
+            for name in ('wsgi', 'asgi'):
+                elapsed, latencies, errors = asyncio.run(self.run(options[name], path, options))
+                throughput[name] = self.report(name.upper(), elapsed, latencies, errors)
+            if throughput['wsgi'] and throughput['asgi']:
+                self.stdout.write(f"  ASGI/WSGI throughput: {throughput['asgi'] / throughput['wsgi']:.2f}x")
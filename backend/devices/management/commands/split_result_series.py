@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from devices.models import TestResult
+from devices.series import pack_data, split_series, store_series
+
+class Command(BaseCommand):
+    help = "Move measurement series stored inline in TestResult.data to TestResultSeries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Results read per transaction')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        last_pk = 0
+        moved = 0
+        while True:
+            chunk = list(
+                TestResult.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'data')[:options['chunk_size']]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            changed, series = [], []
+            for result in chunk:
+                try:
+                    data, row_series = split_series(pack_data(result.data))
+                except ValueError as e:
+                    self.stderr.write(f"Skipping result {result.pk}: {e}")
+                    continue
+                if row_series:
+                    result.data = data
+                    changed.append(result)
+                    series.append((result.pk, row_series))
+
+            with transaction.atomic():
+                TestResult.objects.bulk_update(changed, ['data'])
+                moved += len(store_series(series))
+            self.stdout.write(f"Processed results up to id {last_pk}")
+
+        self.stdout.write(self.style.SUCCESS(f"Series split completed: {moved} series moved"))
@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-18 14:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['-created_at', '-id'], name='device_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testprotocol',
+            index=models.Index(fields=['-created_at', '-id'], name='protocol_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['-created_at', '-id'], name='result_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['device', '-created_at'], name='result_device_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['protocol', '-created_at'], name='result_protocol_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['performed_by', '-created_at'], name='result_engineer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['status', '-created_at'], name='result_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['start_time'], name='result_start_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['end_time'], name='result_end_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(condition=models.Q(('status', 'IN_PROGRESS')), fields=['-created_at'], name='result_in_progress_idx'),
+        ),
+    ]
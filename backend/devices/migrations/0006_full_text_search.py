@@ -0,0 +1,92 @@
+# Generated by Django 5.2 on 2026-10-18 14:30
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def populate_search_vectors(apps, schema_editor):
+    # The vectors as devices.search defined them when this migration was written
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Device = apps.get_model('devices', 'Device')
+    TestProtocol = apps.get_model('devices', 'TestProtocol')
+    TestResult = apps.get_model('devices', 'TestResult')
+    Device.objects.update(search_vector=(
+        SearchVector('name', weight='A', config='english')
+        + SearchVector('model_number', weight='A', config='english')
+        + SearchVector('manufacturer', weight='B', config='english')
+        + SearchVector('description', weight='C', config='english')
+    ))
+    TestProtocol.objects.update(search_vector=(
+        SearchVector('name', weight='A', config='english')
+        + SearchVector('version', weight='B', config='english')
+        + SearchVector('description', weight='C', config='english')
+    ))
+    device_name = Subquery(Device.objects.filter(pk=OuterRef('device_id')).values('name')[:1])
+    protocol_name = Subquery(TestProtocol.objects.filter(pk=OuterRef('protocol_id')).values('name')[:1])
+    TestResult.objects.update(search_vector=(
+        SearchVector(device_name, weight='A', config='english')
+        + SearchVector(protocol_name, weight='A', config='english')
+        + SearchVector('notes', weight='C', config='english')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0005_export_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='device',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='testprotocol',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='testresult',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='device_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='device_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['model_number'], name='device_model_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['manufacturer'], name='device_manufacturer_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='testprotocol',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='protocol_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testprotocol',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='protocol_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='result_search_idx'),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
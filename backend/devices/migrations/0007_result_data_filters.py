@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 14:36
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0006_full_text_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testprotocol',
+            name='indexed_data_keys',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['data'], name='result_data_idx', opclasses=['jsonb_path_ops']),
+        ),
+    ]
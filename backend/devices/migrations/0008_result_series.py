@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0007_result_data_filters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestResultSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('length', models.PositiveIntegerField()),
+                ('dtype', models.CharField(max_length=10)),
+                ('values', models.BinaryField()),
+                ('times', models.BinaryField(blank=True, null=True)),
+                ('sha256', models.CharField(max_length=64)),
+                ('minimum', models.FloatField()),
+                ('maximum', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='devices.testresult')),
+            ],
+            options={
+                'ordering': ['name'],
+                'unique_together': {('result', 'name')},
+            },
+        ),
+    ]
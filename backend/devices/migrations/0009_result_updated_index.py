@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0008_result_series'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['updated_at'], name='result_updated_idx'),
+        ),
+    ]
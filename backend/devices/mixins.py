@@ -0,0 +1,284 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Exists, OuterRef, Prefetch
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from config.metrics import label_request, time_serializer, timed_serialization
+from .cache import list_cache_key
+from .value_rows import compile_plan
+
+
+def concrete_fields(serializer_class):
+    """
+    Names of a serializer's fields that are plain columns of its model.
+    """
+    model = serializer_class.Meta.model
+    names = []
+    for name in serializer_class.Meta.fields:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete and not field.many_to_many:
+            names.append(name)
+    return names
+
+
+def parse_fieldset(serializer_class, query_params):
+    """
+    Resolve the ``fields``, ``omit`` and ``expand`` query parameters, each a
+    comma separated list, against a serializer's Meta.
+
+    Returns ``(fields, expand)``, with ``fields`` set to ``None`` when the client
+    asked for no trimming. Raises ``ValidationError`` for unknown names.
+    """
+    meta = serializer_class.Meta
+    available = list(meta.fields)
+    expandable = getattr(meta, 'expandable', {})
+
+    def names(param):
+        return [name.strip() for value in query_params.getlist(param) for name in value.split(',') if name.strip()]
+
+    fields, omit, expand = names('fields'), names('omit'), names('expand')
+    errors = {}
+    for param, requested, allowed in (('fields', fields, available), ('omit', omit, available), ('expand', expand, expandable)):
+        unknown = sorted(set(requested) - set(allowed))
+        if unknown:
+            errors[param] = [f"Unknown fields: {', '.join(unknown)}"]
+    if errors:
+        raise ValidationError(errors)
+
+    if not (fields or omit):
+        return None, [name for name in expandable if name in expand]
+    selected = [name for name in available if (not fields or name in fields or name in expand) and name not in omit]
+    return selected, [name for name in expandable if name in expand and name in selected]
+
+
+def plan_queryset(queryset, serializer_class, restrict_columns=True, fields=None, expand=()):
+    """
+    Apply the relations a serializer declares on its Meta to a queryset.
+
+    Serializers list the foreign keys they read as ``select_related`` (a dict of
+    relation -> columns used from the related row) and the many-to-many or
+    reverse relations they read as ``prefetch_related`` (a list, or a dict of
+    relation -> columns when more than the primary key is read). ``related_fields``
+    maps each output field to the relation it reads, so that a trimmed
+    ``fields`` list only joins what it uses, and ``expandable`` maps foreign
+    keys to the serializer that inlines them when named in ``expand``. When
+    ``restrict_columns`` is set the queryset is also narrowed with ``only()`` to
+    the columns the emitted fields read.
+    """
+    meta = serializer_class.Meta
+    model = queryset.model
+    related = getattr(meta, 'select_related', {})
+    prefetched = getattr(meta, 'prefetch_related', ())
+    if not isinstance(prefetched, dict):
+        prefetched = dict.fromkeys(prefetched, ())
+    expandable = getattr(meta, 'expandable', {})
+
+    if fields is None:
+        fields = list(meta.fields)
+    elif hasattr(meta, 'related_fields'):
+        used = {meta.related_fields[name] for name in fields if name in meta.related_fields}
+        related = {relation: columns for relation, columns in related.items() if relation in used}
+    related = dict(related)
+    for relation in expand:
+        related[relation] = [*related.get(relation, ()), *concrete_fields(expandable[relation])]
+
+    if related:
+        queryset = queryset.select_related(*related)
+    for name, related_columns in prefetched.items():
+        if name not in fields:
+            continue
+        field = model._meta.get_field(name)
+        columns = ['pk', *related_columns]
+        if field.one_to_many:
+            # The foreign key is needed to match prefetched rows to their parent
+            columns.append(field.field.name)
+        queryset = queryset.prefetch_related(
+            Prefetch(name, queryset=field.related_model._default_manager.only(*columns))
+        )
+
+    if restrict_columns:
+        # Ordering columns are read by keyset pagination
+        columns = {'pk', *(name.lstrip('-') for name in model._meta.ordering)}
+        columns.update(name for name in concrete_fields(serializer_class) if name in fields)
+        for relation, related_columns in related.items():
+            columns.add(relation)
+            columns.update(f'{relation}__{column}' for column in related_columns)
+        queryset = queryset.only(*columns)
+
+    return queryset
+
+
+def scope_to_user(queryset, user, assigned_to='assigned_to'):
+    """
+    Limit a queryset to the rows ``user`` may see.
+
+    Admins and managers see everything; engineers only see rows whose device is
+    assigned to them, reached through the ``assigned_to`` lookup path. A path
+    that starts with a many-valued relation is checked with ``EXISTS`` so each
+    row is returned once without ``DISTINCT``.
+    """
+    if user.is_staff or user.is_manager():
+        return queryset
+    if not user.is_engineer():
+        return queryset.none()
+
+    relation, _, rest = assigned_to.partition('__')
+    field = queryset.model._meta.get_field(relation)
+    if not rest or not (field.many_to_many or field.one_to_many):
+        return queryset.filter(**{assigned_to: user})
+    related = field.related_model._default_manager.filter(**{
+        field.remote_field.name if field.one_to_many else field.related_query_name(): OuterRef('pk'),
+        rest: user,
+    })
+    return queryset.filter(Exists(related))
+
+
+class MetricsMixin:
+    """
+    Viewset mixin that records request metrics under ``<ViewSet>.<action>``
+    and counts serializer time separately from the rest of the view.
+    """
+    def initial(self, request, *args, **kwargs):
+        label_request(request, f'{type(self).__name__}.{self.action}')
+        super().initial(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        return time_serializer(super().get_serializer(*args, **kwargs), self.request)
+
+
+class RoleScopedMixin:
+    """
+    Viewset mixin that limits the queryset to the rows the user may see, so
+    list views are scoped in SQL rather than per object.
+
+    ``scope_lookup`` is the path from the model to the assigned engineer.
+    """
+    scope_lookup = 'assigned_to'
+
+    def get_queryset(self):
+        return scope_to_user(super().get_queryset(), self.request.user, self.scope_lookup)
+
+
+class QueryPlanMixin:
+    """
+    Viewset mixin that plans the queryset from the serializer's declared relations.
+
+    Read requests may pass ``fields``, ``omit`` and ``expand``; the resolved
+    fieldset trims both the SQL and, through the serializer context, the output.
+    Column restriction is only applied to read requests so that updates always
+    work against fully loaded instances.
+    """
+    def get_fieldset(self):
+        """
+        Return the ``(fields, expand)`` requested for this read request.
+        """
+        if not hasattr(self, '_fieldset'):
+            if self.request.method in permissions.SAFE_METHODS:
+                self._fieldset = parse_fieldset(self.get_serializer_class(), self.request.query_params)
+            else:
+                self._fieldset = (None, [])
+        return self._fieldset
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = self.get_fieldset()
+        return plan_queryset(
+            queryset,
+            self.get_serializer_class(),
+            restrict_columns=self.request.method in permissions.SAFE_METHODS,
+            fields=fields,
+            expand=expand,
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
+
+
+class CachedListMixin:
+    """
+    Viewset mixin that caches list responses per role scope and query string.
+
+    ``cache_dependencies`` names the models a list reads; saving or deleting any
+    of them bumps its generation and so retires every cached page built from it.
+    Responses carry ``ETag`` and ``Last-Modified`` so clients can revalidate.
+    """
+    cache_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_list_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cached = self.build_list_entry(response.data)
+            cache.set(key, cached, settings.LIST_CACHE_TIMEOUT)
+        return self.cached_list_response(request, cached)
+
+    def get_list_cache_key(self, request):
+        return list_cache_key(self.basename, request, self.cache_dependencies)
+
+    def build_list_entry(self, data):
+        """
+        Return the ``(data, etag, last_modified)`` entry cached for a list response.
+        """
+        etag = quote_etag(hashlib.md5(JSONRenderer().render(data)).hexdigest())
+        return (data, etag, int(time.time()))
+
+    def cached_list_response(self, request, cached):
+        data, etag, last_modified = cached
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
+
+class ValueListMixin:
+    """
+    Viewset mixin that builds list pages from ``values_list()`` rows with a
+    compiled ``ValuePlan`` instead of running the serializer per instance.
+
+    The output is the serializer's own. Requests the plan cannot reproduce,
+    such as ``?expand=``, and every request while ``VALUE_LIST_ROWS`` is off
+    go through the serializer as usual.
+    """
+    def get_value_plan(self):
+        if not settings.VALUE_LIST_ROWS:
+            return None
+        return compile_plan(self.get_serializer())
+
+    def paginate_values(self, plan, queryset):
+        """
+        Paginate the ``values_list()`` queryset of ``plan``, returning the page
+        rows or ``None`` when the list is not paginated.
+        """
+        if self.paginator is not None:
+            self.paginator.position = plan.position
+        return self.paginate_queryset(plan.queryset(queryset))
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_value_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_values(plan, queryset)
+        rows = page if page is not None else plan.queryset(queryset)
+        with timed_serialization(request):
+            data = plan.rows(rows)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
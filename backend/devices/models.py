@@ -1,9 +1,11 @@
+import uuid
+from datetime import timedelta
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from .tasks import send_test_result_notification
 from users.models import CustomUser
 
 class Device(models.Model):
@@ -22,12 +24,21 @@ class Device(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     assigned_to = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_devices')
+    search_vector = SearchVectorField(null=True, editable=False)  # Maintained by devices.signals
 
     def __str__(self):
         return f"{self.name} ({self.model_number})"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='device_created_idx'),
+            GinIndex(fields=['search_vector'], name='device_search_idx'),
+            # Substring matches from DeviceFilter and model number search
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='device_name_trgm_idx'),
+            GinIndex(fields=['model_number'], opclasses=['gin_trgm_ops'], name='device_model_trgm_idx'),
+            GinIndex(fields=['manufacturer'], opclasses=['gin_trgm_ops'], name='device_manufacturer_trgm_idx'),
+        ]
 
 class TestProtocol(models.Model):
     STATUS_CHOICES = [
@@ -45,6 +56,8 @@ class TestProtocol(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     devices = models.ManyToManyField(Device, related_name='test_protocols')
+    indexed_data_keys = models.JSONField(default=list, blank=True)  # Hot TestResult.data keys, see devices.data_indexes
+    search_vector = SearchVectorField(null=True, editable=False)  # Maintained by devices.signals
 
     def __str__(self):
         return f"{self.name} v{self.version}"
@@ -52,6 +65,11 @@ class TestProtocol(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['name', 'version']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='protocol_created_idx'),
+            GinIndex(fields=['search_vector'], name='protocol_search_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='protocol_name_trgm_idx'),
+        ]
 
 class TestResult(models.Model):
     RESULT_STATUS = [
@@ -71,9 +89,136 @@ class TestResult(models.Model):
     data = models.JSONField(default=dict)  # For storing test-specific data
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)  # Maintained by devices.signals
 
     def __str__(self):
         return f"{self.device.name} - {self.protocol.name} ({self.status})"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Default ordering and keyset pagination
+            models.Index(fields=['-created_at', '-id'], name='result_created_idx'),
+            GinIndex(fields=['search_vector'], name='result_search_idx'),
+            # JSON containment filters on data
+            GinIndex(fields=['data'], opclasses=['jsonb_path_ops'], name='result_data_idx'),
+            # TestResultFilter lookups, each sorted by the default ordering
+            models.Index(fields=['device', '-created_at'], name='result_device_created_idx'),
+            models.Index(fields=['protocol', '-created_at'], name='result_protocol_created_idx'),
+            models.Index(fields=['performed_by', '-created_at'], name='result_engineer_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='result_status_created_idx'),
+            models.Index(fields=['start_time'], name='result_start_time_idx'),
+            models.Index(fields=['end_time'], name='result_end_time_idx'),
+            # Rollup refresh scans results changed since its watermark
+            models.Index(fields=['updated_at'], name='result_updated_idx'),
+            # Open tests are a small, hot subset of the table
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(status='IN_PROGRESS'),
+                name='result_in_progress_idx',
+            ),
+        ]
+
+class TestResultSeries(models.Model):
+    """
+    A high-frequency measurement series split out of TestResult.data.
+
+    Samples are stored as packed NumPy arrays of ``dtype`` (little-endian
+    float64), with optional sample times in the same layout, and hashed so
+    clients can tell whether a series changed without downloading it.
+    """
+    result = models.ForeignKey(TestResult, on_delete=models.CASCADE, related_name='series')
+    name = models.CharField(max_length=100)
+    length = models.PositiveIntegerField()
+    dtype = models.CharField(max_length=10)
+    values = models.BinaryField()
+    times = models.BinaryField(null=True, blank=True)  # Sample numbers are used when unset
+    sha256 = models.CharField(max_length=64)
+    minimum = models.FloatField()
+    maximum = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.length} samples) of result {self.result_id}"
+
+    class Meta:
+        ordering = ['name']
+        unique_together = ['result', 'name']
+
+class TestResultDailyRollup(models.Model):
+    """
+    Per day, device, protocol and status totals of test results, keyed by the
+    day the test started. Maintained by Celery from TestResult.updated_at.
+    """
+    day = models.DateField()
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='daily_rollups')
+    protocol = models.ForeignKey(TestProtocol, on_delete=models.CASCADE, related_name='daily_rollups')
+    status = models.CharField(max_length=20, choices=TestResult.RESULT_STATUS)
+    result_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)  # Results with an end_time
+    duration_total = models.DurationField(default=timedelta(0))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.day} {self.device_id}/{self.protocol_id} {self.status}: {self.result_count}"
+
+    class Meta:
+        ordering = ['-day']
+        unique_together = ['day', 'device', 'protocol', 'status']
+        indexes = [
+            models.Index(fields=['day'], name='rollup_day_idx'),
+        ]
+
+class RollupWatermark(models.Model):
+    """
+    Latest TestResult.updated_at folded into a rollup table.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    value = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
+class ExportJob(models.Model):
+    """
+    A background export of devices or test results to a compressed file.
+
+    ``last_pk``, ``rows_written`` and ``bytes_written`` are checkpointed after
+    every chunk so an interrupted job resumes where it stopped.
+    """
+    RESOURCES = [
+        ('results', 'Test Results'),
+        ('devices', 'Devices'),
+    ]
+    FORMATS = [
+        ('csv', 'Gzipped CSV'),
+        ('ndjson', 'Gzipped NDJSON'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='export_jobs')
+    resource = models.CharField(max_length=20, choices=RESOURCES, default='results')
+    export_format = models.CharField(max_length=20, choices=FORMATS, default='csv')
+    filters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    file_path = models.CharField(max_length=500, blank=True)
+    total_rows = models.PositiveBigIntegerField(null=True, blank=True)
+    rows_written = models.PositiveBigIntegerField(default=0)
+    bytes_written = models.PositiveBigIntegerField(default=0)
+    last_pk = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.resource} export {self.id} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
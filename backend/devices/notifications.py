@@ -0,0 +1,60 @@
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+PENDING_KEY = 'devices:notifications:pending'
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    return redis.Redis.from_url(settings.NOTIFICATION_BUFFER_URL)
+
+
+def queue_test_result_notifications(test_result_ids):
+    """
+    Buffer created test result ids for the next notification digest.
+
+    A flush task is enqueued each time the buffer crosses a multiple of
+    ``NOTIFICATION_BATCH_SIZE``; anything left below that is picked up by the
+    periodic flush.
+    """
+    from .tasks import flush_test_result_notifications
+
+    if not test_result_ids:
+        return
+    length = push_pending(test_result_ids)
+    batch_size = settings.NOTIFICATION_BATCH_SIZE
+    if length // batch_size > (length - len(test_result_ids)) // batch_size:
+        flush_test_result_notifications.delay()
+
+
+def push_pending(test_result_ids):
+    """
+    Append test result ids to the buffer and return its new length.
+    """
+    return get_redis().rpush(PENDING_KEY, *test_result_ids)
+
+
+def drain_pending(count):
+    """
+    Atomically remove and return up to ``count`` buffered test result ids.
+    """
+    ids = get_redis().lpop(PENDING_KEY, count) or []
+    return [int(test_result_id) for test_result_id in ids]
+
+
+def build_digest(test_results):
+    """
+    Return the subject and body of one digest email covering ``test_results``.
+    """
+    subject = f'{len(test_results)} New Test Results Created'
+    lines = ['The following test results have been created:', '']
+    for test_result in test_results:
+        lines.append(
+            f'- Device: {test_result.device.name} | Protocol: {test_result.protocol.name} | '
+            f'Status: {test_result.status} | Performed by: {test_result.performed_by.username} | '
+            f'Start Time: {test_result.start_time}'
+        )
+    lines.extend(['', 'You can view the full details in the admin panel.'])
+    return subject, '\n'.join(lines)
@@ -0,0 +1,160 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Keyset pagination over ``(created_at, id)``, newest first.
+
+    Pages are addressed by an opaque ``cursor`` that encodes the position of the
+    first or last row on the neighbouring page, so fetching any page costs the
+    same regardless of depth. Clients that send ``page``, a custom ``ordering``
+    or a ranked ``search`` keep the page number behaviour. The total ``count``
+    is included unless the client passes ``count=false``.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def use_keyset(self, request):
+        params = request.query_params
+        if self.cursor_query_param in params:
+            return True
+        return not any(param in params for param in (self.page_query_param, 'ordering', 'search'))
+
+    def include_count(self, request):
+        return request.query_params.get(self.count_query_param, 'true').lower() not in ('0', 'false', 'no')
+
+    def position(self, row):
+        """
+        ``(created_at, pk)`` of a page row. Views paginating rows other than
+        model instances replace it.
+        """
+        return row.created_at, row.pk
+
+    def encode_cursor(self, row, reverse):
+        created_at, pk = self.position(row)
+        position = {'t': created_at.isoformat(), 'i': pk, 'r': reverse}
+        encoded = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(
+            remove_query_param(self.base_url, self.page_query_param),
+            self.cursor_query_param,
+            encoded,
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            created_at = parse_datetime(position['t'])
+            pk = int(position['i'])
+            reverse = bool(position['r'])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk, reverse
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        window = self.keyset_window(queryset, request)
+        if window is None:
+            return None
+        self.count = queryset.count() if self.include_count(request) else None
+        return self.keyset_page(list(window[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Keyset pagination with the async ORM. Callers check ``use_keyset()``
+        first, since page number pagination has no async counterpart.
+        """
+        self.keyset = True
+        window = self.keyset_window(queryset, request)
+        if window is None:
+            return None
+        self.count = await queryset.acount() if self.include_count(request) else None
+        # Not aiterator(), which runs values_list() queries in the event loop
+        return self.keyset_page([row async for row in window[:self.page_size + 1]])
+
+    def keyset_window(self, queryset, request):
+        """
+        Return ``queryset`` ordered and filtered to start after the cursor, or
+        ``None`` if pagination is disabled.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.cursor = cursor = self.decode_cursor(request)
+        self.reverse = False
+        if cursor is None:
+            return queryset.order_by('-created_at', '-id')
+        created_at, pk, self.reverse = cursor
+        if self.reverse:
+            return queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+            ).order_by('created_at', 'id')
+        return queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        ).order_by('-created_at', '-id')
+
+    def keyset_page(self, rows):
+        """
+        Trim the look-ahead row fetched by ``keyset_window`` and note which
+        neighbouring pages exist.
+        """
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.rows = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        response = {}
+        if self.count is not None:
+            response['count'] = self.count
+        response.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return Response(response)
@@ -0,0 +1,182 @@
+from datetime import date, datetime, time, timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import RollupWatermark, TestResult, TestResultDailyRollup
+
+WATERMARK_NAME = 'test_result_daily_rollup'
+ROLLUP_KEY = ['day', 'device', 'protocol', 'status']
+ROLLUP_TOTALS = ['result_count', 'completed_count', 'duration_total', 'updated_at']
+
+
+def day_range(start_day, end_day):
+    """
+    Return aware datetimes bounding ``[start_day, end_day]`` as a half-open range.
+    """
+    start = timezone.make_aware(datetime.combine(start_day, time.min))
+    end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min))
+    return start, end
+
+
+def bucket_of(test_result):
+    """
+    Return the ``(day, device_id, protocol_id)`` rollup bucket of a result.
+    """
+    # Accepts a start time assigned as a string and not yet reloaded
+    start_time = TestResult._meta.get_field('start_time').to_python(test_result.start_time)
+    return (
+        timezone.localdate(start_time).isoformat(),
+        test_result.device_id,
+        test_result.protocol_id,
+    )
+
+
+def buckets_of(queryset):
+    """
+    Return the distinct rollup buckets of a TestResult queryset in one query.
+    """
+    rows = queryset.order_by().values_list(TruncDate('start_time'), 'device_id', 'protocol_id').distinct()
+    return [(day.isoformat(), device_id, protocol_id) for day, device_id, protocol_id in rows]
+
+
+def queue_rollup_recompute(buckets):
+    """
+    Rebuild the given rollup buckets once the surrounding transaction commits.
+
+    Each call sends one task, so callers touching many results should collect
+    their buckets first, as ``buckets_of`` does in a single query.
+    """
+    from .tasks import recompute_result_rollups
+
+    buckets = sorted(set(buckets))
+    if buckets:
+        transaction.on_commit(lambda: recompute_result_rollups.delay(buckets))
+
+
+def aggregate_rollups(queryset):
+    """
+    Build unsaved rollup rows from a TestResult queryset.
+    """
+    duration = ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+    rows = (
+        queryset
+        .values('device', 'protocol', 'status', day=TruncDate('start_time'))
+        .annotate(
+            result_count=Count('id'),
+            completed_count=Count('end_time'),
+            duration_total=Sum(duration),
+        )
+        # Upserts take row locks in key order, so overlapping rebuilds cannot deadlock
+        .order_by('day', 'device', 'protocol', 'status')
+    )
+    return [
+        TestResultDailyRollup(
+            day=row['day'],
+            device_id=row['device'],
+            protocol_id=row['protocol'],
+            status=row['status'],
+            result_count=row['result_count'],
+            completed_count=row['completed_count'],
+            duration_total=row['duration_total'] or timedelta(0),
+        )
+        for row in rows
+    ]
+
+
+def replace_rollups(existing, rollups):
+    """
+    Upsert ``rollups`` and delete the rows of ``existing`` they no longer cover.
+
+    Rows are updated in place rather than deleted and reinserted, so rebuilds
+    of the same bucket can run concurrently without violating the unique key.
+    """
+    stale = {
+        (day, device_id, protocol_id, status_value): pk
+        for pk, day, device_id, protocol_id, status_value
+        in existing.values_list('pk', 'day', 'device_id', 'protocol_id', 'status')
+    }
+    for rollup in rollups:
+        stale.pop((rollup.day, rollup.device_id, rollup.protocol_id, rollup.status), None)
+    TestResultDailyRollup.objects.bulk_create(
+        rollups, update_conflicts=True, unique_fields=ROLLUP_KEY, update_fields=ROLLUP_TOTALS,
+    )
+    if stale:
+        TestResultDailyRollup.objects.filter(pk__in=stale.values()).delete()
+    return rollups
+
+
+def recompute_buckets(buckets):
+    """
+    Rebuild the rollup rows of the given ``(day, device_id, protocol_id)`` buckets.
+
+    Every status of a bucket is rebuilt together, so results that moved between
+    statuses are accounted for.
+    """
+    by_day = {}
+    for day, device_id, protocol_id in buckets:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        by_day.setdefault(day, set()).add((device_id, protocol_id))
+
+    with transaction.atomic():
+        for day, pairs in by_day.items():
+            start, end = day_range(day, day)
+            pair_filter = reduce(or_, (Q(device_id=device_id, protocol_id=protocol_id) for device_id, protocol_id in pairs))
+            replace_rollups(
+                TestResultDailyRollup.objects.filter(pair_filter, day=day),
+                aggregate_rollups(TestResult.objects.filter(pair_filter, start_time__gte=start, start_time__lt=end)),
+            )
+    return sum(len(pairs) for pairs in by_day.values())
+
+
+def recompute_days(start_day, end_day):
+    """
+    Rebuild every rollup row between ``start_day`` and ``end_day`` inclusive.
+    """
+    start, end = day_range(start_day, end_day)
+    with transaction.atomic():
+        rollups = replace_rollups(
+            TestResultDailyRollup.objects.filter(day__gte=start_day, day__lte=end_day),
+            aggregate_rollups(TestResult.objects.filter(start_time__gte=start, start_time__lt=end)),
+        )
+    return len(rollups)
+
+
+def refresh_rollups():
+    """
+    Fold results changed since the last watermark into the rollups.
+
+    The scan starts ``ROLLUP_WATERMARK_OVERLAP`` seconds before the watermark so
+    that rows committed late with an older ``updated_at`` are still picked up;
+    recomputing a bucket twice is harmless. Returns ``None`` without scanning
+    while no watermark is set, since that would read the whole table; the
+    ``backfill_rollups`` command builds the rollups and sets it.
+    """
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME, value__isnull=False).first()
+    if watermark is None:
+        return None
+
+    overlap = timedelta(seconds=settings.ROLLUP_WATERMARK_OVERLAP)
+    changed = TestResult.objects.order_by().filter(updated_at__gt=watermark.value - overlap)
+    latest = changed.aggregate(latest=Max('updated_at'))['latest']
+    if latest is None:
+        return 0
+
+    buckets = set()
+    rows = changed.filter(updated_at__lte=latest).values_list('start_time', 'device_id', 'protocol_id')
+    for start_time, device_id, protocol_id in rows.iterator(chunk_size=settings.ROLLUP_CHUNK_SIZE):
+        buckets.add((timezone.localdate(start_time), device_id, protocol_id))
+
+    count = recompute_buckets(buckets) if buckets else 0
+    watermark.value = latest
+    watermark.save(update_fields=['value'])
+    return count
+
+
+def set_watermark(value):
+    RollupWatermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'value': value})
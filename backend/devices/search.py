@@ -0,0 +1,115 @@
+from functools import reduce
+from operator import add
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from rest_framework import filters
+
+SEARCH_CONFIG = 'english'
+# Weighted source columns of each model's search vector
+DEVICE_WEIGHTS = [('name', 'A'), ('model_number', 'A'), ('manufacturer', 'B'), ('description', 'C')]
+PROTOCOL_WEIGHTS = [('name', 'A'), ('version', 'B'), ('description', 'C')]
+
+
+def weighted_vector(sources):
+    """
+    Concatenate a ``SearchVector`` per ``(expression, weight)`` pair.
+    """
+    return reduce(add, (SearchVector(source, weight=weight, config=SEARCH_CONFIG) for source, weight in sources))
+
+
+def device_vector():
+    return weighted_vector(DEVICE_WEIGHTS)
+
+
+def protocol_vector():
+    return weighted_vector(PROTOCOL_WEIGHTS)
+
+
+def result_vector(device_model, protocol_model):
+    """
+    Vector for test results, which denormalizes the device and protocol names
+    so searching results needs no joins.
+    """
+    device_name = Subquery(device_model.objects.filter(pk=OuterRef('device_id')).values('name')[:1])
+    protocol_name = Subquery(protocol_model.objects.filter(pk=OuterRef('protocol_id')).values('name')[:1])
+    return weighted_vector([(device_name, 'A'), (protocol_name, 'A'), ('notes', 'C')])
+
+
+def instance_vector(instance):
+    """
+    Vector for a single unsaved or changed row, built from its own attribute
+    values so it can be written by the same INSERT or UPDATE as the row.
+    """
+    from .models import Device, TestProtocol
+
+    if isinstance(instance, (Device, TestProtocol)):
+        weights = DEVICE_WEIGHTS if isinstance(instance, Device) else PROTOCOL_WEIGHTS
+        return weighted_vector([(Value(getattr(instance, field)), weight) for field, weight in weights])
+    device_name = Subquery(Device.objects.filter(pk=instance.device_id).values('name')[:1])
+    protocol_name = Subquery(TestProtocol.objects.filter(pk=instance.protocol_id).values('name')[:1])
+    return weighted_vector([(device_name, 'A'), (protocol_name, 'A'), (Value(instance.notes), 'C')])
+
+
+def update_search_vectors(queryset):
+    """
+    Recompute ``search_vector`` for every row of a Device, TestProtocol or
+    TestResult queryset with a single UPDATE. A no-op outside PostgreSQL.
+    """
+    from .models import Device, TestProtocol, TestResult
+
+    if connection.vendor != 'postgresql':
+        return 0
+    vectors = {
+        Device: device_vector,
+        TestProtocol: protocol_vector,
+        TestResult: lambda: result_vector(Device, TestProtocol),
+    }
+    return queryset.order_by().update(search_vector=vectors[queryset.model]())
+
+
+def update_result_search_vectors(chunk_size, **filters):
+    """
+    Recompute the search vectors of the test results matching ``filters``,
+    one UPDATE per ``chunk_size`` consecutive primary keys, so that renaming a
+    device or protocol never locks all of its results at once.
+    """
+    from .models import TestResult
+
+    queryset = TestResult.objects.filter(**filters).order_by('pk')
+    updated = 0
+    last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return updated
+        updated += update_search_vectors(queryset.filter(pk__gte=pks[0], pk__lte=pks[-1]))
+        last_pk = pks[-1]
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Search backed by each model's weighted ``search_vector`` column.
+
+    Matches are ranked with ``SearchRank`` unless the client asks for an
+    explicit ordering. Fields listed in the view's ``search_trigram_fields``
+    also match on substrings, which their trigram indexes keep fast. Outside
+    PostgreSQL, or for views without ``search_vector_field``, this behaves
+    like the default ``SearchFilter``.
+    """
+    def filter_queryset(self, request, queryset, view):
+        vector_field = getattr(view, 'search_vector_field', None)
+        terms = self.get_search_terms(request)
+        if not terms or vector_field is None or connection.vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        query = SearchQuery(' '.join(terms), search_type='websearch', config=SEARCH_CONFIG)
+        condition = Q(**{vector_field: query})
+        for field in getattr(view, 'search_trigram_fields', ()):
+            condition |= Q(*[Q(**{f'{field}__icontains': term}) for term in terms])
+
+        queryset = queryset.filter(condition).annotate(search_rank=SearchRank(F(vector_field), query))
+        if not request.query_params.get('ordering'):
+            queryset = queryset.order_by('-search_rank', '-created_at')
+        return queryset
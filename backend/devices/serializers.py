@@ -1,15 +1,73 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Device, TestProtocol, TestResult
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import F
+from .exports import filter_errors, get_progress
+from .mixins import concrete_fields
+from .models import Device, ExportJob, TestProtocol, TestResult, TestResultSeries
+from .series import pack_data, split_series, store_series
+from .value_rows import full_name
 
 CustomUser = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that emits only the fields resolved by QueryPlanMixin from
+    ``?fields=`` and ``?omit=``, and inlines the relations named in ``?expand=``
+    with the serializer in ``Meta.expandable``. Nested serializers are given
+    their ``fields`` directly.
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = ()
+        if fields is None and 'fieldset' in self.context:
+            fields, expand = self.context['fieldset']
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in expand:
+            nested = self.Meta.expandable[name]
+            # Only plain columns, which the parent query loads in the same join
+            self.fields[name] = nested(read_only=True, fields=concrete_fields(nested))
+
+class BulkPrimaryKeyRelatedField(serializers.ManyRelatedField):
+    """
+    Many primary key field that looks every id up in one query rather than
+    one query per id. Errors match ``PrimaryKeyRelatedField(many=True)``.
+    """
+    def __init__(self, queryset, **kwargs):
+        super().__init__(child_relation=serializers.PrimaryKeyRelatedField(queryset=queryset), **kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pks = []
+        for item in data:
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                pks.append(queryset.model._meta.pk.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        found = queryset.in_bulk(pks)
+        for item, pk in zip(data, pks):
+            if pk not in found:
+                child.fail('does_not_exist', pk_value=item)
+        return [found[pk] for pk in pks]
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ('id', 'username', 'email', 'first_name', 'last_name')
 
-class DeviceSerializer(serializers.ModelSerializer):
+class DeviceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     assigned_to = serializers.PrimaryKeyRelatedField(
         queryset=CustomUser.objects.all(),
         required=False,
@@ -22,31 +80,59 @@ class DeviceSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'device_type', 'model_number', 'manufacturer', 
                  'description', 'assigned_to', 'assigned_to_name', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
+        select_related = {'assigned_to': ['first_name', 'last_name']}
+        related_fields = {'assigned_to_name': 'assigned_to'}
+        expandable = {'assigned_to': UserSerializer}
+        value_expressions = {'assigned_to_name': full_name('assigned_to')}
 
     def get_assigned_to_name(self, obj):
         return obj.assigned_to.get_full_name() if obj.assigned_to else None
 
-class TestProtocolSerializer(serializers.ModelSerializer):
+class TestProtocolSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     created_by = serializers.PrimaryKeyRelatedField(
         queryset=CustomUser.objects.all(),
         required=False
     )
     created_by_name = serializers.SerializerMethodField()
-    devices = serializers.PrimaryKeyRelatedField(
-        queryset=Device.objects.all(),
-        many=True
-    )
+    devices = BulkPrimaryKeyRelatedField(queryset=Device.objects.all())
 
     class Meta:
         model = TestProtocol
         fields = ['id', 'name', 'version', 'description', 'status', 
-                 'created_by', 'created_by_name', 'devices', 'created_at', 'updated_at']
+                 'created_by', 'created_by_name', 'devices', 'indexed_data_keys', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
+        select_related = {'created_by': ['first_name', 'last_name']}
+        related_fields = {'created_by_name': 'created_by'}
+        prefetch_related = ['devices']
+        expandable = {'created_by': UserSerializer}
+        value_expressions = {'created_by_name': full_name('created_by')}
 
     def get_created_by_name(self, obj):
         return obj.created_by.get_full_name() if obj.created_by else None
 
-class TestResultSerializer(serializers.ModelSerializer):
+    def validate_indexed_data_keys(self, value):
+        if not isinstance(value, list) or not all(isinstance(key, str) for key in value):
+            raise serializers.ValidationError("Expected a list of data keys.")
+        unknown = sorted(set(value) - set(settings.RESULT_DATA_FILTER_KEYS))
+        if unknown:
+            raise serializers.ValidationError(f"Data keys are not filterable: {', '.join(unknown)}")
+        return sorted(set(value))
+
+def validate_series_data(value):
+    """
+    Pack the measurement series in a result's ``data`` for ``store_series``.
+    """
+    try:
+        return pack_data(value)
+    except ValueError as e:
+        raise serializers.ValidationError(str(e))
+
+class TestResultSeriesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TestResultSeries
+        fields = ['name', 'length', 'sha256', 'minimum', 'maximum']
+
+class TestResultSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     performed_by = serializers.PrimaryKeyRelatedField(
         queryset=CustomUser.objects.all(),
         required=False
@@ -54,13 +140,36 @@ class TestResultSerializer(serializers.ModelSerializer):
     performed_by_name = serializers.SerializerMethodField()
     device_name = serializers.SerializerMethodField()
     protocol_name = serializers.SerializerMethodField()
+    series = TestResultSeriesSerializer(many=True, read_only=True)
 
     class Meta:
         model = TestResult
         fields = ['id', 'device', 'device_name', 'protocol', 'protocol_name',
                  'performed_by', 'performed_by_name', 'status', 'start_time',
-                 'end_time', 'notes', 'data', 'created_at', 'updated_at']
+                 'end_time', 'notes', 'data', 'series', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
+        select_related = {
+            'device': ['name'],
+            'protocol': ['name'],
+            'performed_by': ['first_name', 'last_name'],
+        }
+        related_fields = {
+            'device_name': 'device',
+            'protocol_name': 'protocol',
+            'performed_by_name': 'performed_by',
+        }
+        expandable = {
+            'device': DeviceSerializer,
+            'protocol': TestProtocolSerializer,
+            'performed_by': UserSerializer,
+        }
+        # Series metadata only; samples are served by the series action
+        prefetch_related = {'series': ['name', 'length', 'sha256', 'minimum', 'maximum']}
+        value_expressions = {
+            'device_name': F('device__name'),
+            'protocol_name': F('protocol__name'),
+            'performed_by_name': full_name('performed_by'),
+        }
 
     def get_performed_by_name(self, obj):
         return obj.performed_by.get_full_name() if obj.performed_by else None
@@ -71,6 +180,102 @@ class TestResultSerializer(serializers.ModelSerializer):
     def get_protocol_name(self, obj):
         return obj.protocol.name if obj.protocol else None
 
+    def validate_data(self, value):
+        return validate_series_data(value)
+
+    @transaction.atomic
     def create(self, validated_data):
         validated_data['performed_by'] = self.context['request'].user
-        return super().create(validated_data) 
\ No newline at end of file
+        validated_data['data'], series = split_series(validated_data.get('data', {}))
+        instance = super().create(validated_data)
+        store_series([(instance.pk, series)])
+        return instance
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        series = {}
+        if 'data' in validated_data:
+            validated_data['data'], series = split_series(validated_data['data'])
+            # Series the new data leaves out are replaced along with the rest of it
+            instance.series.exclude(name__in=list(series)).delete()
+        instance = super().update(instance, validated_data)
+        store_series([(instance.pk, series)])
+        return instance
+
+class TestResultBulkListSerializer(serializers.ListSerializer):
+    """
+    Validate bulk result rows independently so one bad row does not reject the rest.
+
+    Device and protocol ids are checked with one query each instead of one per row.
+    """
+    def validate_rows(self):
+        """
+        Return ``(valid, errors)`` where ``valid`` is a list of ``(row, attrs)``
+        and ``errors`` a list of ``{'row': index, 'errors': {...}}``.
+        """
+        validated, errors = [], []
+        for index, row in enumerate(self.initial_data):
+            try:
+                validated.append((index, self.child.run_validation(row)))
+            except serializers.ValidationError as exc:
+                errors.append({'row': index, 'errors': exc.detail})
+
+        # Ids as the fields parsed them, so "5" and 5 are looked up alike
+        models = {'device': Device, 'protocol': TestProtocol}
+        existing = {
+            name: set(model.objects.filter(pk__in={attrs[f'{name}_id'] for index, attrs in validated})
+                      .values_list('pk', flat=True))
+            for name, model in models.items()
+        }
+
+        valid = []
+        for index, attrs in validated:
+            missing = {
+                name: [f'Invalid pk "{attrs[f"{name}_id"]}" - object does not exist.']
+                for name in existing
+                if attrs[f'{name}_id'] not in existing[name]
+            }
+            if missing:
+                errors.append({'row': index, 'errors': missing})
+                continue
+            valid.append((index, attrs))
+        errors.sort(key=lambda error: error['row'])
+        return valid, errors
+
+
+class TestResultBulkSerializer(serializers.ModelSerializer):
+    device = serializers.IntegerField(source='device_id')
+    protocol = serializers.IntegerField(source='protocol_id')
+
+    class Meta:
+        model = TestResult
+        fields = ['device', 'protocol', 'status', 'start_time', 'end_time', 'notes', 'data']
+        list_serializer_class = TestResultBulkListSerializer
+
+    def validate_data(self, value):
+        return validate_series_data(value)
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'resource', 'export_format', 'filters', 'status', 'progress',
+                 'rows_written', 'total_rows', 'error', 'created_at', 'completed_at']
+        read_only_fields = ['status', 'rows_written', 'total_rows', 'error', 'created_at', 'completed_at']
+
+    def get_progress(self, obj):
+        return get_progress(obj)
+
+    def validate_filters(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Expected an object of filter parameters.')
+        return value
+
+    def validate(self, attrs):
+        # Rejected now rather than when the worker runs the job
+        errors = filter_errors(attrs.get('resource', 'results'), attrs.get('filters', {}))
+        if errors:
+            raise serializers.ValidationError({'filters': errors})
+        return attrs
+
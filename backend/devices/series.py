@@ -0,0 +1,194 @@
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from .models import TestResultSeries
+
+SERIES_DTYPE = '<f8'
+SERIES_METHODS = ('lttb', 'minmax', 'raw')
+
+
+class PackedSeries:
+    """
+    A validated measurement series from ``TestResult.data`` waiting to be
+    written to ``TestResultSeries``.
+    """
+    def __init__(self, values, times=None):
+        self.values = values
+        self.times = times
+
+
+def is_number(value):
+    return type(value) in (int, float)
+
+
+def parse_series(value):
+    """
+    Return a ``PackedSeries`` if ``value`` is a series payload, else ``None``.
+
+    A series is a list of at least ``SERIES_MIN_SAMPLES`` numbers, or an object
+    with such a list under ``values`` and optional matching ``times``. Raises
+    ``ValueError`` for a malformed ``times`` list.
+    """
+    if isinstance(value, dict) and 'values' in value and set(value) <= {'values', 'times'}:
+        values, times = value['values'], value.get('times')
+    else:
+        values, times = value, None
+    if not isinstance(values, list) or len(values) < settings.SERIES_MIN_SAMPLES:
+        return None
+    if not all(is_number(sample) for sample in values):
+        return None
+
+    x = None
+    if times is not None:
+        if not isinstance(times, list) or len(times) != len(values) or not all(is_number(t) for t in times):
+            raise ValueError('times must be a list of numbers as long as values')
+        x = np.asarray(times, dtype=SERIES_DTYPE)
+        if np.any(np.diff(x) < 0):
+            raise ValueError('times must be non-decreasing')
+    return PackedSeries(np.asarray(values, dtype=SERIES_DTYPE), x)
+
+
+def pack_data(data):
+    """
+    Replace the series payloads in a ``data`` dict with ``PackedSeries``.
+    """
+    if not isinstance(data, dict):
+        return data
+    packed = {}
+    for key, value in data.items():
+        try:
+            series = parse_series(value)
+        except ValueError as e:
+            raise ValueError(f'{key}: {e}')
+        packed[key] = value if series is None else series
+    return packed
+
+
+def split_series(data):
+    """
+    Split packed ``data`` into the JSON that stays on the row and its series.
+    """
+    if not isinstance(data, dict):
+        return data, {}
+    scalars = {key: value for key, value in data.items() if not isinstance(value, PackedSeries)}
+    series = {key: value for key, value in data.items() if isinstance(value, PackedSeries)}
+    return scalars, series
+
+
+def build_series(result_id, name, packed):
+    values = packed.values.tobytes()
+    times = packed.times.tobytes() if packed.times is not None else None
+    digest = hashlib.sha256(values)
+    if times is not None:
+        digest.update(times)
+    return TestResultSeries(
+        result_id=result_id,
+        name=name,
+        length=len(packed.values),
+        dtype=SERIES_DTYPE,
+        values=values,
+        times=times,
+        sha256=digest.hexdigest(),
+        minimum=float(packed.values.min()),
+        maximum=float(packed.values.max()),
+    )
+
+
+def store_series(results):
+    """
+    Write the series of ``[(result_id, {name: PackedSeries})]``, replacing any
+    stored series of the same name, with one DELETE and one INSERT.
+    """
+    rows = [build_series(result_id, name, packed) for result_id, series in results for name, packed in series.items()]
+    if not rows:
+        return []
+    stale = TestResultSeries.objects.none()
+    for result_id, series in results:
+        if series:
+            stale |= TestResultSeries.objects.filter(result_id=result_id, name__in=list(series))
+    stale.delete()
+    return TestResultSeries.objects.bulk_create(rows)
+
+
+def series_arrays(series):
+    """
+    Return ``(times, values)`` arrays over the stored bytes without copying.
+    Series stored without times are indexed by sample number.
+    """
+    values = np.frombuffer(series.values, dtype=series.dtype)
+    if series.times is None:
+        return np.arange(series.length, dtype=SERIES_DTYPE), values
+    return np.frombuffer(series.times, dtype=series.dtype), values
+
+
+def lttb(x, y, points):
+    """
+    Largest-Triangle-Three-Buckets downsampling to ``points`` samples (at least 3).
+    """
+    n = len(y)
+    if points >= n or points < 3:
+        return x, y
+    every = (n - 2) / (points - 2)
+    bounds = (np.arange(points - 1) * every).astype(np.intp) + 1
+    selected = np.empty(points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start, end = bounds[i], bounds[i + 1]
+        next_start, next_end = (bounds[i + 1], bounds[i + 2]) if i + 2 < points - 1 else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+    return x[selected], y[selected]
+
+
+def minmax(x, y, points):
+    """
+    Keep the minimum and maximum of each of ``points // 2`` equal buckets, in
+    sample order, so peaks survive downsampling.
+    """
+    n = len(y)
+    if points >= n:
+        return x, y
+    buckets = max(1, points // 2)
+    edges = np.linspace(0, n, buckets + 1).astype(np.intp)
+    bucket_of_sample = np.repeat(np.arange(buckets), np.diff(edges))
+    order = np.lexsort((y, bucket_of_sample))
+    selected = np.unique(np.concatenate([order[edges[:-1]], order[edges[1:] - 1]]))
+    return x[selected], y[selected]
+
+
+def series_window(series, start=None, end=None, method='lttb', points=None):
+    """
+    Return the part of a series between ``start`` and ``end`` (inclusive, in
+    its time units) as plain lists, downsampled to about ``points`` samples.
+    Raises ``ValueError`` if a raw window exceeds ``SERIES_MAX_POINTS``.
+    """
+    points = points or settings.SERIES_DEFAULT_POINTS
+    x, y = series_arrays(series)
+    lo = int(np.searchsorted(x, start, 'left')) if start is not None else 0
+    hi = int(np.searchsorted(x, end, 'right')) if end is not None else len(x)
+    x, y = x[lo:hi], y[lo:hi]
+
+    if method == 'raw':
+        if len(y) > settings.SERIES_MAX_POINTS:
+            raise ValueError(
+                f'{series.name} has {len(y)} samples in range; narrow the range or downsample'
+            )
+    elif method == 'minmax':
+        x, y = minmax(x, y, points)
+    else:
+        x, y = lttb(x, y, points)
+
+    return {
+        'name': series.name,
+        'length': series.length,
+        'method': method,
+        'offset': lo,
+        'count': hi - lo,
+        'times': x.tolist(),
+        'values': y.tolist(),
+    }
@@ -1,13 +1,192 @@
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import TestResult
-from .tasks import send_test_result_notification
+from .cache import bump_generation, invalidate_assigned_devices
+from .models import Device, TestProtocol, TestResult
+from .notifications import queue_test_result_notifications
+from .rollups import bucket_of, buckets_of, queue_rollup_recompute
+from .search import instance_vector, update_search_vectors
+from .tasks import refresh_result_search_vectors, sync_protocol_data_indexes
+
+CustomUser = get_user_model()
+
+# Fields each model's search vector is built from
+SEARCH_SOURCE_FIELDS = {
+    Device: {'name', 'model_number', 'manufacturer', 'description'},
+    TestProtocol: {'name', 'version', 'description'},
+    TestResult: {'device', 'device_id', 'protocol', 'protocol_id', 'notes'},
+}
 
 @receiver(post_save, sender=TestResult)
 def notify_admin_on_test_result_creation(sender, instance, created, **kwargs):
     """
-    Signal handler to send email notification when a new test result is created.
+    Signal handler to queue an email notification when a new test result is created.
     """
     if created:
-        # Trigger the Celery task asynchronously
-        send_test_result_notification.delay(instance.id) 
\ No newline at end of file
+        # Buffer the id once the row is visible to the Celery worker
+        transaction.on_commit(lambda: queue_test_result_notifications([instance.id]))
+
+@receiver(post_delete, sender=TestResult)
+def recompute_rollups_on_test_result_deletion(sender, instance, origin=None, **kwargs):
+    """
+    Signal handler to rebuild the rollup bucket of a deleted test result, which
+    the updated_at watermark cannot see.
+    """
+    # A deleted device or protocol takes its rollup rows with it, and a deleted
+    # engineer's buckets were all queued by recompute_rollups_on_engineer_deletion
+    if isinstance(origin, (Device, TestProtocol, CustomUser)):
+        return
+    queue_rollup_recompute([bucket_of(instance)])
+
+@receiver(pre_delete, sender=CustomUser)
+def recompute_rollups_on_engineer_deletion(sender, instance, **kwargs):
+    """
+    Signal handler to rebuild, in one task, every rollup bucket holding results
+    performed by a user about to be deleted.
+    """
+    queue_rollup_recompute(buckets_of(TestResult.objects.filter(performed_by=instance)))
+
+@receiver(pre_save, sender=TestResult)
+def track_previous_bucket(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal handler to note the rollup bucket a result is saved from, since the
+    updated_at watermark only finds it in its new bucket.
+    """
+    instance._previous_bucket = None
+    bucket_fields = {'start_time', 'device', 'device_id', 'protocol', 'protocol_id'}
+    if instance._state.adding or (update_fields is not None and not bucket_fields & set(update_fields)):
+        return
+    previous = sender.objects.filter(pk=instance.pk).only('start_time', 'device_id', 'protocol_id').first()
+    if previous is not None:
+        instance._previous_bucket = bucket_of(previous)
+
+@receiver(post_save, sender=TestResult)
+def recompute_rollups_on_test_result_move(sender, instance, **kwargs):
+    """
+    Signal handler to rebuild the rollup bucket a result was moved out of by a
+    new start day, device or protocol.
+    """
+    previous = getattr(instance, '_previous_bucket', None)
+    if previous is not None and previous != bucket_of(instance):
+        queue_rollup_recompute([previous])
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def invalidate_device_cache(sender, **kwargs):
+    """
+    Signal handler to retire cached device and protocol lists when a device changes.
+    """
+    bump_generation(Device)
+
+@receiver(post_save, sender=TestProtocol)
+@receiver(post_delete, sender=TestProtocol)
+@receiver(m2m_changed, sender=TestProtocol.devices.through)
+def invalidate_protocol_cache(sender, **kwargs):
+    """
+    Signal handler to retire cached protocol lists when a protocol or its devices change.
+    """
+    action = kwargs.get('action')
+    if action is None or action.startswith('post_'):
+        bump_generation(TestProtocol)
+
+@receiver(pre_save, sender=CustomUser)
+def track_previous_name(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal handler to note whether a user is being renamed, since cached device
+    and protocol lists show their full name.
+    """
+    instance._display_name_changed = False
+    if instance.pk is None or (update_fields is not None and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('first_name', 'last_name').first()
+    instance._display_name_changed = previous is not None and previous != (instance.first_name, instance.last_name)
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_name_cache(sender, instance, **kwargs):
+    """
+    Signal handler to retire cached device and protocol lists showing a renamed
+    user, and device lists when a deleted user's devices are unassigned.
+    """
+    if kwargs.get('signal') is post_delete:
+        # assigned_to is nulled by a queryset update that sends no Device signals
+        bump_generation(Device)
+    elif instance._display_name_changed:
+        bump_generation(Device)
+        bump_generation(TestProtocol)
+
+@receiver(post_save, sender=TestProtocol)
+@receiver(post_delete, sender=TestProtocol)
+def sync_data_indexes_on_protocol_change(sender, instance, **kwargs):
+    """
+    Signal handler to build or drop the protocol's TestResult.data expression
+    indexes once the change is committed.
+    """
+    protocol_id = instance.pk
+    if kwargs.get('created') and not instance.indexed_data_keys:
+        return
+    transaction.on_commit(lambda: sync_protocol_data_indexes.delay(protocol_id))
+
+@receiver(pre_save, sender=Device)
+@receiver(pre_save, sender=TestProtocol)
+def track_previous_state(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal handler to note whether a device or protocol is being renamed, since
+    test result search vectors include those names, and who a device was
+    assigned to before the save.
+    """
+    columns = ['name', 'assigned_to_id'] if sender is Device else ['name']
+    instance._search_name_changed = False
+    if sender is Device:
+        instance._previous_assigned_to_id = None if instance.pk is None else instance.assigned_to_id
+    if instance.pk is None or (update_fields is not None and not {'name', 'assigned_to', 'assigned_to_id'} & set(update_fields)):
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*columns).first()
+    instance._search_name_changed = previous is not None and previous['name'] != instance.name
+    if sender is Device:
+        instance._previous_assigned_to_id = previous['assigned_to_id'] if previous else None
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def invalidate_assigned_device_cache(sender, instance, **kwargs):
+    """
+    Signal handler to drop the cached device ids of the engineers a device was
+    and is now assigned to.
+    """
+    previous = getattr(instance, '_previous_assigned_to_id', None)
+    if kwargs.get('signal') is post_delete or previous != instance.assigned_to_id:
+        invalidate_assigned_devices(previous, instance.assigned_to_id)
+
+@receiver(pre_save, sender=Device)
+@receiver(pre_save, sender=TestProtocol)
+@receiver(pre_save, sender=TestResult)
+def assign_search_vector(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal handler to write a row's full-text search vector in the same INSERT
+    or UPDATE as the row itself.
+    """
+    instance._search_vector_stale = False
+    if connection.vendor != 'postgresql':
+        return
+    if update_fields is None or 'search_vector' in update_fields:
+        instance.search_vector = instance_vector(instance)
+    elif SEARCH_SOURCE_FIELDS[sender] & set(update_fields):
+        # update_fields cannot be extended here, so the vector follows in its own UPDATE
+        instance._search_vector_stale = True
+
+@receiver(post_save, sender=Device)
+@receiver(post_save, sender=TestProtocol)
+@receiver(post_save, sender=TestResult)
+def update_search_vector(sender, instance, **kwargs):
+    """
+    Signal handler to finish search vector upkeep once a row is saved: a vector
+    left out of update_fields is written now, and the vectors of a renamed
+    device's or protocol's test results are rebuilt by Celery after commit.
+    """
+    if instance._search_vector_stale:
+        update_search_vectors(sender.objects.filter(pk=instance.pk))
+    if getattr(instance, '_search_name_changed', False):
+        related = {Device: 'device', TestProtocol: 'protocol'}[sender]
+        related_id = instance.pk
+        transaction.on_commit(lambda: refresh_result_search_vectors.delay(related, related_id))
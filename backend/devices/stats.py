@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Aggregate, Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncWeek
+
+# Query parameter value -> model fields and aliased expressions to group by
+GROUPINGS = {
+    'device': (['device'], {'device_name': F('device__name')}),
+    'protocol': (['protocol'], {'protocol_name': F('protocol__name')}),
+    'device_type': ([], {'device_type': F('device__device_type')}),
+    'engineer': (['performed_by'], {'performed_by_username': F('performed_by__username')}),
+    'day': ([], {'day': TruncDay('start_time')}),
+    'week': ([], {'week': TruncWeek('start_time')}),
+}
+
+# Groupings available when reading TestResultDailyRollup instead of TestResult
+ROLLUP_GROUPINGS = {
+    'device': GROUPINGS['device'],
+    'protocol': GROUPINGS['protocol'],
+    'device_type': GROUPINGS['device_type'],
+    'day': (['day'], {}),
+    'week': ([], {'week': TruncWeek('day')}),
+}
+
+PERCENTILES = {'p50_duration': 0.5, 'p95_duration': 0.95}
+
+STATUS_COUNTS = {
+    'passed': 'PASS',
+    'failed': 'FAIL',
+    'invalid': 'INVALID',
+    'in_progress': 'IN_PROGRESS',
+}
+
+
+class Percentile(Aggregate):
+    """
+    Continuous percentile of an expression (PostgreSQL ``percentile_cont``).
+    """
+    function = 'PERCENTILE_CONT'
+    name = 'Percentile'
+    template = '%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, percentile, **extra):
+        super().__init__(expression, percentile=float(percentile), **extra)
+
+
+def parse_group_by(value, groupings=GROUPINGS):
+    """
+    Split a comma separated ``group_by`` parameter, raising ``ValueError`` for
+    unknown groupings.
+    """
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in groupings]
+    if unknown:
+        raise ValueError(f"Unknown group_by value(s): {', '.join(unknown)}")
+    return names
+
+
+def seconds(value):
+    return value.total_seconds() if value is not None else None
+
+
+def summarize(row):
+    """
+    Add the pass rate to an aggregated row and convert durations to seconds.
+    """
+    completed = row['passed'] + row['failed'] + row['invalid']
+    row['pass_rate'] = round(row['passed'] / completed, 4) if completed else None
+    for key in ['mean_duration', *PERCENTILES]:
+        if key in row:
+            row[key] = seconds(row[key])
+    return row
+
+
+def result_statistics(queryset, group_by=()):
+    """
+    Aggregate status counts and test durations for ``queryset`` in one query.
+
+    Percentiles are only computed on PostgreSQL.
+    """
+    duration = ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+    aggregates = {'total': Count('id')}
+    aggregates.update({
+        key: Count('id', filter=Q(status=value))
+        for key, value in STATUS_COUNTS.items()
+    })
+    aggregates['mean_duration'] = Avg(duration)
+    if connection.vendor == 'postgresql':
+        aggregates.update({
+            key: Percentile(duration, percentile, output_field=DurationField())
+            for key, percentile in PERCENTILES.items()
+        })
+
+    queryset = queryset.order_by()
+    if not group_by:
+        return [summarize(queryset.aggregate(**aggregates))]
+
+    return [summarize(row) for row in grouped(queryset, GROUPINGS, group_by, aggregates)]
+
+
+def grouped(queryset, groupings, group_by, aggregates):
+    fields, expressions = [], {}
+    for name in group_by:
+        fields.extend(groupings[name][0])
+        expressions.update(groupings[name][1])
+    return queryset.values(*fields, **expressions).annotate(**aggregates).order_by(*fields, *expressions)
+
+
+def summarize_rollup(row):
+    completed = row.pop('completed_count') or 0
+    duration_total = row.pop('duration_total') or timedelta(0)
+    for key in ['total', *STATUS_COUNTS]:
+        row[key] = row[key] or 0
+    row['mean_duration'] = duration_total / completed if completed else None
+    return summarize(row)
+
+
+def rollup_statistics(queryset, group_by=()):
+    """
+    Same as ``result_statistics`` but read from TestResultDailyRollup rows, so
+    the cost depends on the number of days rather than the number of results.
+
+    Percentiles cannot be derived from rollups and are omitted.
+    """
+    aggregates = {'total': Sum('result_count')}
+    aggregates.update({
+        key: Sum('result_count', filter=Q(status=value))
+        for key, value in STATUS_COUNTS.items()
+    })
+    aggregates['completed_count'] = Sum('completed_count')
+    aggregates['duration_total'] = Sum('duration_total')
+
+    queryset = queryset.order_by()
+    if not group_by:
+        return [summarize_rollup(queryset.aggregate(**aggregates))]
+    return [summarize_rollup(row) for row in grouped(queryset, ROLLUP_GROUPINGS, group_by, aggregates)]
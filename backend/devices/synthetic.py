@@ -0,0 +1,261 @@
+import json
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+from itertools import accumulate, islice
+
+from django.core.management import call_command
+from django.db import connection, models, transaction
+
+MODEL_NUMBER_PREFIX = 'SEED-'
+ENGINEER_PREFIX = 'seed-engineer-'
+PROTOCOL_PREFIX = 'Seed Protocol'
+
+DEVICE_FAMILIES = {
+    'MONITORING': ['Cardiac Monitor', 'Vital Signs Monitor', 'Glucose Monitor', 'Pulse Oximeter'],
+    'DIAGNOSTIC': ['Blood Analyzer', 'Ultrasound Scanner', 'ECG Recorder', 'Urine Analyzer'],
+    'IMPLANT': ['Neural Implant', 'Pacemaker', 'Cochlear Implant', 'Insulin Pump'],
+    'THERAPEUTIC': ['Therapy Device', 'Infusion Pump', 'Ventilator', 'Dialysis Unit'],
+}
+# Monitoring and diagnostic devices dominate the fleet
+DEVICE_TYPE_WEIGHTS = {'MONITORING': 45, 'DIAGNOSTIC': 35, 'THERAPEUTIC': 15, 'IMPLANT': 5}
+MANUFACTURERS = ['VitalBio Medical', 'VitalBio Neuro', 'VitalBio Diagnostics', 'VitalBio Therapeutics', 'Acme Health']
+MANUFACTURER_WEIGHTS = [40, 10, 30, 15, 5]
+DESCRIPTIONS = [
+    'Portable {family} for ward use',
+    'Next-generation {family} with wireless telemetry',
+    'Pediatric {family} with low power mode',
+    'Refurbished {family} returned from the field',
+]
+
+NOTES = [
+    'All checks within tolerance',
+    'Retested after recalibration',
+    'Sensor drift observed near the end of the run',
+    'Power consumption above specification',
+    'Operator aborted the run',
+]
+FIRMWARE_VERSIONS = ['2.4.1', '2.4.0', '2.3.7', '3.0.0-rc1']
+FIRMWARE_WEIGHTS = [60, 25, 10, 5]
+
+DATA_GENERATORS = {
+    'voltage': lambda rng, status, duration: round(rng.gauss(3.3, 0.05), 3),
+    'current': lambda rng, status, duration: round(rng.lognormvariate(-1.0, 0.4), 3),
+    'temperature': lambda rng, status, duration: round(rng.gauss(36.8, 1.5), 2),
+    'test_duration': lambda rng, status, duration: duration,
+    'error_count': lambda rng, status, duration: rng.randint(1, 5) if status == 'FAIL' else 0,
+    'firmware_version': lambda rng, status, duration: rng.choices(FIRMWARE_VERSIONS, FIRMWARE_WEIGHTS)[0],
+    'calibrated': lambda rng, status, duration: rng.random() < 0.9,
+}
+OPTIONAL_DATA_KEYS = ['voltage', 'current', 'temperature', 'firmware_version', 'calibrated']
+
+DEVICE_FIELDS = [
+    'name', 'device_type', 'model_number', 'manufacturer', 'description', 'created_at', 'updated_at', 'assigned_to_id',
+]
+PROTOCOL_DEVICE_FIELDS = ['testprotocol_id', 'device_id']
+RESULT_FIELDS = [
+    'device_id', 'protocol_id', 'performed_by_id', 'status', 'start_time', 'end_time', 'notes', 'data',
+    'created_at', 'updated_at',
+]
+
+
+def zipf_cum_weights(rng, count, exponent):
+    """
+    Cumulative Zipf weights over ``count`` items, shuffled so the popular
+    items are spread across the range rather than being the first ones.
+    """
+    weights = [1 / rank ** exponent for rank in range(1, count + 1)]
+    rng.shuffle(weights)
+    return list(accumulate(weights))
+
+
+def generate_devices(rng, count, engineer_ids, start, end):
+    """
+    Yield ``DEVICE_FIELDS`` rows created between ``start`` and ``end``. A few
+    engineers own most of the devices and a fifth are unassigned.
+    """
+    engineer_weights = zipf_cum_weights(rng, len(engineer_ids), 1.0) if engineer_ids else None
+    span = (end - start).total_seconds()
+    created = sorted(rng.random() * span for _ in range(count))
+    device_types = list(DEVICE_TYPE_WEIGHTS)
+    type_weights = list(DEVICE_TYPE_WEIGHTS.values())
+    for i, offset in enumerate(created):
+        device_type = rng.choices(device_types, type_weights)[0]
+        family = rng.choice(DEVICE_FAMILIES[device_type])
+        created_at = start + timedelta(seconds=offset)
+        assigned_to_id = None
+        if engineer_ids and rng.random() >= 0.2:
+            assigned_to_id = rng.choices(engineer_ids, cum_weights=engineer_weights)[0]
+        yield (
+            f'{family} {chr(ord("A") + rng.randrange(26))}{rng.randint(1, 9)}',
+            device_type,
+            f'{MODEL_NUMBER_PREFIX}{i:08d}',
+            rng.choices(MANUFACTURERS, MANUFACTURER_WEIGHTS)[0],
+            rng.choice(DESCRIPTIONS).format(family=family.lower()),
+            created_at,
+            created_at,
+            assigned_to_id,
+        )
+
+
+def generate_protocol_devices(rng, protocol_ids, device_ids):
+    """
+    Yield ``PROTOCOL_DEVICE_FIELDS`` rows linking every device to one to three
+    protocols, with a few protocols covering most of the fleet.
+    """
+    protocol_weights = zipf_cum_weights(rng, len(protocol_ids), 1.0)
+    for device_id in device_ids:
+        picks = rng.choices(protocol_ids, cum_weights=protocol_weights, k=rng.choice((1, 1, 2, 3)))
+        for protocol_id in dict.fromkeys(picks):
+            yield protocol_id, device_id
+
+
+def protocol_data_keys(rng, protocol_ids):
+    """
+    Pick the ``TestResult.data`` keys each protocol records.
+    """
+    return {
+        protocol_id: ['test_duration', 'error_count'] + rng.sample(OPTIONAL_DATA_KEYS, rng.randint(1, 4))
+        for protocol_id in protocol_ids
+    }
+
+
+def daily_counts(count, days):
+    """
+    Split ``count`` results over ``days`` days, growing over time with quiet
+    weekends. Counts add up to exactly ``count``.
+    """
+    weights = [(0.5 + day / days) * (0.35 if day % 7 in (5, 6) else 1) for day in range(days)]
+    total = sum(weights)
+    bounds = [round(count * weight / total) for weight in accumulate(weights)]
+    bounds[-1] = count
+    return [high - low for low, high in zip([0] + bounds, bounds)]
+
+
+def generate_results(rng, count, devices, device_protocols, data_keys, engineer_ids, until, days):
+    """
+    Yield ``RESULT_FIELDS`` rows in ``created_at`` order over the ``days`` days
+    before ``until``, mostly during working hours.
+
+    ``devices`` is a list of ``(device_id, assigned_to_id)``. Results are skewed
+    towards a few hot devices, run by the assigned engineer where there is one.
+    Recent tests are often still in progress.
+    """
+    device_weights = zipf_cum_weights(rng, len(devices), 1.1)
+    engineer_weights = zipf_cum_weights(rng, len(engineer_ids), 1.0)
+    first_day = until - timedelta(days=days)
+    for day, day_count in enumerate(daily_counts(count, days)):
+        day_start = first_day + timedelta(days=day)
+        offsets = sorted(rng.triangular(6, 22, 13) * 3600 for _ in range(day_count))
+        picks = rng.choices(devices, cum_weights=device_weights, k=day_count)
+        for offset, (device_id, assigned_to_id) in zip(offsets, picks):
+            start_time = day_start + timedelta(seconds=offset)
+            recent = until - start_time < timedelta(days=1)
+            if rng.random() < (0.35 if recent else 0.01):
+                status = 'IN_PROGRESS'
+            else:
+                status = rng.choices(('PASS', 'FAIL', 'INVALID'), (80, 16, 4))[0]
+            duration = int(rng.lognormvariate(6.4, 0.8))
+            end_time = None if status == 'IN_PROGRESS' else start_time + timedelta(seconds=duration)
+
+            performed_by_id = assigned_to_id
+            if performed_by_id is None or rng.random() < 0.15:
+                performed_by_id = rng.choices(engineer_ids, cum_weights=engineer_weights)[0]
+            protocol_id = rng.choice(device_protocols[device_id])
+            data = {key: DATA_GENERATORS[key](rng, status, duration) for key in data_keys[protocol_id]}
+            yield (
+                device_id,
+                protocol_id,
+                performed_by_id,
+                status,
+                start_time,
+                end_time,
+                rng.choice(NOTES) if rng.random() < 0.3 else '',
+                data,
+                start_time,
+                end_time or start_time,
+            )
+
+
+def write_rows(model, fields, rows, batch_size=10000):
+    """
+    Insert ``rows``, tuples of values for the ``fields`` attnames of ``model``.
+
+    PostgreSQL gets a single ``COPY FROM STDIN`` with nothing buffered beyond
+    the driver's own batching. Other databases fall back to ``bulk_create`` in
+    batches, where ``auto_now`` fields are set to the current time. No signals
+    are sent. Returns the number of rows written.
+    """
+    opts = model._meta
+    columns = [opts.get_field(name) for name in fields]
+    rows = iter(rows)
+    count = 0
+    if connection.vendor == 'postgresql':
+        quote = connection.ops.quote_name
+        sql = f'COPY {quote(opts.db_table)} ({", ".join(quote(field.column) for field in columns)}) FROM STDIN'
+        json_columns = [i for i, field in enumerate(columns) if isinstance(field, models.JSONField)]
+        with connection.cursor() as cursor, cursor.cursor.copy(sql) as copy:
+            for row in rows:
+                if json_columns:
+                    row = list(row)
+                    for i in json_columns:
+                        row[i] = json.dumps(row[i])
+                copy.write_row(row)
+                count += 1
+        return count
+
+    while batch := list(islice(rows, batch_size)):
+        model.objects.bulk_create([model(**dict(zip(fields, row))) for row in batch])
+        count += len(batch)
+    return count
+
+
+@contextmanager
+def deferred_indexes(*models):
+    """
+    Drop the ``Meta.indexes`` of ``models`` for the duration of a bulk load and
+    rebuild them at the end, which is far cheaper than maintaining them row by
+    row. Indexes that do not exist are left alone. The tables stay locked
+    until the surrounding transaction ends. A no-op outside PostgreSQL.
+    """
+    if connection.vendor != 'postgresql':
+        yield
+        return
+
+    dropped = []
+    with connection.cursor() as cursor:
+        for model in models:
+            existing = connection.introspection.get_constraints(cursor, model._meta.db_table)
+            dropped += [(model, index) for index in model._meta.indexes if index.name in existing]
+    with connection.schema_editor() as editor:
+        for model, index in dropped:
+            editor.remove_index(model, index)
+    yield
+    with connection.cursor() as cursor:
+        # Indexes cannot be built while deferred foreign key checks are pending
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    with connection.schema_editor() as editor:
+        for model, index in dropped:
+            editor.add_index(model, index)
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run a block in a transaction that is rolled back when it ends, so that
+    benchmarks keep none of the rows they insert or write.
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@contextmanager
+def seeded(devices, results, engineers, seed=0):
+    """
+    Load a data set with the ``seed`` command for the duration of a block,
+    rolling it back afterwards along with anything the block wrote.
+    """
+    with rolled_back():
+        call_command('seed', devices=devices, results=results, engineers=engineers, seed=seed, stdout=StringIO())
+        yield
@@ -1,37 +1,116 @@
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
-# from devices.models import TestResult
+from .data_indexes import sync_data_indexes
+from .exports import run_export_job
+from .models import ExportJob, TestProtocol, TestResult
+from .notifications import build_digest, drain_pending, push_pending
+from .rollups import recompute_buckets, refresh_rollups
+from .search import update_result_search_vectors
 
 @shared_task
-def send_test_result_notification(test_result_id):
+def flush_test_result_notifications():
     """
-    Send an email notification when a new test result is created. Work in progress.
+    Drain buffered test result ids and email one digest per chunk.
+
+    Each chunk is loaded with a single query and its digest is sent before the
+    next chunk is drained, over one mail connection reused for the whole run.
+    At most ``NOTIFICATION_MAX_CHUNKS`` chunks are handled per run. If a send
+    fails, only that chunk's ids are put back and the run stops; later chunks
+    were never drained and stay buffered.
     """
+    connection = get_connection(fail_silently=False)
+    digests = 0
+    notified = 0
     try:
-        # test_result = TestResult.objects.get(id=test_result_id)
-        # subject = f'New Test Result Created: {test_result.device.name}'
-        # message = f"""
-        # A new test result has been created:
-        
-        # Device: {test_result.device.name}
-        # Protocol: {test_result.protocol.name}
-        # Status: {test_result.status}
-        # Performed by: {test_result.performed_by.username}
-        # Start Time: {test_result.start_time}
-        
-        # You can view the full details in the admin panel.
-        # """
-        
-        # send_mail(
-        #     subject=subject,
-        #     message=message,
-        #     from_email=settings.DEFAULT_FROM_EMAIL,
-        #     recipient_list=['admin@example.com'],
-        #     fail_silently=False,
-        # )
-        return f"Email notification sent for test result {test_result_id}"
-    except TestResult.DoesNotExist:
-        return f"Test result {test_result_id} not found"
+        for _ in range(settings.NOTIFICATION_MAX_CHUNKS):
+            ids = drain_pending(settings.NOTIFICATION_BATCH_SIZE)
+            if not ids:
+                break
+            test_results = list(
+                TestResult.objects.filter(id__in=ids)
+                .select_related('device', 'protocol', 'performed_by')
+                .order_by('created_at')
+            )
+            if not test_results:
+                continue
+            subject, body = build_digest(test_results)
+            message = EmailMessage(
+                subject=subject,
+                body=body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=settings.NOTIFICATION_RECIPIENTS,
+            )
+            try:
+                # Opening explicitly keeps send_messages from closing the session
+                if not digests:
+                    connection.open()
+                connection.send_messages([message])
+            except Exception as e:
+                # Put this chunk back so the next flush retries it
+                push_pending(ids)
+                return f"Error sending email notification after {digests} digests: {str(e)}"
+            digests += 1
+            notified += len(test_results)
+    finally:
+        connection.close()
+
+    if not digests:
+        return "No pending test result notifications"
+    return f"Email notification sent for {notified} test results in {digests} digests"
+
+@shared_task
+def refresh_result_rollups():
+    """
+    Fold test results changed since the last run into the daily rollups.
+    """
+    count = refresh_rollups()
+    if count is None:
+        return "Rollup watermark is not set; run the backfill_rollups command first"
+    return f"Recomputed {count} rollup buckets"
+
+@shared_task
+def recompute_result_rollups(buckets):
+    """
+    Rebuild the daily rollups of the given ``[day, device_id, protocol_id]`` buckets.
+    """
+    return f"Recomputed {recompute_buckets(buckets)} rollup buckets"
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def run_export(job_id):
+    """
+    Run or resume a background export job.
+
+    The message is only acknowledged once the job finishes, so a job whose
+    worker dies is redelivered and resumes from its last checkpoint.
+    """
+    job = ExportJob.objects.select_related('created_by__role').get(id=job_id)
+    if job.status == 'COMPLETED':
+        return f"Export {job_id} already completed"
+    try:
+        run_export_job(job)
     except Exception as e:
-        return f"Error sending email notification: {str(e)}" 
\ No newline at end of file
+        job.status = 'FAILED'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        return f"Export {job_id} failed: {str(e)}"
+    return f"Export {job_id} wrote {job.rows_written} rows"
+
+@shared_task
+def sync_protocol_data_indexes(protocol_id):
+    """
+    Bring a protocol's TestResult.data expression indexes in line with its
+    indexed_data_keys, dropping them all if the protocol was deleted.
+    """
+    keys = TestProtocol.objects.filter(id=protocol_id).values_list('indexed_data_keys', flat=True).first() or []
+    created, dropped = sync_data_indexes(protocol_id, keys)
+    return f"Created {len(created)} and dropped {len(dropped)} data indexes for protocol {protocol_id}"
+
+@shared_task
+def refresh_result_search_vectors(related, related_id):
+    """
+    Rebuild the search vectors of the test results of a renamed device or
+    protocol, where ``related`` is ``'device'`` or ``'protocol'``.
+    """
+    count = update_result_search_vectors(settings.SEARCH_VECTOR_CHUNK_SIZE, **{related: related_id})
+    return f"Updated search vectors of {count} test results of {related} {related_id}"
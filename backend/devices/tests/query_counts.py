@@ -0,0 +1,145 @@
+"""
+Query count regression checks for router-registered API actions.
+
+``QueryCountMixin`` walks every action a set of DRF routers exposes, calls it
+against a small and a large data set, and fails when an action issues more
+queries on the larger one, listing the statements that were repeated. New
+actions fail until they are given a request to make or are exempted.
+"""
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import close_old_connections, transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from config.metrics import RequestMetrics
+
+
+class RouterAction:
+    """
+    One HTTP method of one route, e.g. ``devicelist.assign`` on POST.
+    """
+    def __init__(self, basename, action, method, url_name, detail):
+        self.basename = basename
+        self.action = action
+        self.method = method
+        self.url_name = url_name
+        self.detail = detail
+
+    @property
+    def key(self):
+        return f'{self.basename}.{self.action}'
+
+
+def router_actions(*routers):
+    """
+    Return a ``RouterAction`` for every method mapped on every route of the
+    viewsets registered with ``routers``, including extra actions.
+    """
+    actions = []
+    for router in routers:
+        for prefix, viewset, basename in router.registry:
+            for route in router.get_routes(viewset):
+                for method, action in router.get_method_map(viewset, route.mapping).items():
+                    actions.append(RouterAction(basename, action, method, route.name.format(basename=basename),
+                                                route.detail))
+    return actions
+
+
+class QueryCountMixin:
+    """
+    TestCase mixin that asserts API actions run a constant number of queries.
+
+    Subclasses set ``routers``, implement ``build_dataset(size)`` returning a
+    fixture with a ``users`` list to call the API as, and map every action key
+    to a function of the fixture returning the request to make in
+    ``action_requests``: ``{'pk': ..., 'query': {...}, 'data': ...}``, all
+    optional. Requests made as the first user must succeed. ``exempt`` maps the
+    keys of actions left unchecked to the reason.
+
+    Each request is rolled back so every one sees the data set as built, and
+    the cache is cleared before it so both sizes start cold.
+    """
+    routers = ()
+    sizes = (2, 12)
+    action_requests = {}
+    exempt = {}
+
+    def build_dataset(self, size):
+        raise NotImplementedError
+
+    def call_action(self, client, action, request):
+        kwargs = {'pk': request['pk']} if action.detail else {}
+        path = reverse(action.url_name, kwargs=kwargs)
+        call = getattr(client, action.method)
+        if action.method == 'get':
+            return call(path, request.get('query'))
+        query = request.get('query')
+        if query:
+            path = f"{path}?{'&'.join(f'{name}={value}' for name, value in query.items())}"
+        return call(path, request.get('data'), format='json')
+
+    def measure(self, action, fixture, user):
+        """
+        Make ``action``'s request as ``user`` in a savepoint that is rolled back,
+        returning the response status and its ``RequestMetrics``.
+        """
+        client = APIClient()
+        client.force_authenticate(user)
+        request = self.action_requests[action.key](fixture)
+        metrics = RequestMetrics()
+        cache.clear()
+        savepoint = transaction.savepoint()
+        try:
+            with metrics.capture():
+                response = self.call_action(client, action, request)
+                if response.streaming:
+                    # Streamed bodies query while they are consumed
+                    b''.join(response.streaming_content)
+                    # As the test client does, so closing does not close the connection
+                    request_finished.disconnect(close_old_connections)
+                    try:
+                        response.close()
+                    finally:
+                        request_finished.connect(close_old_connections)
+        finally:
+            transaction.savepoint_rollback(savepoint)
+        return response.status_code, metrics
+
+    def measure_size(self, actions, size):
+        savepoint = transaction.savepoint()
+        try:
+            fixture = self.build_dataset(size)
+            return {
+                (action.key, action.method, role): self.measure(action, fixture, user)
+                for action in actions
+                for role, user in enumerate(fixture['users'])
+            }
+        finally:
+            transaction.savepoint_rollback(savepoint)
+
+    def assertConstantQueries(self):
+        actions = [action for action in router_actions(*self.routers) if action.key not in self.exempt]
+        missing = sorted({action.key for action in actions} - set(self.action_requests))
+        self.assertFalse(missing, f"No query count request for: {', '.join(missing)}")
+
+        # Repeated statements are reported below rather than logged
+        with override_settings(METRICS_DUPLICATE_QUERY_THRESHOLD=0):
+            small, large = [self.measure_size(actions, size) for size in self.sizes]
+        failures = []
+        for (name, method, role), (small_status, small_metrics) in small.items():
+            large_status, large_metrics = large[name, method, role]
+            # Later users may be refused, e.g. engineers on the users endpoints
+            if max(small_status, large_status) >= (400 if role == 0 else 500):
+                failures.append(f"{method.upper()} {name} as user {role} returned {small_status} and {large_status}")
+            if large_metrics.queries > small_metrics.queries:
+                repeated = [
+                    f"  {small_metrics.statements[sql]} -> {count}x {sql}"
+                    for sql, count in large_metrics.statements.most_common()
+                    if count > small_metrics.statements[sql]
+                ]
+                failures.append(
+                    f"{method.upper()} {name} as user {role} ran {small_metrics.queries} queries with "
+                    f"{self.sizes[0]} rows and {large_metrics.queries} with {self.sizes[1]}:\n" + '\n'.join(repeated)
+                )
+        self.assertFalse(failures, '\n\n'.join(failures))
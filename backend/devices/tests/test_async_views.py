@@ -0,0 +1,136 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import include, path, reverse
+from rest_framework.authtoken.models import Token
+from users.authentication import local_tokens
+from users.models import CustomUser, Role
+from devices.models import Device, TestProtocol, TestResult
+from devices.urls import async_urlpatterns, router
+
+urlpatterns = [
+    path('api/devices/', include([*async_urlpatterns, path('', include(router.urls))])),
+]
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+        self.admin_user = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123'
+        )
+        self.engineer = CustomUser.objects.create_user(
+            username='engineer',
+            email='engineer@test.com',
+            password='engineer123',
+            role=Role.objects.create(name='ENGINEER')
+        )
+        self.protocol = TestProtocol.objects.create(
+            name='Test Protocol',
+            version='1.0',
+            description='Test protocol description',
+            created_by=self.admin_user
+        )
+        self.devices = []
+        for i in range(3):
+            device = Device.objects.create(
+                name=f'Device {i}',
+                device_type='DIAGNOSTIC',
+                model_number=f'AS-{i:03d}',
+                manufacturer='Test Corp',
+                description='Test device description',
+                assigned_to=self.engineer if i == 0 else None
+            )
+            self.protocol.devices.add(device)
+            self.devices.append(device)
+        self.results = [
+            TestResult.objects.create(device=device, protocol=self.protocol, performed_by=self.admin_user)
+            for device in self.devices
+        ]
+
+    def client_for(self, user):
+        # AsyncClient defaults are sent as raw ASGI headers
+        token = Token.objects.create(user=user)
+        return AsyncClient(enforce_csrf_checks=True, authorization=f'Token {token.key}')
+
+    async def test_list_walks_cursor_pages(self):
+        """Test that async lists paginate by cursor like the sync viewsets"""
+        client = await self.client_for_async(self.admin_user)
+        response = await client.get(reverse('results-list'), {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual(page['count'], 3)
+        self.assertEqual([row['id'] for row in page['results']], [self.results[2].id, self.results[1].id])
+        self.assertEqual(page['results'][0]['device_name'], 'Device 2')
+
+        response = await client.get(page['next'])
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.results[0].id])
+
+    async def test_lists_and_retrieve_are_scoped(self):
+        """Test that async reads apply role scoping and object permissions"""
+        client = await self.client_for_async(self.engineer)
+        response = await client.get(reverse('results-list'))
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.results[0].id])
+
+        response = await client.get(reverse('results-detail', args=[self.results[0].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['device'], self.devices[0].id)
+        response = await client.get(reverse('results-detail', args=[self.results[1].id]))
+        self.assertEqual(response.status_code, 404)
+
+        response = await AsyncClient().get(reverse('results-list'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_cached_list_and_fallbacks(self):
+        """Test cached device lists, page number fallback and sync writes"""
+        client = await self.client_for_async(self.admin_user)
+        response = await client.get(reverse('protocols-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(response.json()['results'][0]['devices'], [device.id for device in self.devices])
+        response = await client.get(reverse('protocols-list'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        response = await client.get(reverse('devicelist-list'), {'page': 1})
+        self.assertEqual(response.json()['count'], 3)
+
+        response = await client.post(reverse('devicelist-list'), {
+            'name': 'New Device',
+            'device_type': 'DIAGNOSTIC',
+            'model_number': 'AS-NEW',
+            'manufacturer': 'Test Corp',
+            'description': 'Created through the sync fallback'
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = await client.patch(reverse('devicelist-detail', args=[self.devices[0].id]), {
+            'description': 'Updated through the sync fallback'
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_session_writes_still_need_csrf(self):
+        """Test that session-authenticated writes are CSRF checked by the sync viewset"""
+        client = AsyncClient(enforce_csrf_checks=True)
+        await client.aforce_login(self.admin_user)
+        response = await client.delete(reverse('devicelist-detail', args=[self.devices[0].id]))
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('CSRF', response.json()['detail'])
+
+    async def test_value_rows_match_serializers(self):
+        """Test that async lists built from value rows match the serializers"""
+        client = await self.client_for_async(self.admin_user)
+        for name in ('devicelist-list', 'protocols-list', 'results-list'):
+            responses = []
+            for enabled in (False, True):
+                await cache.aclear()
+                with self.settings(VALUE_LIST_ROWS=enabled):
+                    responses.append(await client.get(reverse(name), {'page_size': 2}))
+            self.assertEqual(responses[1].content, responses[0].content, name)
+
+    async def client_for_async(self, user):
+        return await sync_to_async(self.client_for)(user)
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from devices.models import Device, TestResult
+
+
+class BenchmarkApiTests(TestCase):
+    def setUp(self):
+        handle, self.output = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, self.output)
+
+    def benchmark(self, **options):
+        call_command('benchmark_api', size=['tiny'], requests=2, warmup=0, stdout=StringIO(), **options)
+
+    def test_reports_every_scenario_and_rolls_back(self):
+        """Test that the benchmark times every scenario without errors and leaves no data behind"""
+        with mock.patch('devices.management.commands.benchmark_api.invalidate_tokens') as invalidate:
+            self.benchmark(output=self.output)
+        # Nor a cached entry for its rolled back token
+        invalidate.assert_called_once()
+        with open(self.output) as f:
+            report = json.load(f)
+
+        dataset = report['datasets']['tiny']
+        self.assertEqual(dataset['dataset'], {'devices': 20, 'results': 300, 'engineers': 3})
+        self.assertIn('results.complete', dataset['scenarios'])
+        for name, stats in dataset['scenarios'].items():
+            self.assertEqual(stats['errors'], 0, name)
+            self.assertEqual(stats['requests'], 2)
+            self.assertGreater(stats['queries_mean'], 0, name)
+        self.assertFalse(Device.objects.exists())
+        self.assertFalse(TestResult.objects.exists())
+
+    def test_compare_flags_regressions(self):
+        """Test that comparing against a faster baseline with fewer queries fails"""
+        self.benchmark(output=self.output, scenario=['devices.list'])
+        with open(self.output) as f:
+            report = json.load(f)
+
+        # Latency noise alone never counts as a regression
+        self.benchmark(scenario=['devices.list'], compare=self.output, threshold=1000)
+
+        stats = report['datasets']['tiny']['scenarios']['devices.list']
+        stats['queries_mean'] -= 1
+        with open(self.output, 'w') as f:
+            json.dump(report, f)
+        with self.assertRaisesMessage(CommandError, '1 regressions'):
+            self.benchmark(scenario=['devices.list'], compare=self.output, threshold=1000)
+
+
+class BenchmarkDrfTests(TestCase):
+    def test_reports_every_case_and_rolls_back(self):
+        """Test that the microbenchmarks report each case per object and leave no data behind"""
+        out = StringIO()
+        call_command('benchmark_drf', devices=20, results=200, engineers=3, objects=30, repeat=1,
+                     top=1, profile=3, stdout=out)
+        output = out.getvalue()
+        for name in ('serialize.device', 'serialize.protocol', 'serialize.result', 'validate.device',
+                     'validate.protocol', 'validate.result', 'filter.device', 'filter.result.sql',
+                     'permission.device.manager', 'permission.protocol.engineer', 'permission.result.engineer'):
+            self.assertIn(f'{name} ', output)
+        self.assertIn('us/object', output)
+        self.assertIn('ncalls', output)
+        self.assertFalse(Device.objects.exists())
+
+        out = StringIO()
+        call_command('benchmark_drf', devices=20, results=200, engineers=3, objects=30, repeat=1,
+                     case=['permission.'], stdout=out)
+        self.assertNotIn('serialize.', out.getvalue())
+        self.assertIn('permission.result.engineer', out.getvalue())
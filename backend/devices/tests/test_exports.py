@@ -0,0 +1,129 @@
+import csv
+import gzip
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from users.models import CustomUser, Role
+from devices import exports, tasks
+from devices.models import Device, ExportJob, TestProtocol, TestResult
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    EXPORT_CHUNK_SIZE=2,
+)
+class ExportJobTests(TestCase):
+    def setUp(self):
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root)
+        settings_override = self.settings(EXPORT_ROOT=export_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.engineer = CustomUser.objects.create_user(
+            username='engineer',
+            password='engineer123',
+            role=Role.objects.create(name='ENGINEER')
+        )
+        self.device = Device.objects.create(
+            name='Test Device',
+            device_type='DIAGNOSTIC',
+            model_number='TEST-001',
+            manufacturer='Test Corp',
+            description='Test device description',
+            assigned_to=self.engineer
+        )
+        other_device = Device.objects.create(
+            name='Other Device',
+            device_type='IMPLANT',
+            model_number='TEST-002',
+            manufacturer='Test Corp',
+            description='Not assigned to the engineer'
+        )
+        protocol = TestProtocol.objects.create(
+            name='Test Protocol',
+            version='1.0',
+            description='Test protocol description',
+            created_by=self.engineer
+        )
+        for device, status_value in [(self.device, 'PASS')] * 5 + [(other_device, 'PASS'), (self.device, 'FAIL')]:
+            TestResult.objects.create(device=device, protocol=protocol, performed_by=self.engineer, status=status_value)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.engineer)
+
+    def read_csv(self, job):
+        with gzip.open(job.file_path, 'rt') as export:
+            return list(csv.DictReader(export))
+
+    def test_export_job_lifecycle(self):
+        """Test creating, polling and downloading a background export"""
+        with mock.patch('devices.views.run_export.delay', side_effect=tasks.run_export):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse('exports-list'),
+                    {'resource': 'results', 'filters': {'status': 'PASS'}},
+                    format='json'
+                )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        detail = self.client.get(reverse('exports-detail', args=[response.data['id']]))
+        self.assertEqual(detail.data['status'], 'COMPLETED')
+        self.assertEqual(detail.data['progress'], {'rows_written': 5, 'total_rows': 5})
+
+        download = self.client.get(reverse('exports-download', args=[response.data['id']]))
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        content = gzip.decompress(b''.join(download.streaming_content)).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row['device_name'] for row in rows}, {'Test Device'})
+
+    def test_invalid_filters_rejected_on_creation(self):
+        """Test that a job with invalid filters is rejected before it is queued"""
+        with mock.patch('devices.views.run_export.delay') as delay:
+            response = self.client.post(
+                reverse('exports-list'),
+                {'resource': 'results', 'filters': {'status': 'UNKNOWN'}},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data['filters'])
+        self.assertFalse(ExportJob.objects.exists())
+        delay.assert_not_called()
+
+    def test_download_before_completion(self):
+        """Test that an unfinished export cannot be downloaded"""
+        job = ExportJob.objects.create(created_by=self.engineer)
+        response = self.client.get(reverse('exports-download', args=[job.id]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_resume_after_interruption(self):
+        """Test that a restarted job drops partial output and continues from its checkpoint"""
+        job = ExportJob.objects.create(created_by=self.engineer, filters={'status': 'PASS'})
+        checkpoint = exports.checkpoint
+        calls = []
+
+        def interrupt_second_chunk(job, output):
+            # Header and first chunk are checkpointed; the second chunk is written but not recorded
+            calls.append(job.last_pk)
+            if len(calls) == 3:
+                raise RuntimeError('worker lost')
+            checkpoint(job, output)
+
+        with mock.patch('devices.exports.checkpoint', side_effect=interrupt_second_chunk):
+            tasks.run_export(str(job.id))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_written), ('FAILED', 2))
+
+        tasks.run_export(str(job.id))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_written), ('COMPLETED', 5))
+        ids = [row['id'] for row in self.read_csv(job)]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
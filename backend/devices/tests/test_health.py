@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.test import AsyncClient, TestCase, override_settings
+
+
+def failing_check():
+    raise ConnectionError('connection refused')
+
+
+@override_settings(
+    ALLOWED_HOSTS=['api.example.com'],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class HealthCheckTests(TestCase):
+    def test_liveness(self):
+        """Test that liveness answers without queries or a valid Host header"""
+        with self.assertNumQueries(0):
+            response = self.client.get('/healthz', headers={'host': '10.0.0.12:8000'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readiness(self):
+        """Test that readiness checks the database and cache"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/readyz', headers={'host': '10.0.0.12:8000'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['checks']), {'database', 'cache'})
+
+    def test_readiness_failure(self):
+        """Test that a failing dependency makes readiness answer 503"""
+        with mock.patch.dict('config.health.READINESS_CHECKS', {'cache': failing_check}):
+            with self.assertLogs('config.health', 'ERROR') as logs:
+                response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        checks = response.json()['checks']
+        self.assertEqual(checks['database']['status'], 'ok')
+        # The error names hosts, so it is only logged
+        self.assertEqual(checks['cache'], {'status': 'error'})
+        self.assertIn('connection refused', logs.output[0])
+
+    async def test_async_probes(self):
+        """Test that the probes are answered when serving over ASGI"""
+        client = AsyncClient()
+        response = await client.get('/healthz')
+        self.assertEqual(response.status_code, 200)
+        response = await client.get('/readyz')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,108 @@
+import unittest
+
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection
+from django.test import TestCase
+from users.models import CustomUser
+from devices.data_indexes import sync_data_indexes
+from devices.models import Device, TestProtocol, TestResult
+from devices.filters import TestResultFilter
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'EXPLAIN checks require PostgreSQL')
+class TestResultIndexTests(TestCase):
+    """
+    Check that common TestResultFilter combinations are served by an index.
+
+    Sequential scans are disabled for the planner while explaining, so a plan
+    that still scans the table sequentially means no usable index exists.
+    """
+    filter_combinations = [
+        {'device': None},
+        {'protocol': None},
+        {'performed_by': None},
+        {'status': 'FAIL'},
+        {'status': 'IN_PROGRESS'},
+        {'created_at': '2024-03-20'},
+        {'start_time': '2024-03-20'},
+        {'end_time': '2024-03-20'},
+        {'device': None, 'status': 'PASS'},
+        {},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create_user(username='engineer', password='engineer123')
+        cls.device = Device.objects.create(
+            name='Test Device',
+            device_type='DIAGNOSTIC',
+            model_number='TEST-001',
+            manufacturer='Test Corp',
+            description='Test device description'
+        )
+        cls.protocol = TestProtocol.objects.create(
+            name='Test Protocol',
+            version='1.0',
+            description='Test protocol description',
+            created_by=user
+        )
+        cls.user = user
+        TestResult.objects.create(device=cls.device, protocol=cls.protocol, performed_by=user)
+
+    def explain(self, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        try:
+            return queryset.explain()
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+
+    def resolve(self, params):
+        ids = {'device': self.device.id, 'protocol': self.protocol.id, 'performed_by': self.user.id}
+        return {key: ids.get(key) if value is None else value for key, value in params.items()}
+
+    def test_filters_use_indexes(self):
+        """Test that filtered and ordered result queries avoid sequential scans"""
+        table = TestResult._meta.db_table
+        for params in self.filter_combinations:
+            data = self.resolve(params)
+            queryset = TestResultFilter(data, queryset=TestResult.objects.all()).qs.order_by('-created_at')
+            plan = self.explain(queryset[:10])
+            with self.subTest(filters=params):
+                self.assertNotIn(f'Seq Scan on {table}', plan, plan)
+
+    def test_search_uses_vector_index(self):
+        """Test that full-text search is served by the search vector index"""
+        queryset = TestResult.objects.filter(search_vector=SearchQuery('device', config='english')).order_by()
+        plan = self.explain(queryset)
+        self.assertIn('result_search_idx', plan, plan)
+
+    def test_rollup_refresh_uses_updated_index(self):
+        """Test that the rollup refresh scan of recently changed results is served by an index"""
+        queryset = TestResult.objects.order_by().filter(updated_at__gt='2024-03-20')
+        plan = self.explain(queryset.values('start_time', 'device_id', 'protocol_id'))
+        self.assertIn('result_updated_idx', plan, plan)
+
+    def test_data_containment_uses_gin_index(self):
+        """Test that data equality filters are served by the jsonb_path_ops index"""
+        queryset = TestResultFilter({'data__voltage': '3.3'}, queryset=TestResult.objects.order_by()).qs
+        plan = self.explain(queryset)
+        self.assertIn('result_data_idx', plan, plan)
+
+    def test_data_comparisons_use_protocol_indexes(self):
+        """Test that per-protocol expression indexes serve data comparisons"""
+        # Indexes cannot be built while the fixtures' deferred FK checks are pending
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        created, _ = sync_data_indexes(self.protocol.id, ['voltage'], concurrently=False)
+        self.assertEqual(created, [f'result_data_p{self.protocol.id}_voltage'])
+        for params in ({'data__voltage__gt': '3.2'}, {'data__has_key': 'voltage'}):
+            data = {'protocol': self.protocol.id, **params}
+            queryset = TestResultFilter(data, queryset=TestResult.objects.order_by()).qs
+            plan = self.explain(queryset)
+            with self.subTest(filters=params):
+                self.assertIn(created[0], plan, plan)
+
+        _, dropped = sync_data_indexes(self.protocol.id, [], concurrently=False)
+        self.assertEqual(dropped, created)
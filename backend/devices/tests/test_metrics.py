@@ -0,0 +1,111 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import include, path, reverse
+from prometheus_client import REGISTRY
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.authentication import local_tokens
+from users.models import CustomUser
+from devices.models import Device
+from devices.urls import async_urlpatterns, router
+
+
+def device_owners(request):
+    return JsonResponse({
+        device.name: device.assigned_to.username if device.assigned_to else None
+        for device in Device.objects.all()
+    })
+
+
+urlpatterns = [
+    path('device-owners/', device_owners, name='device-owners'),
+    path('api/devices/', include([*async_urlpatterns, path('', include(router.urls))])),
+]
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        local_tokens.clear()
+        self.user = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        for i in range(3):
+            Device.objects.create(
+                name=f'Device {i}',
+                device_type='DIAGNOSTIC',
+                model_number=f'MT-{i:03d}',
+                manufacturer='Test Corp',
+                description='Test device description',
+                assigned_to=self.user
+            )
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    @override_settings(METRICS_SERVER_TIMING=True, METRICS_PATH='/metrics')
+    def test_records_viewset_actions(self):
+        """Test that requests are recorded per viewset action and exported"""
+        labels = {'view': 'DeviceViewSet.list'}
+        requests = self.sample('http_request_duration_seconds_count', method='GET', status='200', **labels)
+        queries = self.sample('http_request_db_queries_sum', **labels)
+        serialized = self.sample('http_request_serializer_seconds_total', **labels)
+
+        with self.assertNumQueries(3) as context:
+            response = self.client.get('/api/devices/devicelist/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="3 queries", serialize;dur=[\d.]+, total;dur=')
+
+        self.assertEqual(self.sample('http_request_duration_seconds_count', method='GET', status='200', **labels),
+                         requests + 1)
+        self.assertEqual(self.sample('http_request_db_queries_sum', **labels), queries + len(context.captured_queries))
+        self.assertGreater(self.sample('http_request_serializer_seconds_total', **labels), serialized)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_request_duration_seconds_count{method="GET",status="200",view="DeviceViewSet.list"}',
+                      response.content.decode())
+
+    def test_export_is_off_by_default(self):
+        """Test that metrics are not exported unless METRICS_PATH is set"""
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @override_settings(METRICS_PATH='/metrics', METRICS_TOKEN='scrape-secret')
+    def test_export_requires_token(self):
+        """Test that scrapes must send METRICS_TOKEN as a bearer token when it is set"""
+        scraper = APIClient()
+        response = scraper.get('/metrics')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+        self.assertNotIn('http_request', response.content.decode())
+        response = scraper.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(ROOT_URLCONF=__name__, METRICS_DUPLICATE_QUERY_THRESHOLD=3)
+    def test_logs_duplicate_queries(self):
+        """Test that a statement repeated past the threshold is logged with its SQL"""
+        labels = {'view': 'device-owners'}
+        flagged = self.sample('http_request_duplicate_queries_total', **labels)
+        with self.assertLogs('config.metrics', 'WARNING') as logs:
+            self.client.get('/device-owners/')
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('GET device-owners ran the same query 3 times', logs.output[0])
+        self.assertIn('users_customuser', logs.output[0])
+        self.assertEqual(self.sample('http_request_duplicate_queries_total', **labels), flagged + 1)
+
+    @override_settings(ROOT_URLCONF=__name__, METRICS_SERVER_TIMING=True)
+    async def test_counts_queries_under_asgi(self):
+        """Test that queries of async views and of sync views run in a thread are counted under ASGI"""
+        client = AsyncClient(authorization=f'Token {self.token.key}')
+        for view, url in (('DeviceViewSet.list', reverse('devicelist-list')), ('device-owners', '/device-owners/')):
+            queries = await sync_to_async(self.sample)('http_request_db_queries_sum', view=view)
+            response = await client.get(url)
+            self.assertEqual(response.status_code, 200, view)
+            self.assertNotIn('desc="0 queries"', response['Server-Timing'], view)
+            self.assertGreater(await sync_to_async(self.sample)('http_request_db_queries_sum', view=view), queries, view)
@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from users.models import CustomUser
+from devices import tasks
+from devices.models import Device, TestProtocol, TestResult
+
+
+class ListBuffer:
+    """In-memory stand-in for the Redis list commands used by the buffer."""
+    def __init__(self):
+        self.items = []
+
+    def rpush(self, key, *values):
+        self.items.extend(str(value).encode() for value in values)
+        return len(self.items)
+
+    def lpop(self, key, count):
+        popped, self.items = self.items[:count], self.items[count:]
+        return popped or None
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    NOTIFICATION_BATCH_SIZE=10,
+)
+class NotificationPipelineTests(TestCase):
+    def setUp(self):
+        self.buffer = ListBuffer()
+        patcher = mock.patch('devices.notifications.get_redis', return_value=self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = CustomUser.objects.create_user(username='engineer', password='engineer123')
+        self.device = Device.objects.create(
+            name='Test Device',
+            device_type='DIAGNOSTIC',
+            model_number='TEST-001',
+            manufacturer='Test Corp',
+            description='Test device description'
+        )
+        self.protocol = TestProtocol.objects.create(
+            name='Test Protocol',
+            version='1.0',
+            description='Test protocol description',
+            created_by=self.user
+        )
+
+    def create_results(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                TestResult.objects.create(device=self.device, protocol=self.protocol, performed_by=self.user)
+
+    def test_notification_waits_for_commit(self):
+        """Test that ids are only buffered once the transaction commits"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            TestResult.objects.create(device=self.device, protocol=self.protocol, performed_by=self.user)
+            self.assertEqual(self.buffer.items, [])
+        self.assertEqual(len(callbacks), 1)
+
+    def test_results_are_sent_as_batched_digests(self):
+        """Test that N results lead to O(N / batch) tasks and one SMTP session"""
+        with mock.patch('devices.tasks.flush_test_result_notifications.delay') as delay:
+            self.create_results(25)
+        self.assertEqual(delay.call_count, 2)
+
+        with mock.patch('devices.tasks.get_connection', wraps=tasks.get_connection) as get_connection:
+            with self.assertNumQueries(3):
+                tasks.flush_test_result_notifications()
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].subject, '10 New Test Results Created')
+        self.assertEqual(mail.outbox[2].subject, '5 New Test Results Created')
+        self.assertEqual(self.buffer.items, [])
+
+    def test_flush_with_empty_buffer(self):
+        """Test that flushing an empty buffer sends nothing"""
+        self.assertEqual(tasks.flush_test_result_notifications(), 'No pending test result notifications')
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(NOTIFICATION_MAX_CHUNKS=2)
+    def test_flush_is_capped_per_run(self):
+        """Test that a run sends at most NOTIFICATION_MAX_CHUNKS digests and leaves the rest buffered"""
+        with mock.patch('devices.tasks.flush_test_result_notifications.delay'):
+            self.create_results(25)
+        tasks.flush_test_result_notifications()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(len(self.buffer.items), 5)
+
+    def test_failed_send_only_requeues_its_chunk(self):
+        """Test that a failed digest puts back its own ids and not those already sent"""
+        with mock.patch('devices.tasks.flush_test_result_notifications.delay'):
+            self.create_results(25)
+        ids = [int(item) for item in self.buffer.items]
+        connection = mock.Mock()
+        connection.send_messages.side_effect = [1, OSError('connection refused')]
+        with mock.patch('devices.tasks.get_connection', return_value=connection):
+            result = tasks.flush_test_result_notifications()
+        self.assertIn('after 1 digests', result)
+        self.assertEqual(connection.send_messages.call_count, 2)
+        connection.close.assert_called_once()
+        self.assertCountEqual([int(item) for item in self.buffer.items], ids[10:])
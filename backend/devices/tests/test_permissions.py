@@ -0,0 +1,158 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.authentication import local_tokens
+from users.models import CustomUser, Role
+from devices.cache import get_assigned_device_ids
+from devices.models import Device, TestProtocol, TestResult
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DeviceAccessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+        self.admin_user = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123'
+        )
+        engineer_role = Role.objects.create(name='ENGINEER')
+        self.engineer = CustomUser.objects.create_user(
+            username='engineer',
+            email='engineer@test.com',
+            password='engineer123',
+            role=engineer_role
+        )
+        self.other_engineer = CustomUser.objects.create_user(
+            username='other',
+            email='other@test.com',
+            password='other123',
+            role=engineer_role
+        )
+        self.device = Device.objects.create(
+            name='Assigned Device',
+            device_type='DIAGNOSTIC',
+            model_number='ACC-001',
+            manufacturer='Test Corp',
+            description='Test device description',
+            assigned_to=self.engineer
+        )
+        self.other_device = Device.objects.create(
+            name='Other Device',
+            device_type='DIAGNOSTIC',
+            model_number='ACC-002',
+            manufacturer='Test Corp',
+            description='Test device description',
+            assigned_to=self.other_engineer
+        )
+        self.protocol = TestProtocol.objects.create(
+            name='Test Protocol',
+            version='1.0',
+            description='Test protocol description',
+            created_by=self.admin_user
+        )
+        self.protocol.devices.add(self.device)
+        self.result = TestResult.objects.create(device=self.device, protocol=self.protocol, performed_by=self.engineer)
+        self.other_result = TestResult.objects.create(
+            device=self.other_device, protocol=self.protocol, performed_by=self.other_engineer
+        )
+
+        self.client = APIClient()
+        token = Token.objects.create(user=self.engineer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_permission_checks_need_no_queries(self):
+        """Test that a warm request only queries the token and the object"""
+        url = reverse('results-detail', args=[self.result.id])
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            # The result and its series; the token comes from the cache
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_engineer_limited_to_assigned_devices(self):
+        """Test that engineers reach results and protocols of their devices only"""
+        self.assertEqual(self.client.get(reverse('results-detail', args=[self.result.id])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('results-detail', args=[self.other_result.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('protocols-detail', args=[self.protocol.id])).status_code, 200)
+        self.protocol.devices.set([self.other_device])
+        self.assertEqual(self.client.get(reverse('protocols-detail', args=[self.protocol.id])).status_code, 404)
+
+    def test_lists_scoped_in_sql(self):
+        """Test that result and protocol lists only contain the engineer's rows"""
+        response = self.client.get(reverse('results-list'))
+        self.assertEqual([row['id'] for row in response.data['results']], [self.result.id])
+
+        second = Device.objects.create(
+            name='Second Device',
+            device_type='DIAGNOSTIC',
+            model_number='ACC-003',
+            manufacturer='Test Corp',
+            description='Test device description',
+            assigned_to=self.engineer
+        )
+        self.protocol.devices.add(second, self.other_device)
+        TestProtocol.objects.create(
+            name='Unrelated Protocol',
+            version='1.0',
+            description='Test protocol description',
+            created_by=self.admin_user
+        ).devices.add(self.other_device)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('protocols-list'))
+        self.assertEqual([row['id'] for row in response.data['results']], [self.protocol.id])
+        select = next(query['sql'] for query in queries.captured_queries if 'EXISTS' in query['sql'])
+        self.assertNotIn('DISTINCT', select)
+
+    def test_assignment_invalidates_cached_device_ids(self):
+        """Test that reassigning a device refreshes both engineers' device ids"""
+        self.assertEqual(get_assigned_device_ids(self.engineer.pk), {self.device.pk})
+        self.assertEqual(get_assigned_device_ids(self.other_engineer.pk), {self.other_device.pk})
+
+        admin = APIClient()
+        admin.force_authenticate(user=self.admin_user)
+        response = admin.post(reverse('devicelist-assign', args=[self.other_device.id]), {'user_id': self.engineer.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(get_assigned_device_ids(self.engineer.pk), {self.device.pk, self.other_device.pk})
+        self.assertEqual(get_assigned_device_ids(self.other_engineer.pk), set())
+        self.assertEqual(self.client.get(reverse('results-detail', args=[self.other_result.id])).status_code, 200)
+
+    def test_token_cache_invalidation(self):
+        """Test that cached tokens follow deactivation, role changes and deletion"""
+        url = reverse('results-detail', args=[self.result.id])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.engineer.role = Role.objects.create(name='MANAGER')
+        self.engineer.save()
+        self.assertEqual(self.client.get(reverse('results-detail', args=[self.other_result.id])).status_code, 200)
+
+        # Deleting the role clears it from users without a user save
+        self.engineer.role.delete()
+        self.engineer.refresh_from_db()
+        self.assertEqual(self.client.get(reverse('results-detail', args=[self.other_result.id])).status_code, 404)
+
+        self.engineer.is_active = False
+        self.engineer.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.engineer.is_active = True
+        self.engineer.role = Role.objects.get(name='ENGINEER')
+        self.engineer.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        Token.objects.filter(user=self.engineer).delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_last_login_save_keeps_cached_tokens(self):
+        """Test that saving only columns outside the token snapshot skips invalidation"""
+        self.engineer.last_login = self.engineer.date_joined
+        with self.assertNumQueries(1):
+            self.engineer.save(update_fields=['last_login'])
+
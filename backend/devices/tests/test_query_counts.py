@@ -0,0 +1,168 @@
+import gzip
+import os
+import tempfile
+from datetime import timedelta
+
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from users.models import CustomUser, Role
+from users.urls import router as users_router
+from users.views import UserViewSet
+from devices.models import Device, ExportJob, TestProtocol, TestResult
+from devices.tests.query_counts import QueryCountMixin
+from devices.urls import router as devices_router
+
+
+def device_payload(fixture):
+    return {
+        'name': 'Query Count Monitor',
+        'device_type': 'MONITORING',
+        'model_number': 'QC-NEW',
+        'manufacturer': 'Test Corp',
+        'description': 'Created by the query count test',
+        'assigned_to': fixture['engineer'].pk,
+    }
+
+
+def protocol_payload(fixture):
+    return {
+        'name': 'Query Count Protocol',
+        'version': '9.0',
+        'description': 'Created by the query count test',
+        'status': 'DRAFT',
+        'devices': [device.pk for device in fixture['devices']],
+    }
+
+
+def result_payload(fixture):
+    return {
+        'device': fixture['device'].pk,
+        'protocol': fixture['protocol'].pk,
+        'status': 'PASS',
+        'start_time': timezone.now().isoformat(),
+        'notes': 'Created by the query count test',
+        'data': {'voltage': 3.3, 'error_count': 0},
+    }
+
+
+class ApiQueryCountTests(QueryCountMixin, TestCase):
+    routers = (devices_router, users_router)
+    action_requests = {
+        'devicelist.list': lambda f: {},
+        'devicelist.create': lambda f: {'data': device_payload(f)},
+        'devicelist.retrieve': lambda f: {'pk': f['device'].pk},
+        'devicelist.update': lambda f: {'pk': f['device'].pk, 'data': device_payload(f)},
+        'devicelist.partial_update': lambda f: {'pk': f['device'].pk, 'data': {'description': 'Updated'}},
+        'devicelist.destroy': lambda f: {'pk': f['device'].pk},
+        'devicelist.assign': lambda f: {'pk': f['device'].pk, 'data': {'user_id': f['engineer'].pk}},
+        'protocols.list': lambda f: {},
+        'protocols.create': lambda f: {'data': protocol_payload(f)},
+        'protocols.retrieve': lambda f: {'pk': f['protocol'].pk},
+        'protocols.update': lambda f: {'pk': f['protocol'].pk, 'data': protocol_payload(f)},
+        'protocols.partial_update': lambda f: {'pk': f['protocol'].pk, 'data': {'description': 'Updated'}},
+        'protocols.destroy': lambda f: {'pk': f['protocol'].pk},
+        'results.list': lambda f: {},
+        'results.create': lambda f: {'data': result_payload(f)},
+        'results.retrieve': lambda f: {'pk': f['result'].pk},
+        'results.update': lambda f: {'pk': f['result'].pk, 'data': result_payload(f)},
+        'results.partial_update': lambda f: {'pk': f['result'].pk, 'data': {'notes': 'Updated'}},
+        'results.destroy': lambda f: {'pk': f['result'].pk},
+        'results.complete': lambda f: {'pk': f['in_progress'].pk, 'data': {'status': 'PASS'}},
+        'results.series': lambda f: {'pk': f['result'].pk},
+        'results.bulk': lambda f: {'data': [
+            {**result_payload(f), 'device': device.pk} for device in f['devices']
+        ]},
+        'results.export': lambda f: {'query': {'export_format': 'ndjson'}},
+        'results.stats': lambda f: {'query': {'group_by': 'device,day'}},
+        'exports.list': lambda f: {},
+        'exports.create': lambda f: {'data': {'resource': 'results', 'export_format': 'csv', 'filters': {}}},
+        'exports.retrieve': lambda f: {'pk': f['export'].pk},
+        'exports.download': lambda f: {'pk': f['export'].pk},
+        'user.list': lambda f: {},
+        'user.destroy': lambda f: {'pk': f['other_engineer'].pk},
+    }
+    exempt = {
+        # UserViewSet refers to user serializers that do not exist yet
+        'user.create': 'users.serializers is missing',
+        'user.retrieve': 'UserSerializer is undefined in users.views',
+        'user.update': 'UserSerializer is undefined in users.views',
+        'user.partial_update': 'UserSerializer is undefined in users.views',
+    }
+
+    def setUp(self):
+        handle, self.export_path = tempfile.mkstemp(suffix='.csv.gz')
+        os.close(handle)
+        self.addCleanup(os.remove, self.export_path)
+        with gzip.open(self.export_path, 'wb') as f:
+            f.write(b'id,status\n')
+
+    def build_dataset(self, size):
+        """
+        ``size`` of every kind of row, all reachable by the engineer: devices,
+        protocols covering every device, a result per device and protocol,
+        engineers and export jobs.
+        """
+        manager_role = Role.objects.create(name='MANAGER')
+        engineer_role = Role.objects.create(name='ENGINEER')
+        manager = CustomUser.objects.create_user(
+            username='qc-manager', password='manager123', role=manager_role, is_staff=True
+        )
+        engineers = CustomUser.objects.bulk_create([
+            CustomUser(username=f'qc-engineer-{i}', first_name='Query', last_name=f'Count {i}', role=engineer_role)
+            for i in range(size)
+        ])
+        engineer = engineers[0]
+        devices = Device.objects.bulk_create([
+            Device(name=f'QC Device {i}', device_type='DIAGNOSTIC', model_number=f'QC-{i:04d}',
+                   manufacturer='Test Corp', assigned_to=engineer)
+            for i in range(size)
+        ])
+        protocols = TestProtocol.objects.bulk_create([
+            TestProtocol(name=f'QC Protocol {i}', version='1.0', created_by=manager) for i in range(size)
+        ])
+        for protocol in protocols:
+            protocol.devices.set(devices)
+
+        start = timezone.now() - timedelta(days=1)
+        results = TestResult.objects.bulk_create([
+            TestResult(device=device, protocol=protocol, performed_by=engineers[i % size],
+                       status='IN_PROGRESS' if i == 0 else 'PASS', start_time=start + timedelta(minutes=i),
+                       end_time=None if i == 0 else start + timedelta(minutes=i + 1),
+                       data={'voltage': 3.3, 'error_count': 0})
+            for i, (device, protocol) in enumerate((d, p) for d in devices for p in protocols)
+        ])
+        exports = ExportJob.objects.bulk_create([
+            ExportJob(created_by=manager, status='COMPLETED', file_path=self.export_path, rows_written=i)
+            for i in range(size)
+        ])
+
+        # Users as the authentication classes load them
+        users = CustomUser.objects.select_related('role')
+        return {
+            'users': [users.get(pk=manager.pk), users.get(pk=engineer.pk)],
+            'engineer': engineer,
+            'other_engineer': engineers[-1],
+            'devices': devices,
+            'device': devices[0],
+            'protocol': protocols[0],
+            'result': results[-1],
+            'in_progress': results[0],
+            'export': exports[0],
+        }
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        """Test that no API action runs more queries on a larger data set"""
+        self.assertConstantQueries()
+
+    def test_reports_repeated_queries(self):
+        """Test that an action whose queries grow fails with the repeated SQL"""
+        self.routers = (users_router,)
+        with mock.patch.object(UserViewSet, 'queryset', CustomUser.objects.all()):
+            with self.assertRaises(AssertionError) as raised:
+                self.assertConstantQueries()
+        message = str(raised.exception)
+        self.assertIn('GET user.list as user 0 ran', message)
+        self.assertIn('FROM "users_role"', message)
+        self.assertNotIn('user.destroy', message)
@@ -0,0 +1,177 @@
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from users.models import CustomUser
+from devices.models import Device, TestProtocol, TestResult, TestResultDailyRollup
+from devices import tasks
+from devices.rollups import aggregate_rollups, recompute_buckets, refresh_rollups, replace_rollups, set_watermark
+
+
+class TestResultRollupTests(TestCase):
+    def setUp(self):
+        # As left by a backfill that ran before these results were written
+        set_watermark(timezone.now())
+        self.admin_user = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123'
+        )
+        self.device = Device.objects.create(
+            name='Test Device',
+            device_type='DIAGNOSTIC',
+            model_number='TEST-001',
+            manufacturer='Test Corp',
+            description='Test device description'
+        )
+        self.protocol = TestProtocol.objects.create(
+            name='Test Protocol',
+            version='1.0',
+            description='Test protocol description',
+            created_by=self.admin_user
+        )
+        self.results = [
+            TestResult.objects.create(
+                device=self.device,
+                protocol=self.protocol,
+                performed_by=self.admin_user,
+                status=status_value,
+                start_time=start_time,
+                end_time=end_time
+            )
+            for status_value, start_time, end_time in (
+                ('PASS', '2024-03-20T10:00:00Z', '2024-03-20T10:10:00Z'),
+                ('FAIL', '2024-03-20T12:00:00Z', '2024-03-20T12:30:00Z'),
+                ('PASS', '2024-03-21T09:00:00Z', '2024-03-21T09:20:00Z'),
+                ('IN_PROGRESS', '2024-03-21T11:00:00Z', None),
+            )
+        ]
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def stats(self, **params):
+        response = self.client.get(reverse('results-stats'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_refresh_matches_result_statistics(self):
+        """Test that rollup statistics agree with statistics over raw results"""
+        refresh_rollups()
+        self.assertEqual(TestResultDailyRollup.objects.count(), 4)
+
+        from_results = self.stats(group_by='day')
+        from_rollups = self.stats(group_by='day', source='rollups')
+        for raw, rolled in zip(from_results, from_rollups):
+            self.assertEqual(raw['day'].date(), rolled['day'])
+            for key in ('total', 'passed', 'failed', 'in_progress', 'pass_rate', 'mean_duration'):
+                self.assertEqual(raw[key], rolled[key], key)
+
+    def test_refresh_only_reads_changed_rows(self):
+        """Test that a refresh with nothing new recomputes no buckets"""
+        refresh_rollups()
+        with self.settings(ROLLUP_WATERMARK_OVERLAP=0):
+            self.assertEqual(refresh_rollups(), 0)
+
+    def test_refresh_without_watermark_does_not_scan(self):
+        """Test that a refresh refuses to scan every result before a backfill sets the watermark"""
+        set_watermark(None)
+        with self.assertNumQueries(1):
+            self.assertIsNone(refresh_rollups())
+        self.assertIn('backfill_rollups', tasks.refresh_result_rollups())
+        self.assertFalse(TestResultDailyRollup.objects.exists())
+
+    def test_complete_recomputes_bucket(self):
+        """Test that completing a result rebuilds its rollup bucket"""
+        refresh_rollups()
+        result = self.results[3]
+        with mock.patch('devices.tasks.recompute_result_rollups.delay', side_effect=recompute_buckets):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse('results-complete', args=[result.id]),
+                    {'status': 'PASS', 'end_time': '2024-03-21T11:30:00Z'},
+                    format='json'
+                )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [row] = self.stats(source='rollups', started_after='2024-03-21')
+        self.assertEqual((row['passed'], row['in_progress']), (2, 0))
+
+    def test_moved_result_recomputes_previous_bucket(self):
+        """Test that moving a result to another day rebuilds the day it left"""
+        refresh_rollups()
+        result = self.results[1]
+        result.start_time = '2024-03-22T12:00:00Z'
+        with mock.patch('devices.tasks.recompute_result_rollups.delay', side_effect=recompute_buckets) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                result.save()
+            delay.assert_called_once_with([('2024-03-20', self.device.id, self.protocol.id)])
+            result.notes = 'Rechecked'
+            with self.captureOnCommitCallbacks(execute=True):
+                result.save()
+            delay.assert_called_once()
+        refresh_rollups()
+
+        from_results = self.stats(group_by='day')
+        from_rollups = self.stats(group_by='day', source='rollups')
+        self.assertEqual([row['day'].date() for row in from_results], [row['day'] for row in from_rollups])
+        self.assertEqual([row['total'] for row in from_results], [row['total'] for row in from_rollups])
+
+    def test_device_delete_drops_rollups_without_tasks(self):
+        """Test that deleting a device removes its rollups without a recompute per result"""
+        refresh_rollups()
+        with mock.patch('devices.tasks.recompute_result_rollups.delay', side_effect=recompute_buckets) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.device.delete()
+        delay.assert_not_called()
+        self.assertFalse(TestResultDailyRollup.objects.exists())
+
+    def test_engineer_delete_sends_one_task(self):
+        """Test that deleting an engineer rebuilds all buckets of their results in one task"""
+        engineer = CustomUser.objects.create_user(username='engineer', password='engineer123')
+        TestResult.objects.filter(pk__in=[self.results[0].pk, self.results[2].pk]).update(performed_by=engineer)
+        refresh_rollups()
+        with mock.patch('devices.tasks.recompute_result_rollups.delay', side_effect=recompute_buckets) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                engineer.delete()
+        delay.assert_called_once_with([
+            ('2024-03-20', self.device.id, self.protocol.id),
+            ('2024-03-21', self.device.id, self.protocol.id),
+        ])
+        self.assertEqual(
+            set(TestResultDailyRollup.objects.values_list('day', 'status', 'result_count')),
+            {(date(2024, 3, 20), 'FAIL', 1), (date(2024, 3, 21), 'IN_PROGRESS', 1)},
+        )
+
+    def test_rebuild_over_concurrent_rows(self):
+        """Test that rows written by an overlapping rebuild are updated rather than duplicated"""
+        refresh_rollups()
+        ids = set(TestResultDailyRollup.objects.values_list('id', flat=True))
+        # Another run inserted these rows after this one looked for existing ones
+        replace_rollups(TestResultDailyRollup.objects.none(), aggregate_rollups(TestResult.objects.all()))
+        self.assertEqual(set(TestResultDailyRollup.objects.values_list('id', flat=True)), ids)
+
+    def test_rebuild_drops_vanished_statuses(self):
+        """Test that a status no longer present in a bucket loses its rollup row"""
+        refresh_rollups()
+        TestResult.objects.filter(pk=self.results[1].pk).update(status='PASS')
+        recompute_buckets([('2024-03-20', self.device.id, self.protocol.id)])
+        [row] = TestResultDailyRollup.objects.filter(day='2024-03-20')
+        self.assertEqual((row.status, row.result_count), ('PASS', 2))
+
+    def test_rollup_source_rejects_unsupported_filters(self):
+        """Test that filters the rollups cannot answer are rejected"""
+        response = self.client.get(reverse('results-stats'), {'source': 'rollups', 'notes': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_backfill_command(self):
+        """Test that the backfill command rebuilds rollups in chunks"""
+        out = StringIO()
+        call_command('backfill_rollups', '--chunk-days', '1', stdout=out)
+        self.assertEqual(TestResultDailyRollup.objects.count(), 4)
+        self.assertIn('2024-03-21 to 2024-03-21', out.getvalue())
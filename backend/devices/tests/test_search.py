@@ -0,0 +1,110 @@
+import unittest
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import CustomUser
+from devices import tasks
+from devices.models import Device, TestProtocol, TestResult
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Full-text search requires PostgreSQL')
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.admin_user = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123'
+        )
+        self.monitor = Device.objects.create(
+            name='Cardiac Monitor X1',
+            device_type='MONITORING',
+            model_number='CM-X1-001',
+            manufacturer='VitalBio Medical',
+            description='Real-time ECG analysis'
+        )
+        self.analyzer = Device.objects.create(
+            name='Blood Analyzer B3',
+            device_type='DIAGNOSTIC',
+            model_number='BA-B3-003',
+            manufacturer='VitalBio Diagnostics',
+            description='Portable system that can monitor cardiac markers'
+        )
+        self.protocol = TestProtocol.objects.create(
+            name='Safety Compliance Test',
+            version='2.1',
+            description='Comprehensive safety testing protocol',
+            created_by=self.admin_user
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def search(self, name, term):
+        response = self.client.get(reverse(name), {'search': term})
+        return [row['id'] for row in response.data['results']]
+
+    def test_search_ranks_weighted_fields(self):
+        """Test that name matches outrank description matches"""
+        self.assertEqual(self.search('devicelist-list', 'cardiac monitor'), [self.monitor.id, self.analyzer.id])
+
+    def test_model_number_substring(self):
+        """Test that partial model numbers fall back to substring matching"""
+        self.assertEqual(self.search('devicelist-list', 'B3-00'), [self.analyzer.id])
+
+    def test_result_search_follows_device_rename(self):
+        """Test that result vectors pick up device and protocol renames"""
+        result = TestResult.objects.create(
+            device=self.monitor,
+            protocol=self.protocol,
+            performed_by=self.admin_user,
+            notes='Leads reattached'
+        )
+        self.assertEqual(self.search('results-list', 'safety'), [result.id])
+        self.assertEqual(self.search('results-list', 'reattached'), [result.id])
+
+        self.monitor.name = 'Holter Recorder'
+        with mock.patch('devices.tasks.refresh_result_search_vectors.delay',
+                        side_effect=tasks.refresh_result_search_vectors):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.monitor.save()
+        self.assertEqual(self.search('results-list', 'holter'), [result.id])
+        self.assertEqual(self.search('results-list', 'cardiac'), [])
+
+    def test_save_writes_vector_in_same_query(self):
+        """Test that saving a row writes its search vector without a separate UPDATE"""
+        result = TestResult(
+            device=self.monitor,
+            protocol=self.protocol,
+            performed_by=self.admin_user,
+            notes='Leads reattached'
+        )
+        with self.assertNumQueries(1):
+            result.save()
+        self.assertEqual(self.search('results-list', 'reattached'), [result.id])
+
+        self.analyzer.description = 'Handheld glucose meter'
+        with self.assertNumQueries(2):
+            self.analyzer.save()
+        self.assertEqual(self.search('devicelist-list', 'glucose'), [self.analyzer.id])
+
+    def test_rename_fans_out_after_commit_in_chunks(self):
+        """Test that a rename rebuilds result vectors in a task, one UPDATE per chunk"""
+        for notes in ('First run', 'Second run', 'Third run'):
+            TestResult.objects.create(device=self.monitor, protocol=self.protocol,
+                                      performed_by=self.admin_user, notes=notes)
+        self.protocol.name = 'Electrical Isolation Test'
+        with mock.patch('devices.tasks.sync_protocol_data_indexes.delay'), \
+                mock.patch('devices.tasks.refresh_result_search_vectors.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.protocol.save()
+        delay.assert_called_once_with('protocol', self.protocol.id)
+        self.assertEqual(self.search('results-list', 'isolation'), [])
+
+        with self.settings(SEARCH_VECTOR_CHUNK_SIZE=2):
+            # Two chunks of one SELECT and one UPDATE each, and a final empty SELECT
+            with self.assertNumQueries(5):
+                tasks.refresh_result_search_vectors('protocol', self.protocol.id)
+        self.assertEqual(len(self.search('results-list', 'isolation')), 3)
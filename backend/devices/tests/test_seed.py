@@ -0,0 +1,66 @@
+import random
+from datetime import date, datetime, timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.test import TestCase
+from users.models import CustomUser
+from devices import synthetic
+from devices.models import Device, TestProtocol, TestResult, TestResultDailyRollup
+
+
+class ScaleSeedTests(TestCase):
+    def seed(self, **options):
+        call_command('seed', until=date(2024, 3, 20), stdout=StringIO(), **options)
+
+    def test_loads_linked_rows(self):
+        """Test that scale mode loads consistent devices, protocols and results"""
+        self.seed(devices=30, results=500, engineers=4, protocols=5, days=30, seed=7)
+        engineers = CustomUser.objects.filter(username__startswith=synthetic.ENGINEER_PREFIX)
+        self.assertEqual(engineers.count(), 4)
+        self.assertEqual(Device.objects.filter(model_number__startswith=synthetic.MODEL_NUMBER_PREFIX).count(), 30)
+        self.assertEqual(TestProtocol.objects.filter(name__startswith=synthetic.PROTOCOL_PREFIX).count(), 5)
+
+        results = TestResult.objects.all()
+        self.assertEqual(results.count(), 500)
+        # Every result runs a protocol linked to its device
+        self.assertEqual(results.filter(protocol__devices=F('device')).count(), 500)
+        self.assertFalse(results.filter(status='IN_PROGRESS', end_time__isnull=False).exists())
+        self.assertFalse(results.filter(status='FAIL', data__error_count=0).exists())
+        self.assertFalse(results.filter(search_vector__isnull=True).exists())
+        self.assertEqual(results.filter(data__has_key='test_duration').count(), 500)
+        self.assertEqual(
+            sum(TestResultDailyRollup.objects.values_list('result_count', flat=True)), 500
+        )
+
+        with self.assertRaises(CommandError):
+            self.seed(devices=1)
+
+    def test_generators_are_deterministic(self):
+        """Test that equal seeds generate equal rows and results are time ordered"""
+        until = datetime(2024, 3, 20, tzinfo=dt_timezone.utc)
+
+        def generate(seed):
+            rng = random.Random(seed)
+            devices = list(synthetic.generate_devices(rng, 20, [1, 2, 3], until.replace(year=2023), until))
+            links = list(synthetic.generate_protocol_devices(rng, [10, 11, 12], range(20)))
+            device_protocols = {}
+            for protocol_id, device_id in links:
+                device_protocols.setdefault(device_id, []).append(protocol_id)
+            data_keys = synthetic.protocol_data_keys(rng, [10, 11, 12])
+            device_rows = [(i, row[-1]) for i, row in enumerate(devices)]
+            results = list(synthetic.generate_results(
+                rng, 300, device_rows, device_protocols, data_keys, [1, 2, 3], until, 14
+            ))
+            return devices, links, results
+
+        first, second, other = generate(3), generate(3), generate(4)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        results = first[2]
+        self.assertEqual(len(results), 300)
+        start_times = [row[synthetic.RESULT_FIELDS.index('start_time')] for row in results]
+        self.assertEqual(start_times, sorted(start_times))
+        self.assertTrue(all(start_time < until for start_time in start_times))
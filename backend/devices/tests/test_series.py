@@ -0,0 +1,139 @@
+import numpy as np
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from users.models import CustomUser
+from devices.models import Device, TestProtocol, TestResult, TestResultSeries
+from devices.series import lttb, minmax
+
+
+@override_settings(SERIES_MIN_SAMPLES=10, SERIES_DEFAULT_POINTS=20, SERIES_MAX_POINTS=100)
+class TestResultSeriesTests(TestCase):
+    def setUp(self):
+        self.admin_user = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123'
+        )
+        self.device = Device.objects.create(
+            name='Test Device',
+            device_type='DIAGNOSTIC',
+            model_number='TEST-001',
+            manufacturer='Test Corp',
+            description='Test device description'
+        )
+        self.protocol = TestProtocol.objects.create(
+            name='Test Protocol',
+            version='1.0',
+            description='Test protocol description',
+            created_by=self.admin_user
+        )
+        self.samples = [float(i % 50) for i in range(500)]
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def create_result(self, data):
+        response = self.client.post(reverse('results-list'), {
+            'device': self.device.id,
+            'protocol': self.protocol.id,
+            'data': data,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data
+
+    def test_series_split_out_of_data(self):
+        """Test that long numeric arrays are stored as packed series"""
+        created = self.create_result({'voltage': 3.3, 'trace': self.samples, 'labels': ['a', 'b']})
+        self.assertEqual(created['data'], {'voltage': 3.3, 'labels': ['a', 'b']})
+        self.assertEqual([(s['name'], s['length']) for s in created['series']], [('trace', 500)])
+
+        stored = TestResultSeries.objects.get()
+        self.assertEqual(len(bytes(stored.values)), 500 * 8)
+        self.assertEqual(np.frombuffer(stored.values, dtype=stored.dtype).tolist(), self.samples)
+
+    def test_replacing_data_drops_old_series(self):
+        """Test that series missing from replaced data are no longer served"""
+        created = self.create_result({'trace': self.samples, 'current': self.samples})
+        url = reverse('results-detail', args=[created['id']])
+        response = self.client.patch(url, {'data': {'trace': self.samples[:100]}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(s['name'], s['length']) for s in response.data['series']], [('trace', 100)])
+
+        response = self.client.patch(url, {'data': {'voltage': 3.3}}, format='json')
+        self.assertEqual(response.data['series'], [])
+        self.assertFalse(TestResultSeries.objects.exists())
+
+        self.client.patch(url, {'data': {'trace': self.samples}}, format='json')
+        response = self.client.patch(url, {'notes': 'Rechecked'}, format='json')
+        self.assertEqual([s['name'] for s in response.data['series']], ['trace'])
+
+    def test_list_returns_series_metadata_only(self):
+        """Test that listing results does not load samples or query per row"""
+        for _ in range(3):
+            self.create_result({'trace': self.samples})
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('results-list'))
+        self.assertEqual(set(response.data['results'][0]['series'][0]), {'name', 'length', 'sha256', 'minimum', 'maximum'})
+
+    def test_series_endpoint(self):
+        """Test raw and downsampled windows of a series"""
+        times = [i * 0.5 for i in range(500)]
+        result = self.create_result({'trace': {'values': self.samples, 'times': times}})
+        url = reverse('results-series', args=[result['id']])
+
+        response = self.client.get(url, {'method': 'raw', 'start': 10, 'end': 20})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [series] = response.data['series']
+        self.assertEqual(series['times'], times[20:41])
+        self.assertEqual(series['values'], self.samples[20:41])
+
+        for method in ('lttb', 'minmax'):
+            response = self.client.get(url, {'method': method, 'points': 10})
+            [series] = response.data['series']
+            self.assertLessEqual(len(series['values']), 10)
+            self.assertEqual(max(series['values']), 49.0)
+
+        response = self.client.get(url, {'method': 'raw'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'name': 'missing'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_times_rejected(self):
+        """Test that series times must match the values"""
+        response = self.client.post(reverse('results-list'), {
+            'device': self.device.id,
+            'protocol': self.protocol.id,
+            'data': {'trace': {'values': self.samples, 'times': [1.0, 0.0] * 250}},
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_split_command_moves_inline_series(self):
+        """Test that existing inline series are moved by the management command"""
+        result = TestResult.objects.create(
+            device=self.device,
+            protocol=self.protocol,
+            performed_by=self.admin_user,
+            data={'trace': self.samples, 'voltage': 3.3}
+        )
+        call_command('split_result_series', stdout=StringIO())
+        result.refresh_from_db()
+        self.assertEqual(result.data, {'voltage': 3.3})
+        self.assertEqual(result.series.get().length, 500)
+
+    def test_downsampling_keeps_endpoints_and_extremes(self):
+        """Test that LTTB and min/max keep the shape of the signal"""
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50)
+        y[321] = 5.0
+        for downsample in (lttb, minmax):
+            sx, sy = downsample(x, y, 50)
+            self.assertLessEqual(len(sx), 50)
+            self.assertTrue(np.all(np.diff(sx) > 0))
+            self.assertIn(321.0, sx.tolist())
+        sx, _ = lttb(x, y, 50)
+        self.assertEqual((sx[0], sx[-1]), (0.0, 999.0))
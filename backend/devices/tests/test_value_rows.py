@@ -0,0 +1,121 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import CustomUser, Role
+from devices.models import Device, TestProtocol, TestResult
+from devices.serializers import DeviceSerializer, TestProtocolSerializer, TestResultSerializer
+from devices.value_rows import ValuePlan, compile_plan
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ValueListRowsTests(TestCase):
+    def setUp(self):
+        self.admin_user = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123',
+            first_name='Ada',
+            last_name='Admin'
+        )
+        self.engineer = CustomUser.objects.create_user(
+            username='engineer',
+            email='engineer@test.com',
+            password='engineer123',
+            first_name=' Eve ',
+            role=Role.objects.create(name='ENGINEER')
+        )
+        now = timezone.now()
+        self.devices = [
+            Device.objects.create(
+                name=f'Device {i}',
+                device_type='DIAGNOSTIC' if i % 2 else 'MONITORING',
+                model_number=f'VR-{i:03d}',
+                manufacturer='Test Corp',
+                description='' if i == 0 else 'Cardiac monitor',
+                assigned_to=self.engineer if i % 3 == 0 else None
+            )
+            for i in range(14)
+        ]
+        self.protocols = [
+            TestProtocol.objects.create(name=f'Protocol {i}', version='1.0', description='Test protocol',
+                                        created_by=self.admin_user, indexed_data_keys=['voltage'] if i else [])
+            for i in range(3)
+        ]
+        self.protocols[0].devices.set(self.devices[:5])
+        self.protocols[1].devices.set(self.devices[3:4])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+        created = self.client.post(reverse('results-list'), {
+            'device': self.devices[0].id,
+            'protocol': self.protocols[0].id,
+            'data': {'voltage': 3.3, 'trace': [float(i) for i in range(300)]},
+        }, format='json')
+        self.assertEqual(created.status_code, 201)
+        for i, device in enumerate(self.devices):
+            TestResult.objects.create(
+                device=device, protocol=self.protocols[i % 3], performed_by=self.engineer if i % 2 else self.admin_user,
+                status='IN_PROGRESS' if i == 0 else 'PASS', start_time=now - timedelta(hours=i),
+                end_time=None if i == 0 else now - timedelta(hours=i, minutes=-5), notes='Sensor drift' if i % 4 else '',
+                data={'voltage': 3.3 + i / 100, 'labels': ['a', i], 'nested': {'ok': i % 2 == 0}}
+            )
+
+    def get_both(self, user, url, params):
+        """
+        Return the ``(serializer, value rows)`` responses to the same request.
+        """
+        self.client.force_authenticate(user=user)
+        responses = []
+        for enabled in (False, True):
+            cache.clear()
+            with override_settings(VALUE_LIST_ROWS=enabled):
+                responses.append(self.client.get(url, params))
+        return responses
+
+    def test_lists_match_serializers(self):
+        """Test that value rows render byte for byte what the serializers render"""
+        cases = [
+            ('devicelist-list', {}),
+            ('devicelist-list', {'page_size': 5}),
+            ('devicelist-list', {'page': 2, 'page_size': 3}),
+            ('devicelist-list', {'ordering': 'name', 'device_type': 'MONITORING'}),
+            ('devicelist-list', {'fields': 'id,assigned_to_name,updated_at'}),
+            ('devicelist-list', {'omit': 'assigned_to_name'}),
+            ('devicelist-list', {'expand': 'assigned_to'}),
+            ('protocols-list', {}),
+            ('protocols-list', {'fields': 'name,devices'}),
+            ('results-list', {}),
+            ('results-list', {'page_size': 100}),
+            ('results-list', {'status': 'PASS', 'ordering': '-start_time'}),
+            ('results-list', {'omit': 'series,data'}),
+            ('results-list', {'expand': 'device,performed_by'}),
+        ]
+        for user in (self.admin_user, self.engineer):
+            for url_name, params in cases:
+                with self.subTest(url=url_name, params=params, user=user.username):
+                    slow, fast = self.get_both(user, reverse(url_name), params)
+                    self.assertEqual(slow.status_code, 200)
+                    self.assertEqual(fast.status_code, 200)
+                    self.assertEqual(fast.content, slow.content)
+
+    def test_cursor_pages_match(self):
+        """Test that cursors from value rows address the same pages"""
+        with mock.patch.object(ValuePlan, 'build', autospec=True, side_effect=ValuePlan.build) as build:
+            slow, fast = self.get_both(self.admin_user, reverse('results-list'), {'page_size': 4})
+        # Once for the page and once for the series of its rows
+        self.assertEqual([len(call.args[1]) for call in build.call_args_list], [4, 0])
+        self.assertEqual(fast.data['next'], slow.data['next'])
+        slow, fast = self.get_both(self.admin_user, fast.data['next'], {})
+        self.assertEqual(fast.content, slow.content)
+        self.assertIsNotNone(fast.data['previous'])
+
+    def test_plans_cover_list_serializers(self):
+        """Test that the list serializers compile and inlined relations fall back"""
+        for serializer_class in (DeviceSerializer, TestProtocolSerializer, TestResultSerializer):
+            self.assertIsNotNone(compile_plan(serializer_class()), serializer_class.__name__)
+        expanded = DeviceSerializer(context={'fieldset': (None, ['assigned_to'])})
+        self.assertIsNone(compile_plan(expanded))
@@ -1,5 +1,12 @@
-from django.test import TestCase
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 from users.models import CustomUser, Role
@@ -99,6 +106,44 @@ class TestProtocolViewSetTests(TestCase):
         self.assertEqual(TestProtocol.objects.count(), 1)
         self.assertEqual(TestProtocol.objects.get().name, 'New Protocol')
 
+    def test_indexed_data_keys_must_be_filterable(self):
+        """Test that protocols can only index whitelisted data keys"""
+        url = reverse('protocols-list')
+        data = {
+            'name': 'Indexed Protocol',
+            'version': '1.0',
+            'description': 'Test protocol',
+            'devices': [self.device.id],
+            'indexed_data_keys': ['voltage', 'serial']
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('indexed_data_keys', response.data)
+
+        data['indexed_data_keys'] = ['voltage']
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(TestProtocol.objects.get().indexed_data_keys, ['voltage'])
+
+    def test_protocol_devices_are_looked_up_together(self):
+        """Test that protocol devices looked up together keep the usual errors and order"""
+        other = Device.objects.create(name='Other Device', device_type='IMPLANT', model_number='TEST-002')
+        url = reverse('protocols-list')
+        data = {'name': 'Linked Protocol', 'version': '1.0', 'description': 'Test protocol',
+                'devices': [self.device.id, 0]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['devices'], ['Invalid pk "0" - object does not exist.'])
+
+        data['devices'] = [self.device.id, 'x']
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.data['devices'], ['Incorrect type. Expected pk value, received str.'])
+
+        data['devices'] = [str(other.id), self.device.id]
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['devices'], [other.id, self.device.id])
+
 class TestResultViewSetTests(TestCase):
     def setUp(self):
         # Create roles
@@ -177,4 +222,403 @@ class TestResultViewSetTests(TestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         result.refresh_from_db()
-        self.assertEqual(result.status, 'PASS') 
\ No newline at end of file
+        self.assertEqual(result.status, 'PASS')
+
+    def test_filter_results_by_day(self):
+        """Test that date filters match the whole calendar day"""
+        for start_time in ('2024-03-20T00:00:00Z', '2024-03-20T23:59:59Z', '2024-03-21T00:00:00Z'):
+            TestResult.objects.create(
+                device=self.device,
+                protocol=self.protocol,
+                performed_by=self.engineer,
+                start_time=start_time
+            )
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(reverse('results-list'), {'start_time': '2024-03-20'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_filter_results_by_data(self):
+        """Test JSON path filters on whitelisted data keys"""
+        readings = [
+            {'voltage': 3.1, 'calibrated': True, 'firmware_version': '1.2'},
+            {'voltage': 3.3, 'calibrated': False},
+            {'voltage': 3.5, 'serial': 'A1'},
+            {'current': 0.2},
+            # jsonb orders strings before and booleans after every number
+            {'voltage': 'high'},
+            {'voltage': True},
+        ]
+        for data in readings:
+            TestResult.objects.create(
+                device=self.device,
+                protocol=self.protocol,
+                performed_by=self.engineer,
+                data=data
+            )
+
+        self.client.force_authenticate(user=self.admin_user)
+        for params, expected in (
+            ({'data__voltage__gt': '3.2'}, 2),
+            ({'data__voltage__lte': '3.3'}, 2),
+            ({'data__voltage': '3.3'}, 1),
+            ({'data__calibrated': 'false'}, 1),
+            ({'data__firmware_version': '1.2'}, 1),
+            ({'data__has_key': 'voltage'}, 5),
+            ({'data__has_key': 'current', 'data__voltage__gt': '3'}, 0),
+            ({'data__serial': 'A1'}, 6),
+        ):
+            response = self.client.get(reverse('results-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], expected, params)
+
+        response = self.client.get(reverse('results-list'), {'data__has_key': 'serial'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_results(self):
+        """Test bulk ingestion inserts valid rows and reports invalid ones"""
+        self.client.force_authenticate(user=self.engineer)
+        # Ids given as strings are looked up as the fields parse them
+        rows = [
+            {'device': str(self.device.id), 'protocol': str(self.protocol.id), 'status': 'PASS',
+             'data': {'voltage': 3.3}}
+            for _ in range(5)
+        ]
+        rows.insert(2, {'device': 9999, 'protocol': self.protocol.id})
+        rows.insert(4, {'protocol': self.protocol.id, 'status': 'UNKNOWN'})
+
+        with mock.patch('devices.views.queue_test_result_notifications') as queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('results-bulk') + '?batch_size=2', rows, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 4])
+        self.assertIn('device', response.data['errors'][0]['errors'])
+        self.assertEqual(TestResult.objects.filter(performed_by=self.engineer).count(), 5)
+        self.assertEqual([len(call.args[0]) for call in queue.call_args_list], [2, 2, 1])
+
+    @override_settings(RESULTS_BULK_MAX_ROWS=2)
+    def test_bulk_create_results_row_limit(self):
+        """Test that bulk ingestion refuses more rows than RESULTS_BULK_MAX_ROWS"""
+        self.client.force_authenticate(user=self.engineer)
+        rows = [{'device': self.device.id, 'protocol': self.protocol.id, 'status': 'PASS'}] * 3
+        response = self.client.post(reverse('results-bulk'), rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(TestResult.objects.filter(performed_by=self.engineer).exists())
+
+    def test_bulk_create_results_ndjson(self):
+        """Test bulk ingestion accepts newline-delimited JSON"""
+        self.client.force_authenticate(user=self.engineer)
+        row = json.dumps({'device': self.device.id, 'protocol': self.protocol.id, 'status': 'FAIL'})
+        body = '\n'.join([row, '', row]) + '\n'
+        response = self.client.post(reverse('results-bulk'), body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(TestResult.objects.filter(status='FAIL').count(), 2)
+
+    def test_result_stats(self):
+        """Test aggregated result statistics grouped by device"""
+        for status_value, minutes in (('PASS', 10), ('PASS', 20), ('FAIL', 30), ('IN_PROGRESS', None)):
+            TestResult.objects.create(
+                device=self.device,
+                protocol=self.protocol,
+                performed_by=self.engineer,
+                status=status_value,
+                start_time='2024-03-20T10:00:00Z',
+                end_time=f'2024-03-20T10:{minutes}:00Z' if minutes else None
+            )
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(reverse('results-stats'), {'group_by': 'device,day'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [row] = response.data['results']
+        self.assertEqual(row['device'], self.device.id)
+        self.assertEqual(row['device_name'], 'Test Device')
+        self.assertEqual((row['total'], row['passed'], row['failed'], row['in_progress']), (4, 2, 1, 1))
+        self.assertAlmostEqual(row['pass_rate'], 0.6667)
+        self.assertEqual(row['mean_duration'], 1200.0)
+
+        response = self.client.get(reverse('results-stats'), {'status': 'PASS'})
+        self.assertEqual(response.data['results'][0]['total'], 2)
+
+        response = self.client.get(reverse('results-stats'), {'group_by': 'colour'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_results(self):
+        """Test streaming exports in CSV and NDJSON"""
+        for status_value in ('PASS', 'FAIL'):
+            TestResult.objects.create(
+                device=self.device,
+                protocol=self.protocol,
+                performed_by=self.engineer,
+                status=status_value,
+                data={'voltage': 3.3}
+            )
+        self.client.force_authenticate(user=self.admin_user)
+
+        response = self.client.get(reverse('results-export'), {'status': 'PASS'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('id,device,device_name,'))
+        self.assertIn('Test Device', lines[1])
+
+        response = self.client.get(reverse('results-export'), {'export_format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual({row['status'] for row in rows}, {'PASS', 'FAIL'})
+        self.assertEqual(rows[0]['data'], {'voltage': 3.3})
+        self.assertEqual(rows[0]['protocol_name'], 'Test Protocol')
+
+class TestResultQueryCountTests(TestCase):
+    def setUp(self):
+        self.admin_user = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123',
+            first_name='Admin',
+            last_name='User'
+        )
+        self.protocol = TestProtocol.objects.create(
+            name='Test Protocol',
+            version='1.0',
+            status='APPROVED',
+            description='Test protocol description',
+            created_by=self.admin_user
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def create_results(self, count):
+        for i in range(count):
+            device = Device.objects.create(
+                name=f'Device {i}',
+                device_type='DIAGNOSTIC',
+                model_number=f'QC-{TestResult.objects.count()}-{i}',
+                manufacturer='Test Corp',
+                description='Test device description',
+                assigned_to=self.admin_user
+            )
+            self.protocol.devices.add(device)
+            TestResult.objects.create(
+                device=device,
+                protocol=self.protocol,
+                performed_by=self.admin_user,
+                status='PASS'
+            )
+
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_list_query_count_is_constant(self):
+        """Test that list endpoints do not issue a query per row"""
+        for name in ('results-list', 'devicelist-list', 'protocols-list'):
+            url = reverse(name)
+            self.create_results(1)
+            small = self.count_list_queries(url)
+            self.create_results(8)
+            large = self.count_list_queries(url)
+            self.assertEqual(small, large, name)
+
+    def test_list_response_includes_related_names(self):
+        """Test that planned querysets still render related display names"""
+        self.create_results(1)
+        response = self.client.get(reverse('results-list'))
+        row = response.data['results'][0]
+        self.assertEqual(row['device_name'], 'Device 0')
+        self.assertEqual(row['protocol_name'], 'Test Protocol')
+        self.assertEqual(row['performed_by_name'], 'Admin User')
+
+    def test_sparse_fieldset_trims_columns(self):
+        """Test that fields and omit trim both the response and the SELECT"""
+        self.create_results(2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('results-list'), {'fields': 'id,status,device_name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status', 'device_name'})
+        select = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"data"', select)
+        self.assertNotIn('"notes"', select)
+        self.assertNotIn('devices_testprotocol', select)
+
+        response = self.client.get(reverse('devicelist-list'), {'omit': 'description,assigned_to_name'})
+        self.assertNotIn('description', response.data['results'][0])
+        self.assertIn('model_number', response.data['results'][0])
+
+    def test_expand_inlines_related_objects(self):
+        """Test that expanded relations are loaded in the same query"""
+        self.create_results(3)
+        url = reverse('results-list')
+        plain = self.count_list_queries(url)
+        expanded = self.count_list_queries(url + '?expand=device,protocol,performed_by')
+        self.assertEqual(plain, expanded)
+
+        response = self.client.get(url, {'expand': 'device,performed_by', 'fields': 'id,device,performed_by'})
+        row = response.data['results'][0]
+        self.assertEqual(row['device']['name'], 'Device 2')
+        self.assertEqual(row['performed_by']['username'], 'admin')
+        self.assertNotIn('assigned_to_name', row['device'])
+
+    def test_unknown_fields_rejected(self):
+        """Test that unknown sparse fieldset names are reported"""
+        response = self.client.get(reverse('results-list'), {'fields': 'id,colour', 'expand': 'notes'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'fields', 'expand'})
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.admin_user = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123'
+        )
+        for i in range(7):
+            Device.objects.create(
+                name=f'Device {i}',
+                device_type='DIAGNOSTIC',
+                model_number=f'KP-{i:03d}',
+                manufacturer='Test Corp',
+                description='Test device description'
+            )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_walk_pages_with_cursor(self):
+        """Test that following next links returns every row once, newest first"""
+        url = reverse('devicelist-list') + '?page_size=3'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], 7)
+            seen.extend(row['model_number'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [f'KP-{i:03d}' for i in reversed(range(7))])
+
+    def test_previous_link_returns_prior_page(self):
+        """Test that the previous cursor walks back to the same rows"""
+        first = self.client.get(reverse('devicelist-list') + '?page_size=3')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in back.data['results']],
+            [row['id'] for row in first.data['results']]
+        )
+        self.assertIsNone(back.data['previous'])
+
+    def test_skip_count(self):
+        """Test that count=false omits the total count"""
+        response = self.client.get(reverse('devicelist-list') + '?count=false')
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get(reverse('devicelist-list') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_fallback(self):
+        """Test that page requests keep page number pagination"""
+        response = self.client.get(reverse('devicelist-list') + '?page=2&page_size=5')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CachedListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.engineer_role = Role.objects.create(name='ENGINEER')
+        self.admin_user = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin123'
+        )
+        self.engineer = CustomUser.objects.create_user(
+            username='engineer',
+            email='engineer@test.com',
+            password='engineer123',
+            role=self.engineer_role
+        )
+        self.device = Device.objects.create(
+            name='Test Device',
+            device_type='DIAGNOSTIC',
+            model_number='TEST-001',
+            manufacturer='Test Corp',
+            description='Test device description'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_cached_list_is_served_without_queries(self):
+        """Test that a repeated list request is answered from the cache"""
+        url = reverse('devicelist-list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Last-Modified', second)
+
+    def test_conditional_request_returns_not_modified(self):
+        """Test that a matching If-None-Match yields 304"""
+        url = reverse('devicelist-list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_save_invalidates_cached_list(self):
+        """Test that saving a device retires cached device lists"""
+        url = reverse('devicelist-list')
+        etag = self.client.get(url)['ETag']
+        self.device.name = 'Renamed Device'
+        self.device.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['name'], 'Renamed Device')
+
+    def test_protocol_devices_change_invalidates_cached_list(self):
+        """Test that changing protocol devices retires cached protocol lists"""
+        protocol = TestProtocol.objects.create(
+            name='Test Protocol',
+            version='1.0',
+            description='Test protocol description',
+            created_by=self.admin_user
+        )
+        url = reverse('protocols-list')
+        self.assertEqual(self.client.get(url).data['results'][0]['devices'], [])
+        protocol.devices.add(self.device)
+        self.assertEqual(self.client.get(url).data['results'][0]['devices'], [self.device.id])
+
+    def test_user_rename_invalidates_cached_lists(self):
+        """Test that renaming a user retires cached lists showing their name"""
+        self.device.assigned_to = self.engineer
+        self.device.save()
+        TestProtocol.objects.create(name='Test Protocol', version='1.0', created_by=self.engineer)
+        device_url, protocol_url = reverse('devicelist-list'), reverse('protocols-list')
+        self.assertEqual(self.client.get(device_url).data['results'][0]['assigned_to_name'], '')
+        self.assertEqual(self.client.get(protocol_url).data['results'][0]['created_by_name'], '')
+
+        self.engineer.last_login = timezone.now()
+        with mock.patch('devices.signals.bump_generation') as bump:
+            self.engineer.save(update_fields=['last_login'])
+        bump.assert_not_called()
+
+        self.engineer.first_name, self.engineer.last_name = 'Erin', 'Engineer'
+        self.engineer.save()
+        self.assertEqual(self.client.get(device_url).data['results'][0]['assigned_to_name'], 'Erin Engineer')
+        self.assertEqual(self.client.get(protocol_url).data['results'][0]['created_by_name'], 'Erin Engineer')
+
+    def test_role_scopes_do_not_share_entries(self):
+        """Test that engineers do not receive a manager's cached list"""
+        url = reverse('devicelist-list')
+        self.assertEqual(len(self.client.get(url).data['results']), 1)
+        self.client.force_authenticate(user=self.engineer)
+        self.assertEqual(len(self.client.get(url).data['results']), 0)
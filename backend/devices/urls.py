@@ -1,12 +1,28 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
+from .async_views import AsyncReadView
 
 router = DefaultRouter()
 router.register('devicelist', views.DeviceViewSet, basename='devicelist')
 router.register('protocols', views.TestProtocolViewSet, basename='protocols')
 router.register('results', views.TestResultViewSet, basename='results')
+router.register('exports', views.ExportJobViewSet, basename='exports')
+
+# Async list and retrieve routes, matched ahead of the router when serving over ASGI
+async_urlpatterns = []
+for prefix, viewset in (
+    ('devicelist', views.DeviceViewSet),
+    ('protocols', views.TestProtocolViewSet),
+    ('results', views.TestResultViewSet),
+):
+    async_urlpatterns += [
+        path(f'{prefix}/', AsyncReadView.as_view(viewset_class=viewset, basename=prefix)),
+        path(f'{prefix}/<int:pk>/', AsyncReadView.as_view(viewset_class=viewset, basename=prefix, detail=True)),
+    ]
 
 urlpatterns = [
+    *(async_urlpatterns if settings.ASYNC_READ_VIEWS else []),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -0,0 +1,210 @@
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Case, CharField, F, Value, When
+from django.db.models.functions import Concat
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation returns database values unchanged
+IDENTITY_FIELDS = {
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+}
+
+
+def strip(value):
+    return value.strip()
+
+
+def full_name(relation):
+    """
+    The value expression of ``relation.get_full_name()``, or ``None`` when
+    there is no related row, for ``Meta.value_expressions``.
+    """
+    name = Concat(F(f'{relation}__first_name'), Value(' '), F(f'{relation}__last_name'), output_field=CharField())
+    return Case(When(**{f'{relation}__isnull': False}, then=name), default=None, output_field=CharField()), strip
+
+
+def iso_datetime(field):
+    """
+    A converter equivalent to ``DateTimeField.to_representation`` for aware
+    datetimes, or ``None`` where only the field itself will do.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return None
+
+    def convert(value):
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def field_converter(field):
+    """
+    Return the function turning a non-null database value into ``field``'s
+    representation, or ``None`` when the value is used as is.
+    """
+    field_type = type(field)
+    if field_type in IDENTITY_FIELDS:
+        return None
+    if field_type is serializers.PrimaryKeyRelatedField and field.pk_field is None:
+        # values_list() already returns the primary key
+        return None
+    if field_type is serializers.JSONField and not field.binary:
+        return None
+    if field_type is serializers.DateTimeField:
+        convert = iso_datetime(field)
+        if convert is not None:
+            return convert
+    return field.to_representation
+
+
+class ValuePlan:
+    """
+    Build a serializer's output straight from ``values_list()`` rows.
+
+    Each emitted field is compiled into a column and a converter: plain
+    columns and foreign keys are read as they are, method fields from the
+    expressions the serializer declares in ``Meta.value_expressions`` (an
+    expression, or ``(expression, converter)``), and many-valued relations
+    with one extra query each, as ``prefetch_related`` would. Use
+    ``compile_plan``, which returns ``None`` for serializers it cannot
+    reproduce exactly.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.columns = ['pk']
+        self.fields = []
+        self.related = []
+        self.created_at = None
+
+    def column(self, expression):
+        """
+        Return the row index of ``expression``, selecting it if needed.
+        """
+        if isinstance(expression, str) and expression in self.columns:
+            return self.columns.index(expression)
+        self.columns.append(expression)
+        return len(self.columns) - 1
+
+    def position(self, row):
+        """
+        ``(created_at, pk)`` of a row, for keyset pagination cursors.
+        """
+        return row[self.created_at], row[0]
+
+    def queryset(self, queryset):
+        # Related rows are loaded by related_querysets() instead
+        return queryset.prefetch_related(None).values_list(*self.columns)
+
+    def related_querysets(self, rows):
+        """
+        Return ``[(name, queryset, plan)]`` for the many-valued relations of
+        ``rows``, each yielding ``(parent pk, *columns)`` rows. ``plan`` is
+        ``None`` for relations emitted as a list of primary keys.
+        """
+        pks = [row[0] for row in rows]
+        querysets = []
+        for name, field, plan in self.related:
+            lookup = field.field.name if field.auto_created else field.related_query_name()
+            queryset = field.related_model._default_manager.filter(**{f'{lookup}__in': pks})
+            columns = plan.columns if plan is not None else ['pk']
+            querysets.append((name, queryset.values_list(lookup, *columns), plan))
+        return querysets
+
+    def build(self, rows, related):
+        """
+        Return the output of ``rows`` given ``{name: [(parent pk, *columns)]}``.
+        """
+        children = {}
+        for name, field, plan in self.related:
+            by_parent = children[name] = defaultdict(list)
+            if plan is None:
+                for parent, pk in related[name]:
+                    by_parent[parent].append(pk)
+            else:
+                parents = [row[0] for row in related[name]]
+                for parent, child in zip(parents, plan.build([row[1:] for row in related[name]], {})):
+                    by_parent[parent].append(child)
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, index, convert in self.fields:
+                if index is None:
+                    item[name] = children[name].get(row[0], [])
+                    continue
+                value = row[index]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+    def rows(self, rows):
+        rows = list(rows)
+        if not rows:
+            return []
+        related = {name: list(queryset) for name, queryset, plan in self.related_querysets(rows)}
+        return self.build(rows, related)
+
+    async def arows(self, rows):
+        rows = list(rows)
+        if not rows:
+            return []
+        related = {name: [row async for row in queryset] for name, queryset, plan in self.related_querysets(rows)}
+        return self.build(rows, related)
+
+
+def compile_plan(serializer):
+    """
+    Return a ``ValuePlan`` emitting what ``serializer`` emits for its model,
+    or ``None`` if a field cannot be built from database values, such as an
+    inlined relation or a method field without a declared expression.
+    """
+    model = serializer.Meta.model
+    expressions = getattr(serializer.Meta, 'value_expressions', {})
+    plan = ValuePlan(model)
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in expressions:
+            expression = expressions[name]
+            expression, convert = expression if isinstance(expression, tuple) else (expression, None)
+            plan.fields.append((name, plan.column(expression), convert))
+            continue
+        if isinstance(field, serializers.SerializerMethodField) or '.' in field.source or field.source == '*':
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+
+        if isinstance(field, (serializers.ManyRelatedField, serializers.ListSerializer)) \
+                and not (model_field.many_to_many or model_field.one_to_many):
+            return None
+        if isinstance(field, serializers.ManyRelatedField):
+            if type(field.child_relation) is not serializers.PrimaryKeyRelatedField \
+                    or field.child_relation.pk_field is not None:
+                return None
+            plan.related.append((name, model_field, None))
+            plan.fields.append((name, None, None))
+        elif isinstance(field, serializers.ListSerializer):
+            child = compile_plan(field.child)
+            if child is None or child.related:
+                return None
+            plan.related.append((name, model_field, child))
+            plan.fields.append((name, None, None))
+        elif isinstance(field, serializers.BaseSerializer) or not model_field.concrete or model_field.many_to_many:
+            return None
+        else:
+            plan.fields.append((name, plan.column(model_field.name), field_converter(field)))
+    if any(field.name == 'created_at' for field in model._meta.concrete_fields):
+        plan.created_at = plan.column('created_at')
+    return plan
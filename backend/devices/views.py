@@ -1,60 +1,30 @@
-from rest_framework import viewsets, permissions, filters
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework import viewsets, permissions, filters, mixins, status
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from django_filters.rest_framework import DjangoFilterBackend, FilterSet, CharFilter, ChoiceFilter, DateTimeFilter, NumberFilter
+from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from .models import Device, TestProtocol, TestResult
-from .serializers import DeviceSerializer, TestProtocolSerializer, TestResultSerializer
+from .models import Device, ExportJob, TestProtocol, TestResult, TestResultDailyRollup, TestResultSeries
+from .serializers import DeviceSerializer, TestProtocolSerializer, TestResultSerializer, TestResultBulkSerializer, ExportJobSerializer
+from .mixins import CachedListMixin, MetricsMixin, QueryPlanMixin, RoleScopedMixin, ValueListMixin, scope_to_user
+from .filters import DeviceFilter, TestProtocolFilter, TestResultDailyRollupFilter, TestResultFilter
+from .pagination import KeysetPagination
+from .parsers import NDJSONParser
+from .exports import EXPORT_FORMATS, RESULT_EXPORT_FIELDS, encode, export_rows
+from .notifications import queue_test_result_notifications
+from .rollups import bucket_of, queue_rollup_recompute
+from .search import FullTextSearchFilter, update_search_vectors
+from .series import SERIES_METHODS, series_window, split_series, store_series
+from .stats import GROUPINGS, ROLLUP_GROUPINGS, parse_group_by, result_statistics, rollup_statistics
+from .tasks import run_export
 from users.permissions import DeviceAccessPermission, IsAdminUser
 
-class DeviceFilter(FilterSet):
-    name = CharFilter(lookup_expr='icontains')
-    model_number = CharFilter(lookup_expr='icontains')
-    manufacturer = CharFilter(lookup_expr='icontains')
-    description = CharFilter(lookup_expr='icontains')
-    device_type = ChoiceFilter(choices=Device.DEVICE_TYPES)
-    created_at = DateTimeFilter(lookup_expr='date')
-    updated_at = DateTimeFilter(lookup_expr='date')
-    assigned_to = NumberFilter()
-
-    class Meta:
-        model = Device
-        fields = ['name', 'model_number', 'manufacturer', 'description', 'device_type', 
-                 'created_at', 'updated_at', 'assigned_to']
-
-class TestProtocolFilter(FilterSet):
-    name = CharFilter(lookup_expr='icontains')
-    version = CharFilter(lookup_expr='icontains')
-    description = CharFilter(lookup_expr='icontains')
-    status = ChoiceFilter(choices=TestProtocol.STATUS_CHOICES)
-    created_by = NumberFilter()
-    created_at = DateTimeFilter(lookup_expr='date')
-    updated_at = DateTimeFilter(lookup_expr='date')
-    devices = NumberFilter()
-
-    class Meta:
-        model = TestProtocol
-        fields = ['name', 'version', 'description', 'status', 'created_by', 
-                 'created_at', 'updated_at', 'devices']
-
-class TestResultFilter(FilterSet):
-    device = NumberFilter()
-    protocol = NumberFilter()
-    performed_by = NumberFilter()
-    status = ChoiceFilter(choices=TestResult.RESULT_STATUS)
-    start_time = DateTimeFilter(lookup_expr='date')
-    end_time = DateTimeFilter(lookup_expr='date')
-    notes = CharFilter(lookup_expr='icontains')
-    created_at = DateTimeFilter(lookup_expr='date')
-    updated_at = DateTimeFilter(lookup_expr='date')
-
-    class Meta:
-        model = TestResult
-        fields = ['device', 'protocol', 'performed_by', 'status', 'start_time', 
-                 'end_time', 'notes', 'created_at', 'updated_at']
-
-class DeviceViewSet(viewsets.ModelViewSet):
+class DeviceViewSet(MetricsMixin, CachedListMixin, ValueListMixin, RoleScopedMixin, QueryPlanMixin,
+                    viewsets.ModelViewSet):
     """
     API endpoint for managing medical devices.
     
@@ -65,27 +35,21 @@ class DeviceViewSet(viewsets.ModelViewSet):
     - Update devices
     - Delete devices
     - Assign devices to engineers
+
+    Engineers only see the devices assigned to them.
     """
     queryset = Device.objects.all()
     serializer_class = DeviceSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated, IsAdminUser | DeviceAccessPermission]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_class = DeviceFilter
     search_fields = ['name', 'model_number', 'manufacturer', 'description']
+    search_vector_field = 'search_vector'
+    search_trigram_fields = ['model_number']
     ordering_fields = ['name', 'model_number', 'manufacturer', 'device_type', 
                       'created_at', 'updated_at', 'assigned_to']
-
-    def get_queryset(self):
-        """
-        Filter devices based on user role:
-        - Admins and Managers see all devices
-        - Engineers see only their assigned devices
-        """
-        if self.request.user.is_staff or self.request.user.is_manager():
-            return Device.objects.all()
-        elif self.request.user.is_engineer():
-            return Device.objects.filter(assigned_to=self.request.user)
-        return Device.objects.none()
+    cache_dependencies = [Device]
 
     @swagger_auto_schema(
         operation_description="Assign a device to an engineer",
@@ -108,7 +72,8 @@ class DeviceViewSet(viewsets.ModelViewSet):
             return Response({'status': 'device assigned'})
         return Response({'status': 'user_id required'}, status=400)
 
-class TestProtocolViewSet(viewsets.ModelViewSet):
+class TestProtocolViewSet(MetricsMixin, CachedListMixin, ValueListMixin, RoleScopedMixin, QueryPlanMixin,
+                          viewsets.ModelViewSet):
     """
     API endpoint for managing test protocols.
     
@@ -118,19 +83,25 @@ class TestProtocolViewSet(viewsets.ModelViewSet):
     - Retrieve protocol details
     - Update protocols
     - Delete protocols
+
+    Engineers only see protocols covering one of their assigned devices.
     """
     queryset = TestProtocol.objects.all()
     serializer_class = TestProtocolSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated, IsAdminUser | DeviceAccessPermission]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_class = TestProtocolFilter
     search_fields = ['name', 'version', 'description']
+    search_vector_field = 'search_vector'
     ordering_fields = ['name', 'version', 'status', 'created_by', 'created_at', 'updated_at']
+    cache_dependencies = [TestProtocol, Device]
+    scope_lookup = 'devices__assigned_to'
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class TestResultViewSet(viewsets.ModelViewSet):
+class TestResultViewSet(MetricsMixin, ValueListMixin, RoleScopedMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing test results.
     
@@ -141,14 +112,20 @@ class TestResultViewSet(viewsets.ModelViewSet):
     - Update test results
     - Delete test results
     - Complete tests
+
+    Engineers only see results of their assigned devices.
     """
     queryset = TestResult.objects.all()
     serializer_class = TestResultSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated, IsAdminUser | DeviceAccessPermission]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_class = TestResultFilter
     search_fields = ['notes', 'device__name', 'protocol__name']
+    search_vector_field = 'search_vector'
     ordering_fields = ['status', 'start_time', 'end_time', 'created_at', 'updated_at']
+    scope_lookup = 'device__assigned_to'
+    max_bulk_batch_size = 5000
 
     @swagger_auto_schema(
         operation_description="Complete a test and record its results",
@@ -171,5 +148,203 @@ class TestResultViewSet(viewsets.ModelViewSet):
             test_result.end_time = request.data.get('end_time')
             test_result.notes = request.data.get('notes', '')
             test_result.save()
+            queue_rollup_recompute([bucket_of(test_result)])
             return Response({'status': 'test completed'})
-        return Response({'status': 'test already completed'}, status=400) 
\ No newline at end of file
+        return Response({'status': 'test already completed'}, status=400)
+
+    @swagger_auto_schema(
+        operation_description="Samples of the result's measurement series between start and end, "
+                              "downsampled with LTTB or per-bucket min/max, or raw.",
+        manual_parameters=[
+            openapi.Parameter('name', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description='Series to return (default: all)'),
+            openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                              description='First sample time, or sample number for series without times'),
+            openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                              description='Last sample time, or sample number for series without times'),
+            openapi.Parameter('method', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=list(SERIES_METHODS), description='Downsampling method (default: lttb)'),
+            openapi.Parameter('points', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description=f'Target samples per series (max {settings.SERIES_MAX_POINTS})'),
+        ],
+        responses={200: "Series samples", 400: "Invalid range or too many raw samples", 404: "Unknown series"}
+    )
+    @action(detail=True, methods=['get'])
+    def series(self, request, pk=None):
+        test_result = self.get_object()
+        params = request.query_params
+        method = params.get('method', 'lttb')
+        if method not in SERIES_METHODS:
+            return Response({'status': f"method must be one of {', '.join(SERIES_METHODS)}"}, status=400)
+        try:
+            start = float(params['start']) if 'start' in params else None
+            end = float(params['end']) if 'end' in params else None
+            points = int(params.get('points', settings.SERIES_DEFAULT_POINTS))
+        except ValueError:
+            return Response({'status': 'start and end must be numbers and points an integer'}, status=400)
+        if not 3 <= points <= settings.SERIES_MAX_POINTS:
+            return Response({'status': f'points must be between 3 and {settings.SERIES_MAX_POINTS}'}, status=400)
+
+        stored = TestResultSeries.objects.filter(result=test_result)
+        if 'name' in params:
+            stored = stored.filter(name=params['name'])
+        stored = list(stored)
+        if 'name' in params and not stored:
+            return Response({'status': 'series not found'}, status=404)
+        try:
+            series = [series_window(item, start, end, method, points) for item in stored]
+        except ValueError as e:
+            return Response({'status': str(e)}, status=400)
+        return Response({'id': test_result.id, 'series': series})
+
+    @swagger_auto_schema(
+        operation_description="Create many test results from a JSON array or an NDJSON stream. "
+                              "Valid rows are inserted in batches within one transaction and "
+                              "invalid rows are reported by index. At most RESULTS_BULK_MAX_ROWS "
+                              "rows are accepted per request.",
+        request_body=TestResultBulkSerializer(many=True),
+        manual_parameters=[
+            openapi.Parameter('batch_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='Rows per INSERT'),
+        ],
+        responses={201: "Rows created, with errors for any rejected rows", 400: "No valid rows",
+                   413: "Too many rows"}
+    )
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        if not isinstance(request.data, list):
+            return Response({'status': 'expected a list of results'}, status=400)
+        if len(request.data) > settings.RESULTS_BULK_MAX_ROWS:
+            return Response({'status': f'at most {settings.RESULTS_BULK_MAX_ROWS} results per request'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', settings.RESULTS_BULK_BATCH_SIZE))
+        except ValueError:
+            return Response({'status': 'batch_size must be an integer'}, status=400)
+        batch_size = max(1, min(batch_size, self.max_bulk_batch_size))
+
+        serializer = TestResultBulkSerializer(data=request.data, many=True, context=self.get_serializer_context())
+        valid, errors = serializer.validate_rows()
+        if not valid:
+            return Response({'created': 0, 'errors': errors}, status=400)
+
+        created = 0
+        with transaction.atomic():
+            for start in range(0, len(valid), batch_size):
+                batch, series = [], []
+                for _, attrs in valid[start:start + batch_size]:
+                    data, row_series = split_series(attrs.pop('data', {}))
+                    batch.append(TestResult(performed_by=request.user, data=data, **attrs))
+                    series.append(row_series)
+                TestResult.objects.bulk_create(batch)
+                ids = [result.pk for result in batch]
+                store_series(list(zip(ids, series)))
+                update_search_vectors(TestResult.objects.filter(pk__in=ids))
+                transaction.on_commit(lambda ids=ids: queue_test_result_notifications(ids))
+                created += len(batch)
+
+        return Response({'created': created, 'errors': errors}, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        operation_description="Aggregate status counts, pass rates and test durations (in seconds) "
+                              "over the filtered results in a single query. With source=rollups the "
+                              "daily rollup table is read instead, which only supports the device, "
+                              "protocol, status, started_after and started_before filters and has no "
+                              "percentiles.",
+        manual_parameters=[
+            openapi.Parameter('group_by', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description=f"Comma separated groupings: {', '.join(GROUPINGS)}"),
+            openapi.Parameter('source', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=['results', 'rollups'], description='Table to aggregate'),
+        ],
+        responses={200: "Aggregated statistics", 400: "Invalid group_by or filter"}
+    )
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        use_rollups = request.query_params.get('source') == 'rollups'
+        try:
+            group_by = parse_group_by(
+                request.query_params.get('group_by'),
+                ROLLUP_GROUPINGS if use_rollups else GROUPINGS,
+            )
+        except ValueError as e:
+            return Response({'status': str(e)}, status=400)
+
+        if use_rollups:
+            unsupported = set(request.query_params) - set(TestResultDailyRollupFilter.base_filters) - {'group_by', 'source', 'format'}
+            if unsupported:
+                return Response({'status': f"Not supported with source=rollups: {', '.join(sorted(unsupported))}"}, status=400)
+            rollups = scope_to_user(TestResultDailyRollup.objects.all(), request.user, 'device__assigned_to')
+            filterset = TestResultDailyRollupFilter(request.query_params, queryset=rollups, request=request)
+            if not filterset.is_valid():
+                return Response(filterset.errors, status=400)
+            results = rollup_statistics(filterset.qs, group_by)
+        else:
+            results = result_statistics(self.filter_queryset(self.get_queryset()), group_by)
+
+        return Response({
+            'group_by': group_by,
+            'results': results,
+        })
+
+    @swagger_auto_schema(
+        operation_description="Stream every filtered result as CSV or NDJSON without pagination.",
+        manual_parameters=[
+            openapi.Parameter('export_format', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=list(EXPORT_FORMATS), description='Output format (default csv)'),
+        ],
+        responses={200: "Streamed export", 400: "Unknown export format"}
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'status': f"export_format must be one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = export_rows(queryset, RESULT_EXPORT_FIELDS, settings.EXPORT_CHUNK_SIZE)
+        content_type, extension = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(encode(rows, RESULT_EXPORT_FIELDS, export_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="test_results.{extension}"'
+        return response
+
+class ExportJobViewSet(MetricsMixin, mixins.CreateModelMixin, mixins.ListModelMixin,
+                       mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    API endpoint for background exports that are too large for a single request.
+
+    This endpoint allows you to:
+    - Start an export of filtered devices or test results
+    - List your exports
+    - Check the status and progress of an export
+    - Download a completed export
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = ExportJob.objects.all()
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(created_by=self.request.user)
+
+    def perform_create(self, serializer):
+        job = serializer.save(created_by=self.request.user)
+        transaction.on_commit(lambda: run_export.delay(str(job.id)))
+
+    @swagger_auto_schema(
+        operation_description="Download the gzip file of a completed export",
+        responses={200: "Export file", 409: "Export not completed"}
+    )
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'COMPLETED':
+            return Response({'status': f'export {job.status.lower()}'}, status=409)
+        return FileResponse(
+            open(job.file_path, 'rb'),
+            as_attachment=True,
+            filename=f'{job.resource}_{job.id}.{job.export_format}.gz',
+            content_type='application/gzip',
+        )
@@ -0,0 +1,48 @@
+from functools import cached_property
+
+from devices.cache import get_assigned_device_ids
+from devices.models import Device, TestProtocol
+
+class AccessContext:
+    """
+    The authenticated user's role and device access, resolved once per request.
+
+    The role is read from the user row, which the authentication classes load
+    with ``select_related('role')``, and an engineer's device ids come from the
+    cached assignment map, so permission checks issue no queries.
+    """
+    def __init__(self, user):
+        self.user = user
+        self.is_manager = bool(user.is_manager())
+        self.is_engineer = bool(user.is_engineer())
+
+    @cached_property
+    def device_ids(self):
+        if not self.is_engineer:
+            return frozenset()
+        return get_assigned_device_ids(self.user.pk)
+
+    def can_access(self, obj):
+        """
+        Whether the user may act on a device, or on a protocol or test result of one.
+        """
+        if self.is_manager:
+            return True
+        if not self.is_engineer:
+            return False
+        if isinstance(obj, Device):
+            return obj.assigned_to_id == self.user.pk
+        if isinstance(obj, TestProtocol):
+            # Served from the prefetched devices when the view loaded them
+            return any(device.pk in self.device_ids for device in obj.devices.all())
+        return getattr(obj, 'device_id', None) in self.device_ids
+
+def get_access(request):
+    """
+    Return the request's AccessContext, building it on first use.
+    """
+    access = getattr(request, '_access_context', None)
+    if access is None or access.user is not request.user:
+        access = AccessContext(request.user)
+        request._access_context = access
+    return access
@@ -0,0 +1,154 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from .models import Role
+
+UserModel = get_user_model()
+
+# User columns kept in a cached token entry; others load lazily if read
+SNAPSHOT_FIELDS = ['id', 'username', 'first_name', 'last_name', 'is_staff', 'is_superuser', 'is_active', 'role_id']
+
+class LocalTTLCache:
+    """
+    Thread-safe, size-bounded LRU whose entries expire after ``ttl`` seconds.
+    Local to the process, so it is kept short-lived and backed by Redis.
+    """
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+local_tokens = LocalTTLCache(settings.TOKEN_CACHE_LOCAL_SIZE, settings.TOKEN_CACHE_LOCAL_TTL)
+
+def token_cache_key(key):
+    # Never put the raw token in a cache key
+    return f'users:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+def snapshot(token):
+    user = token.user
+    data = {name: getattr(user, name) for name in SNAPSHOT_FIELDS}
+    data['role_name'] = user.role.name if user.role_id else None
+    return data
+
+def user_from_snapshot(data):
+    """
+    Rebuild the authenticated user from a cached entry without a query.
+
+    The instance is built as if loaded with ``only()``, so any other column is
+    fetched on first access and ``save()`` only writes the loaded columns.
+    """
+    user = UserModel.from_db('default', SNAPSHOT_FIELDS, [data[name] for name in SNAPSHOT_FIELDS])
+    if data['role_id'] is not None:
+        user.role = Role.from_db('default', ['id', 'name'], [data['role_id'], data['role_name']])
+    return user
+
+def invalidate_tokens(keys):
+    """
+    Forget cached entries for the given token keys, immediately and again
+    once the surrounding transaction commits.
+    """
+    cache_keys = [token_cache_key(key) for key in keys]
+    if not cache_keys:
+        return
+
+    def delete():
+        for cache_key in cache_keys:
+            local_tokens.delete(cache_key)
+        cache.delete_many(cache_keys)
+
+    delete()
+    transaction.on_commit(delete)
+
+class RoleTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that loads the user's role in the same query, so role
+    checks later in the request need no further queries.
+    """
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user__role').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
+
+class CachedTokenAuthentication(RoleTokenAuthentication):
+    """
+    Token authentication that serves token -> user lookups from a local LRU
+    and then Redis, so warm requests authenticate without a query.
+
+    Entries are dropped when a token is deleted or its user or role changes;
+    other processes may keep a stale local entry for ``TOKEN_CACHE_LOCAL_TTL``.
+    """
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        data = local_tokens.get(cache_key)
+        if data is None:
+            data = cache.get(cache_key)
+            if data is None:
+                _, token = super().authenticate_credentials(key)
+                data = snapshot(token)
+                cache.set(cache_key, data, settings.TOKEN_CACHE_TIMEOUT)
+            local_tokens.set(cache_key, data)
+
+        if not data['is_active']:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        user = user_from_snapshot(data)
+        token = Token.from_db('default', ['key', 'user_id'], [key, user.pk])
+        token.user = user
+        return (user, token)
+
+class RoleModelBackend(ModelBackend):
+    """
+    Authentication backend that loads session users together with their role.
+    """
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('role').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
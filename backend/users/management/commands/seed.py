@@ -1,11 +1,34 @@
-from django.core.management.base import BaseCommand
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
 from users.models import Role
+from devices import synthetic
+from devices.cache import bump_generation
 from devices.models import Device, TestProtocol, TestResult
+from devices.rollups import recompute_days
+from devices.search import update_search_vectors
 from django.utils import timezone
 
 class Command(BaseCommand):
-    help = "Seed the database with initial data"
+    help = (
+        "Seed the database with initial data. Pass --devices, --results or --engineers to instead "
+        "load a large, deterministic synthetic data set for benchmarking."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, help='Synthetic devices to load (scale mode)')
+        parser.add_argument('--results', type=int, help='Synthetic test results to load (scale mode)')
+        parser.add_argument('--engineers', type=int, help='Synthetic engineers to load (scale mode)')
+        parser.add_argument('--protocols', type=int, default=25, help='Synthetic test protocols to load')
+        parser.add_argument('--days', type=int, default=365, help='Days of history to spread results over')
+        parser.add_argument('--until', type=date.fromisoformat, help='Day the history ends, default today')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; equal seeds load equal data')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk_create outside PostgreSQL')
 
     def create_roles(self):
         self.stdout.write("Creating roles...")
@@ -252,7 +275,110 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(f"Test result already exists for {data['device'].name}")
 
+    def load(self, label, model, fields, rows, batch_size):
+        started = time.perf_counter()
+        count = synthetic.write_rows(model, fields, rows, batch_size)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Loaded {count} {label} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} rows/s)")
+        return count
+
+    def handle_scale(self, options):
+        devices = options['devices'] if options['devices'] is not None else 1000
+        results = options['results'] if options['results'] is not None else 100000
+        engineers = options['engineers'] if options['engineers'] is not None else 10
+        if min(devices, engineers, options['protocols'], options['days']) < 1 or results < 0:
+            raise CommandError("--devices, --engineers, --protocols and --days must be at least 1")
+        if Device.objects.filter(model_number__startswith=synthetic.MODEL_NUMBER_PREFIX).exists():
+            raise CommandError("Synthetic data is already loaded; seed an empty database (manage.py flush)")
+
+        rng = random.Random(options['seed'])
+        until_day = options['until'] or timezone.localdate()
+        until = timezone.make_aware(datetime.combine(until_day, datetime.min.time()))
+        history_start = until - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        manager_role, engineer_role = self.create_roles()
+        User = get_user_model()
+        with transaction.atomic():
+            manager, _ = User.objects.get_or_create(
+                username='seed-manager',
+                defaults={'email': 'seed-manager@vitalbio.com', 'role': manager_role, 'is_staff': True}
+            )
+            # Hashing is deliberately slow, so every engineer shares one hash
+            password = make_password('engineer123')
+            engineer_ids = [user.pk for user in User.objects.bulk_create([
+                User(
+                    username=f'{synthetic.ENGINEER_PREFIX}{i:05d}',
+                    email=f'{synthetic.ENGINEER_PREFIX}{i:05d}@vitalbio.com',
+                    password=password,
+                    role=engineer_role,
+                )
+                for i in range(engineers)
+            ], batch_size=batch_size)]
+            self.stdout.write(f"Created {len(engineer_ids)} engineers")
+
+            # Indexes are rebuilt once the rows and their search vectors are in
+            with synthetic.deferred_indexes(Device, TestResult):
+                self.load('devices', Device, synthetic.DEVICE_FIELDS, synthetic.generate_devices(
+                    rng, devices, engineer_ids, history_start - timedelta(days=30), history_start
+                ), batch_size)
+                device_rows = list(
+                    Device.objects.filter(model_number__startswith=synthetic.MODEL_NUMBER_PREFIX)
+                    .order_by('model_number').values_list('pk', 'assigned_to_id')
+                )
+
+                protocol_ids = [protocol.pk for protocol in TestProtocol.objects.bulk_create([
+                    TestProtocol(
+                        name=f'{synthetic.PROTOCOL_PREFIX} {i:03d}',
+                        version=f'{1 + i % 3}.{i % 10}',
+                        description=f'Synthetic protocol {i} for load testing',
+                        status='APPROVED',
+                        created_by=manager,
+                    )
+                    for i in range(options['protocols'])
+                ])]
+                links = list(synthetic.generate_protocol_devices(rng, protocol_ids, [pk for pk, _ in device_rows]))
+                self.load('protocol device links', TestProtocol.devices.through, synthetic.PROTOCOL_DEVICE_FIELDS,
+                          links, batch_size)
+                device_protocols = {}
+                for protocol_id, device_id in links:
+                    device_protocols.setdefault(device_id, []).append(protocol_id)
+                del links
+
+                self.load('test results', TestResult, synthetic.RESULT_FIELDS, synthetic.generate_results(
+                    rng, results, device_rows, device_protocols, synthetic.protocol_data_keys(rng, protocol_ids),
+                    engineer_ids, until, options['days']
+                ), batch_size)
+
+                step = time.perf_counter()
+                update_search_vectors(Device.objects.filter(model_number__startswith=synthetic.MODEL_NUMBER_PREFIX))
+                update_search_vectors(TestProtocol.objects.filter(pk__in=protocol_ids))
+                update_search_vectors(TestResult.objects.filter(device__model_number__startswith=synthetic.MODEL_NUMBER_PREFIX))
+                self.stdout.write(f"Updated search vectors in {time.perf_counter() - step:.1f}s")
+                step = time.perf_counter()
+            self.stdout.write(f"Rebuilt indexes in {time.perf_counter() - step:.1f}s")
+
+            step = time.perf_counter()
+            rollups = recompute_days(history_start.date(), until_day)
+            self.stdout.write(f"Rebuilt {rollups} daily rollups in {time.perf_counter() - step:.1f}s")
+
+            # Rows were written without signals, so retire cached lists by hand
+            bump_generation(Device)
+            bump_generation(TestProtocol)
+
+        if connection.vendor == 'postgresql':
+            tables = [Device, TestProtocol, TestProtocol.devices.through, TestResult]
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE ' + ', '.join(connection.ops.quote_name(model._meta.db_table) for model in tables))
+
+        self.stdout.write(self.style.SUCCESS(f"Synthetic data loaded in {time.perf_counter() - started:.1f}s"))
+        self.stdout.write("Engineers: username=seed-engineer-00000.., password=engineer123")
+
     def handle(self, *args, **options):
+        if any(options[name] is not None for name in ('devices', 'results', 'engineers')):
+            return self.handle_scale(options)
+
         self.stdout.write("Starting database seeding...")
         
         try:
@@ -32,14 +32,15 @@ class CustomUser(AbstractUser):
         return self.role.get_name_display() if self.role else 'No Role'
     
     def is_manager(self):
-        return self.role and self.role.name == 'MANAGER'
+        # The authentication classes load role with the user
+        return self.role_id is not None and self.role.name == 'MANAGER'
     
     def is_engineer(self):
-        return self.role and self.role.name == 'ENGINEER'
+        return self.role_id is not None and self.role.name == 'ENGINEER'
     
     def has_device_access(self, device):
         if self.is_manager():
             return True
         elif self.is_engineer():
-            return device.assigned_to == self
+            return device.assigned_to_id == self.pk
         return False 
\ No newline at end of file
@@ -1,5 +1,5 @@
 from rest_framework import permissions
-from devices.models import Device
+from .access import get_access
 
 class IsAdminUser(permissions.BasePermission):
     """
@@ -20,12 +20,6 @@ class DeviceAccessPermission(permissions.BasePermission):
         return True
 
     def has_object_permission(self, request, view, obj):
-        # Allow managers full access
-        if request.user.is_manager():
-            return True
-        
-        # Allow engineers to access only their assigned devices
-        if request.user.is_engineer():
-            return obj.assigned_to == request.user
-        
-        return False 
\ No newline at end of file
+        # Managers have full access and engineers only reach their assigned
+        # devices, and the protocols and results of those devices
+        return get_access(request).can_access(obj)
@@ -1 +1,40 @@
-# Signals for the users app will be added here as needed 
\ No newline at end of file
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import SNAPSHOT_FIELDS, invalidate_tokens
+from .models import CustomUser, Role
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """
+    Signal handler to stop accepting a deleted token from the cache.
+    """
+    invalidate_tokens([instance.key])
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_tokens(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Signal handler to refresh cached tokens when a user is deactivated or
+    their role or permissions change. Saves of columns the cached entries do
+    not hold, such as ``last_login``, are skipped.
+    """
+    if update_fields is not None and not set(update_fields) & {*SNAPSHOT_FIELDS, 'role'}:
+        return
+    if not created:
+        invalidate_tokens(Token.objects.filter(user=instance).values_list('key', flat=True))
+
+@receiver(post_save, sender=Role)
+def invalidate_role_tokens(sender, instance, created, **kwargs):
+    """
+    Signal handler to refresh cached tokens of every user with a renamed role.
+    """
+    if not created:
+        invalidate_tokens(Token.objects.filter(user__role=instance).values_list('key', flat=True))
+
+@receiver(pre_delete, sender=Role)
+def invalidate_deleted_role_tokens(sender, instance, **kwargs):
+    """
+    Signal handler to refresh cached tokens of every user with a deleted role,
+    which is cleared from them by an update that sends no user signals.
+    """
+    invalidate_tokens(Token.objects.filter(user__role=instance).values_list('key', flat=True))
@@ -18,7 +18,8 @@ class UserViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing users. Only accessible by admin users.
     """
-    queryset = CustomUser.objects.all()
+    # Role is read for every listed user
+    queryset = CustomUser.objects.select_related('role')
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
     
     def get_serializer_class(self):